@@ -6,13 +6,23 @@ Users should use the AsyncClient to manage the interface, as it has performance
 features. A simpler Client is also given as a base implementation.
 """
 
+import collections
 import json
 import requests
+import threading
+import websocket
 from auvsi_suas.client.exceptions import InteropError
+from auvsi_suas.client.exceptions import TelemetryStreamError
 from auvsi_suas.proto import interop_api_pb2
+from concurrent.futures import Future
 from concurrent.futures import ThreadPoolExecutor
 from google.protobuf import json_format
 
+# Content type of binary protos, used when the client opts in to them.
+PROTOBUF_CONTENT_TYPE = 'application/x-protobuf'
+# URI of the telemetry WebSocket stream.
+TELEMETRY_STREAM_URI = '/ws/telemetry'
+
 
 class Client(object):
     """Client which provides authenticated access to interop API.
@@ -30,7 +40,8 @@ class Client(object):
                  password,
                  timeout=10,
                  max_concurrent=128,
-                 max_retries=10):
+                 max_retries=10,
+                 use_protobuf=False):
         """Create a new Client and login.
 
         Args:
@@ -41,6 +52,8 @@ class Client(object):
             timeout: Individual session request timeout (seconds).
             max_concurrent: Maximum number of concurrent requests.
             max_retries: Maximum attempts to establish a connection.
+            use_protobuf: Whether to send and receive binary protos instead
+                of JSON, which is cheaper to serialize.
         """
         self.url = url
         self.timeout = timeout
@@ -52,11 +65,40 @@ class Client(object):
             requests.adapters.HTTPAdapter(pool_maxsize=max_concurrent,
                                           max_retries=max_retries))
 
+        self.use_protobuf = use_protobuf
+        if self.use_protobuf:
+            self.session.headers['Accept'] = PROTOBUF_CONTENT_TYPE
+
+        # ETag and response of the last team status, which is reused while
+        # status is not modified.
+        self._teams_response = (None, None)
+        # Cursor and team status by team ID, updated with changes.
+        self._team_changes = ('', collections.OrderedDict())
+
         # All endpoints require authentication, so always login.
         creds = interop_api_pb2.Credentials()
         creds.username = username
         creds.password = password
-        self.post('/api/login', data=json_format.MessageToJson(creds))
+        self.post('/api/login', **self._proto_data(creds))
+
+    def _proto_data(self, proto):
+        """Gets the request arguments to send the proto as the body."""
+        if self.use_protobuf:
+            return {
+                'data': proto.SerializeToString(),
+                'headers': {
+                    'Content-Type': PROTOBUF_CONTENT_TYPE
+                },
+            }
+        return {'data': json_format.MessageToJson(proto)}
+
+    def _parse_proto(self, r, proto):
+        """Parses the response body into the proto, and returns the proto."""
+        if self.use_protobuf:
+            proto.ParseFromString(r.content)
+        else:
+            json_format.Parse(r.text, proto)
+        return proto
 
     def get(self, uri, **kwargs):
         """GET request to server.
@@ -68,7 +110,8 @@ class Client(object):
             InteropError: Error from server.
             requests.Timeout: Request timeout.
         """
-        r = self.session.get(self.url + uri, timeout=self.timeout, **kwargs)
+        kwargs.setdefault('timeout', self.timeout)
+        r = self.session.get(self.url + uri, **kwargs)
         if not r.ok:
             raise InteropError(r)
         return r
@@ -117,9 +160,16 @@ class Client(object):
             raise InteropError(r)
         return r
 
-    def get_teams(self):
+    def get_teams(self, wait_sec=None):
         """GET the status of teams.
 
+        Sends the ETag of the last status, and reuses the last status if the
+        server responds that it isn't modified.
+
+        Args:
+            wait_sec: Optional. If set, the server waits up to this long for
+                status to change since the last call, and sends only the
+                changes. The first call doesn't wait.
         Returns:
             List of TeamStatus objects for active teams.
         Raises:
@@ -127,7 +177,21 @@ class Client(object):
             requests.Timeout: Request timeout.
             ValueError or AttributeError: Malformed response from server.
         """
-        r = self.get('/api/teams')
+        if wait_sec is not None:
+            return self._get_team_changes(wait_sec)
+
+        etag, last = self._teams_response
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        r = self.get('/api/teams', headers=headers)
+        if r.status_code == requests.codes.not_modified:
+            r = last
+        elif 'ETag' in r.headers:
+            self._teams_response = (r.headers['ETag'], r)
+        if self.use_protobuf:
+            teams = self._parse_proto(r, interop_api_pb2.TeamStatusList())
+            return list(teams.teams)
         teams = []
         for team_dict in r.json():
             team_proto = interop_api_pb2.TeamStatus()
@@ -135,6 +199,28 @@ class Client(object):
             teams.append(team_proto)
         return teams
 
+    def _get_team_changes(self, wait_sec):
+        """GET changes to the status of teams, and applies them."""
+        cursor, teams = self._team_changes
+        r = self.get('/api/teams',
+                     params={
+                         'since': cursor,
+                         'timeout': wait_sec
+                     },
+                     timeout=self.timeout + wait_sec)
+        if r.status_code == requests.codes.not_modified:
+            # The server was too busy to wait, and status hasn't changed.
+            return list(teams.values())
+        delta = self._parse_proto(r, interop_api_pb2.TeamStatusDelta())
+        if delta.full:
+            teams = collections.OrderedDict()
+        else:
+            teams = collections.OrderedDict(teams)
+        for team in delta.teams:
+            teams[team.team.id] = team
+        self._team_changes = (delta.cursor, teams)
+        return list(teams.values())
+
     def get_mission(self, mission_id):
         """GET a mission by ID.
 
@@ -146,9 +232,7 @@ class Client(object):
             ValueError or AttributeError: Malformed response from server.
         """
         r = self.get('/api/missions/%d' % mission_id)
-        mission = interop_api_pb2.Mission()
-        json_format.Parse(r.text, mission)
-        return mission
+        return self._parse_proto(r, interop_api_pb2.Mission())
 
     def post_telemetry(self, telem):
         """POST new telemetry.
@@ -159,7 +243,33 @@ class Client(object):
             InteropError: Error from server.
             requests.Timeout: Request timeout.
         """
-        self.post('/api/telemetry', data=json_format.MessageToJson(telem))
+        self.post('/api/telemetry', **self._proto_data(telem))
+
+    def post_telemetry_batch(self, telems):
+        """POST a batch of telemetry with a single request.
+
+        Each telemetry must have its timestamp set. The batch is either
+        accepted entirely or rejected entirely.
+
+        Args:
+            telems: List of Telemetry objects, in timestamp order.
+        Raises:
+            InteropError: Error from server.
+            requests.Timeout: Request timeout.
+        """
+        batch = interop_api_pb2.TelemetryBatch()
+        batch.telemetry.extend(telems)
+        self.post('/api/telemetry/batch', **self._proto_data(batch))
+
+    def open_telemetry_stream(self):
+        """Opens a WebSocket stream to send telemetry over.
+
+        Returns:
+            A TelemetryStream using the client's login.
+        Raises:
+            websocket.WebSocketException: Failed to open the stream.
+        """
+        return TelemetryStream(self)
 
     def get_odlcs(self, mission=None):
         """GET odlcs.
@@ -177,6 +287,9 @@ class Client(object):
         if mission:
             url += '?mission=%d' % mission
         r = self.get(url)
+        if self.use_protobuf:
+            odlcs = self._parse_proto(r, interop_api_pb2.OdlcList())
+            return list(odlcs.odlcs)
         odlcs = []
         for odlc_dict in r.json():
             odlc_proto = interop_api_pb2.Odlc()
@@ -197,9 +310,7 @@ class Client(object):
             ValueError or AttributeError: Malformed response from server.
         """
         r = self.get('/api/odlcs/%d' % odlc_id)
-        odlc = interop_api_pb2.Odlc()
-        json_format.Parse(r.text, odlc)
-        return odlc
+        return self._parse_proto(r, interop_api_pb2.Odlc())
 
     def post_odlc(self, odlc):
         """POST odlc.
@@ -213,10 +324,8 @@ class Client(object):
             requests.Timeout: Request timeout.
             ValueError or AttributeError: Malformed response from server.
         """
-        r = self.post('/api/odlcs', data=json_format.MessageToJson(odlc))
-        odlc = interop_api_pb2.Odlc()
-        json_format.Parse(r.text, odlc)
-        return odlc
+        r = self.post('/api/odlcs', **self._proto_data(odlc))
+        return self._parse_proto(r, interop_api_pb2.Odlc())
 
     def put_odlc(self, odlc_id, odlc):
         """PUT odlc.
@@ -231,11 +340,8 @@ class Client(object):
             requests.Timeout: Request timeout.
             ValueError or AttributeError: Malformed response from server.
         """
-        r = self.put('/api/odlcs/%d' % odlc_id,
-                     data=json_format.MessageToJson(odlc))
-        odlc = interop_api_pb2.Odlc()
-        json_format.Parse(r.text, odlc)
-        return odlc
+        r = self.put('/api/odlcs/%d' % odlc_id, **self._proto_data(odlc))
+        return self._parse_proto(r, interop_api_pb2.Odlc())
 
     def delete_odlc(self, odlc_id):
         """DELETE odlc.
@@ -297,6 +403,136 @@ class Client(object):
         self.delete('/api/odlcs/%d/image' % odlc_id)
 
 
+class TelemetryStream(object):
+    """Streams telemetry to the server over a WebSocket.
+
+    Telemetry are sent over a single long-lived connection, rather than with
+    a request each. The server stores telemetry in micro-batches, and
+    acknowledges them once stored. Each sent telemetry gets a Future which
+    completes once acknowledged.
+    """
+    def __init__(self, client):
+        """Opens a telemetry stream.
+
+        Args:
+            client: A logged in Client, whose session authenticates the stream.
+        Raises:
+            websocket.WebSocketException: Failed to open the stream.
+        """
+        self.use_protobuf = client.use_protobuf
+        self.timeout = client.timeout
+        url = 'ws' + client.url[len('http'):] + TELEMETRY_STREAM_URI
+        cookie = '; '.join('%s=%s' % (k, v)
+                           for k, v in client.session.cookies.items())
+        self.ws = websocket.create_connection(url,
+                                              cookie=cookie,
+                                              timeout=client.timeout)
+        # Acknowledgements may be arbitrarily delayed, so don't time out.
+        self.ws.settimeout(None)
+
+        # Protects the state below, and orders sends with their numbers.
+        self.lock = threading.Lock()
+        # Number of telemetry sent, which numbers them.
+        self.sent = 0
+        # Futures of unacknowledged telemetry by number, in send order.
+        self.pending = collections.OrderedDict()
+        # Whether the stream closed, and why.
+        self.closed = False
+        self.error = None
+
+        self.reader = threading.Thread(target=self._read)
+        self.reader.daemon = True
+        self.reader.start()
+
+    def send(self, telem):
+        """Sends telemetry over the stream.
+
+        Args:
+            telem: Telemetry object containing telemetry state.
+        Returns:
+            Future object which completes once the server stored the
+            telemetry, or contains a TelemetryStreamError.
+        """
+        future = Future()
+        with self.lock:
+            if self.closed:
+                future.set_exception(self.error)
+                return future
+            self.sent += 1
+            self.pending[self.sent] = future
+            try:
+                if self.use_protobuf:
+                    self.ws.send_binary(telem.SerializeToString())
+                else:
+                    self.ws.send(json_format.MessageToJson(telem))
+            except Exception as e:
+                failed = self._close_locked(e)
+            else:
+                return future
+        self._fail(failed)
+        return future
+
+    def close(self):
+        """Closes the stream, failing unacknowledged telemetry."""
+        try:
+            self.ws.send_close()
+        except websocket.WebSocketException:
+            pass
+        # The reader stops once the server acknowledges the close.
+        self.reader.join(self.timeout)
+        self.ws.shutdown()
+
+    def _read(self):
+        """Receives acknowledgements until the stream closes."""
+        try:
+            while True:
+                opcode, data = self.ws.recv_data()
+                if opcode == websocket.ABNF.OPCODE_CLOSE:
+                    raise TelemetryStreamError('Closed by server.')
+                ack = interop_api_pb2.TelemetryStreamAck()
+                if opcode == websocket.ABNF.OPCODE_BINARY:
+                    ack.ParseFromString(data)
+                else:
+                    json_format.Parse(data.decode('utf-8'), ack)
+                self._acknowledge(ack)
+        except Exception as e:
+            with self.lock:
+                failed = self._close_locked(e)
+            self._fail(failed)
+
+    def _acknowledge(self, ack):
+        """Completes the futures of the acknowledged telemetry."""
+        rejected = None
+        stored = []
+        with self.lock:
+            if ack.HasField('rejected'):
+                rejected = self.pending.pop(ack.rejected, None)
+            if ack.HasField('stored_through'):
+                while self.pending and next(iter(
+                        self.pending)) <= ack.stored_through:
+                    stored.append(self.pending.popitem(last=False)[1])
+        # Complete outside the lock, as callbacks may send telemetry.
+        if rejected:
+            rejected.set_exception(TelemetryStreamError(ack.error))
+        for future in stored:
+            future.set_result(None)
+
+    def _close_locked(self, e):
+        """Marks the stream closed, returning the futures to fail."""
+        if not self.closed:
+            self.closed = True
+            self.error = TelemetryStreamError(
+                'Telemetry stream closed before telemetry was stored: %s' % e)
+        failed = list(self.pending.values())
+        self.pending.clear()
+        return failed
+
+    def _fail(self, futures):
+        """Fails the futures with the stream's error."""
+        for future in futures:
+            future.set_exception(self.error)
+
+
 class AsyncClient(object):
     """Client which uses the base to be more performant.
 
@@ -316,7 +552,8 @@ class AsyncClient(object):
                  password,
                  timeout=10,
                  max_concurrent=128,
-                 max_retries=10):
+                 max_retries=10,
+                 use_protobuf=False):
         """Create a new AsyncClient and login.
 
         Args:
@@ -327,19 +564,27 @@ class AsyncClient(object):
             timeout: Individual session request timeout (seconds)
             max_concurrent: Maximum number of concurrent requests.
             max_retries: Maximum attempts to establish a connection.
+            use_protobuf: Whether to send and receive binary protos instead
+                of JSON, which is cheaper to serialize.
         """
         self.client = Client(url, username, password, timeout, max_concurrent,
-                             max_retries)
+                             max_retries, use_protobuf)
         self.executor = ThreadPoolExecutor(max_workers=max_concurrent)
+        # Telemetry stream, opened when first used.
+        self.stream = None
+        self.stream_lock = threading.Lock()
 
-    def get_teams(self):
+    def get_teams(self, wait_sec=None):
         """GET the status of teams.
 
+        Args:
+            wait_sec: Optional. Time to wait for status to change, see
+                Client.get_teams().
         Returns:
             Future object which contains the return value or error from the
             underlying Client.
         """
-        return self.executor.submit(self.client.get_teams)
+        return self.executor.submit(self.client.get_teams, wait_sec)
 
     def get_mission(self, mission_id):
         """GET a mission by ID.
@@ -361,6 +606,39 @@ class AsyncClient(object):
         """
         return self.executor.submit(self.client.post_telemetry, telem)
 
+    def post_telemetry_batch(self, telems):
+        """POST a batch of telemetry with a single request.
+
+        Args:
+            telems: List of Telemetry objects, in timestamp order.
+        Returns:
+            Future object which contains the return value or error from the
+            underlying Client.
+        """
+        return self.executor.submit(self.client.post_telemetry_batch, telems)
+
+    def stream_telemetry(self, telem):
+        """Sends new telemetry over a WebSocket stream.
+
+        The stream is opened by the first call, and reopened if it closes.
+        Streaming avoids the overhead of a request per telemetry.
+
+        Args:
+            telem: Telemetry object containing telemetry state.
+        Returns:
+            Future object which completes once the server stored the
+            telemetry, or contains a TelemetryStreamError.
+        """
+        with self.stream_lock:
+            if self.stream is None or self.stream.closed:
+                try:
+                    self.stream = self.client.open_telemetry_stream()
+                except Exception as e:
+                    future = Future()
+                    future.set_exception(e)
+                    return future
+            return self.stream.send(telem)
+
     def get_odlcs(self, mission=None):
         """GET odlcs.
 
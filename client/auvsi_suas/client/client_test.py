@@ -1,3 +1,4 @@
+import datetime
 import os
 import requests
 import unittest
@@ -5,6 +6,7 @@ import unittest
 from auvsi_suas.client.client import AsyncClient
 from auvsi_suas.client.client import Client
 from auvsi_suas.client.exceptions import InteropError
+from auvsi_suas.client.exceptions import TelemetryStreamError
 from auvsi_suas.proto import interop_api_pb2
 
 # These tests run against a real interop server.
@@ -66,6 +68,15 @@ class TestClient(unittest.TestCase):
         self.assertEqual('testuser', teams[0].team.username)
         self.assertEqual('testuser', async_teams[0].team.username)
 
+        # Status not modified since is reused.
+        self.assertEqual(teams[0].team, self.client.get_teams()[0].team)
+
+        # Changes to status.
+        teams = self.client.get_teams(wait_sec=0)
+        self.assertEqual('testuser', teams[0].team.username)
+        teams = self.client.get_teams(wait_sec=0)
+        self.assertEqual('testuser', teams[0].team.username)
+
     def test_get_mission(self):
         """Test getting a mission."""
         mission = self.client.get_mission(1)
@@ -99,6 +110,66 @@ class TestClient(unittest.TestCase):
         with self.assertRaises(InteropError):
             self.async_client.post_telemetry(t).result()
 
+    def test_post_telemetry_batch(self):
+        """Test sending a batch of telemetry."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        telems = []
+        for i in range(10):
+            t = interop_api_pb2.Telemetry()
+            t.latitude = 38
+            t.longitude = -76
+            t.altitude = 100 + i
+            t.heading = 90
+            t.timestamp = (
+                now - datetime.timedelta(seconds=1 - i * 0.1)).isoformat()
+            telems.append(t)
+
+        # Raises an exception on error.
+        self.client.post_telemetry_batch(telems)
+        self.async_client.post_telemetry_batch(telems).result()
+
+    def test_post_bad_telemetry_batch(self):
+        """Test sending a batch of telemetry without timestamps."""
+        t = interop_api_pb2.Telemetry()
+        t.latitude = 38
+        t.longitude = -76
+        t.altitude = 100
+        t.heading = 90
+        with self.assertRaises(InteropError):
+            self.client.post_telemetry_batch([t])
+        with self.assertRaises(InteropError):
+            self.async_client.post_telemetry_batch([t]).result()
+
+    def test_stream_telemetry(self):
+        """Test streaming telemetry."""
+        t = interop_api_pb2.Telemetry()
+        t.latitude = 38
+        t.longitude = -76
+        t.altitude = 100
+        t.heading = 90
+
+        stream = self.client.open_telemetry_stream()
+        futures = [stream.send(t) for _ in range(10)]
+        for future in futures:
+            # Raises an exception on error.
+            future.result(timeout=10)
+        stream.close()
+        self.assertTrue(stream.closed)
+        with self.assertRaises(TelemetryStreamError):
+            stream.send(t).result(timeout=10)
+
+        self.async_client.stream_telemetry(t).result(timeout=10)
+
+    def test_stream_bad_telemetry(self):
+        """Test streaming bad telemetry."""
+        t = interop_api_pb2.Telemetry()
+        t.latitude = 38
+        t.longitude = -76
+        t.altitude = 100
+        t.heading = 400  # Out of range.
+        with self.assertRaises(TelemetryStreamError):
+            self.async_client.stream_telemetry(t).result(timeout=10)
+
     def test_odlcs(self):
         """Test odlc workflow."""
         # Post a odlc gets an updated odlc.
@@ -179,3 +250,14 @@ class TestClient(unittest.TestCase):
         self.assertNotIn(post_odlc, self.client.get_odlcs())
         self.assertNotIn(async_post_odlc,
                          self.async_client.get_odlcs().result())
+
+
+class TestClientProtobuf(TestClient):
+    """Test the Client class using binary protos."""
+    def setUp(self):
+        """Create a logged in Client which uses binary protos."""
+        self.client = Client(server, username, password, use_protobuf=True)
+        self.async_client = AsyncClient(server,
+                                        username,
+                                        password,
+                                        use_protobuf=True)
@@ -19,3 +19,8 @@ class InteropError(requests.HTTPError):
                                  message=response.text)
 
         super(InteropError, self).__init__(message, response=response)
+
+
+class TelemetryStreamError(Exception):
+    """Streamed telemetry was rejected, or the stream closed before it was
+    stored."""
@@ -62,7 +62,7 @@ def probe(args, client):
 
 
 def mavlink(args, client):
-    proxy = MavlinkProxy(args.device, client)
+    proxy = MavlinkProxy(args.device, client, stream=args.stream)
     proxy.proxy()
 
 
@@ -138,6 +138,10 @@ forward as telemetry to interop server.''')
         '--device',
         type=str,
         help='pymavlink device name to read from. E.g. tcp:localhost:8080.')
+    subparser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Send telemetry over a WebSocket stream instead of requests.')
 
     # Parse args, get password if not provided.
     args = parser.parse_args()
@@ -18,14 +18,17 @@ class MavlinkProxy(object):
     forwarded so throughput is limited by RTT of the request. Prints request
     rate.
     """
-    def __init__(self, device, client):
+    def __init__(self, device, client, stream=False):
         """Receives telemetry over the device and forwards via the client.
 
         Args:
             device: A pymavlink device name to forward.
             client: Interop Client with which to send telemetry packets.
+            stream: Whether to send telemetry over a WebSocket stream rather
+                than a request each.
         """
         self.client = client
+        self.stream = stream
         # Create mavlink connection.
         self.mav = mavutil.mavlink_connection(device, autoreconnect=True)
         # Protects concurrent access to state.
@@ -59,9 +62,15 @@ class MavlinkProxy(object):
             telemetry.longitude = self._mavlink_latlon(msg.lon)
             telemetry.altitude = self._mavlink_alt(msg.alt)
             telemetry.heading = self._mavlink_heading(msg.hdg)
+            # Time since boot increases with each packet, so identifies resent
+            # telemetry.
+            telemetry.sequence = msg.time_boot_ms
             # Forward via client.
-            self.client.post_telemetry(telemetry).add_done_callback(
-                self._send_done)
+            if self.stream:
+                future = self.client.stream_telemetry(telemetry)
+            else:
+                future = self.client.post_telemetry(telemetry)
+            future.add_done_callback(self._send_done)
 
     def _send_done(self, future):
         """Callback executed after telemetry post done."""
@@ -1,4 +1,7 @@
 import auvsi_suas.models.aerial_position  # noqa
+import auvsi_suas.models.evaluation_job  # noqa
+import auvsi_suas.models.feedback_cache  # noqa
+import auvsi_suas.models.flight_track  # noqa
 import auvsi_suas.models.fly_zone  # noqa
 import auvsi_suas.models.gps_position  # noqa
 import auvsi_suas.models.mission_config  # noqa
@@ -6,5 +9,7 @@ import auvsi_suas.models.mission_judge_feedback  # noqa
 import auvsi_suas.models.odlc  # noqa
 import auvsi_suas.models.stationary_obstacle  # noqa
 import auvsi_suas.models.takeoff_or_landing_event  # noqa
+import auvsi_suas.models.telemetry_cache  # noqa
+import auvsi_suas.models.telemetry_rate  # noqa
 import auvsi_suas.models.uas_telemetry  # noqa
 import auvsi_suas.models.waypoint  # noqa
@@ -1,5 +1,18 @@
+import django
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class AuvsiSuasConfig(AppConfig):
     name = 'auvsi_suas'
+
+
+def setup_process(databases):
+    """Sets up Django in a spawned process, before importing models.
+
+    Args:
+        databases: The database settings of the parent process, which may
+            differ from the settings module, such as in tests.
+    """
+    settings.DATABASES = databases
+    django.setup()
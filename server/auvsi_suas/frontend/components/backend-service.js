@@ -25,6 +25,17 @@ Backend = function($resource) {
      */
     this.teamsResource = $resource('/api/teams');
 
+    /**
+     * @export @const {!Object} Evaluation job submission interface.
+     */
+    this.missionEvaluationJobsResource = $resource(
+            '/api/missions/:missionId/evaluation_jobs');
+
+    /**
+     * @export @const {!Object} Evaluation jobs interface.
+     */
+    this.evaluationJobResource = $resource('/api/evaluation_jobs/:id');
+
     /**
      * @export @const {!Object} Odlc review interface.
      */
@@ -6,13 +6,17 @@
 /**
  * Controller for the Evaluate Teams page.
  * @param {!angular.$window} $window The window service.
+ * @param {!angular.$routeParams} $routeParams The route params service.
+ * @param {!angular.$timeout} $timeout The timeout service.
+ * @param {!angular.Scope} $scope The scope service.
  * @param {!Object} Backend The backend service.
  * @final
  * @constructor
  * @struct
  * @ngInject
  */
-EvaluateTeamsCtrl = function($window, $routeParams, Backend) {
+EvaluateTeamsCtrl = function($window, $routeParams, $timeout, $scope,
+                             Backend) {
     /**
      * @export {?Array<Object>} The teams for evaluation.
      */
@@ -23,11 +27,34 @@ EvaluateTeamsCtrl = function($window, $routeParams, Backend) {
      */
     this.selectedTeamId = "-1";
 
+    /**
+     * @export {?Object} The last submitted evaluation job.
+     */
+    this.job = null;
+
     /**
      * @private @const {!angular.$window} The window service.
      */
     this.window_ = $window;
 
+    /**
+     * @private @const {!angular.$timeout} The timeout service.
+     */
+    this.timeout_ = $timeout;
+
+    /**
+     * @private @const {!Object} The backend service.
+     */
+    this.backend_ = Backend;
+
+    /**
+     * @private {boolean} Whether the page is still displayed.
+     */
+    this.active_ = true;
+    $scope.$on("$destroy", angular.bind(this, function() {
+        this.active_ = false;
+    }));
+
     /**
      * @private @const {integer} The mission ID for evaluation.
      */
@@ -40,20 +67,53 @@ EvaluateTeamsCtrl = function($window, $routeParams, Backend) {
 
 
 /**
- * Evaluates the teams and renders the result.
+ * Submits an evaluation of the teams, and downloads the result when done.
+ * An identical evaluation in progress is joined rather than started again.
  * @export
  */
 EvaluateTeamsCtrl.prototype.evaluate = function() {
     // Determine query from selected team.
+    var params = {missionId: this.missionId_};
     var id = parseInt(this.selectedTeamId, 10);
-    var query = '';
     if (id != -1) {
-        query = '?team=' + id;
+        params['team'] = id;
     }
 
-    // Open evaluation in new tab.
-    this.window_.open('/api/missions/' + this.missionId_ + '/evaluate.zip'+ query,
-                      '_blank');
+    this.backend_.missionEvaluationJobsResource.save(params, {}).$promise
+        .then(angular.bind(this, this.setJob_));
+};
+
+
+/**
+ * Gets the URL of the job's result.
+ * @param {!Object} job The evaluation job.
+ * @return {string} The URL.
+ * @export
+ */
+EvaluateTeamsCtrl.prototype.resultUrl = function(job) {
+    return '/api/evaluation_jobs/' + job.id + '/result.zip';
+};
+
+
+/**
+ * Sets the job, polling it until finished.
+ * @param {!Object} job The evaluation job.
+ * @private
+ */
+EvaluateTeamsCtrl.prototype.setJob_ = function(job) {
+    this.job = job;
+    if (!this.active_ || job.status == 'FAILED') {
+        return;
+    }
+    if (job.status == 'SUCCEEDED') {
+        // The result is an attachment, so is downloaded without leaving.
+        this.window_.location.href = this.resultUrl(job);
+        return;
+    }
+    this.timeout_(angular.bind(this, function() {
+        this.backend_.evaluationJobResource.get({id: job.id}).$promise
+            .then(angular.bind(this, this.setJob_));
+    }), 1000);
 };
 
 
@@ -71,6 +131,8 @@ EvaluateTeamsCtrl.prototype.setTeams_ = function(teams) {
 angular.module('auvsiSuasApp').controller('EvaluateTeamsCtrl', [
     '$window',
     '$routeParams',
+    '$timeout',
+    '$scope',
     'Backend',
     EvaluateTeamsCtrl
 ]);
@@ -6,7 +6,8 @@
 /**
  * Controller for the Mission Dashboard page.
  * @param {!angular.$routeParams} $routeParams The route parameter service.
- * @param {!angular.$interval} $interval The interval service.
+ * @param {!angular.$timeout} $timeout The timeout service.
+ * @param {!angular.$window} $window The window service.
  * @param {!angular.Scope} $scope The scope of the controller to listen for events.
  * @param {!Object} Backend The backend service.
  * @final
@@ -14,21 +15,27 @@
  * @struct
  * @ngInject
  */
-MissionDashboardCtrl = function($routeParams, $interval, $scope, Backend) {
+MissionDashboardCtrl = function(
+        $routeParams, $timeout, $window, $scope, Backend) {
     /**
      * @export {?Object} The teams data.
      */
     this.teams = null;
 
+    /**
+     * @private {string} Cursor of the teams data, to get changes after it.
+     */
+    this.cursor_ = '';
+
     /**
      * @private @const {!angular.$routeParams} The route params service.
      */
     this.routeParams_ = $routeParams;
 
     /**
-     * @private {!angular.$interval} $interval The interval service.
+     * @private {!angular.$timeout} $timeout The timeout service.
      */
-    this.interval_ = $interval;
+    this.timeout_ = $timeout;
 
     /**
      * @private @const {!Object} The backend service.
@@ -36,40 +43,108 @@ MissionDashboardCtrl = function($routeParams, $interval, $scope, Backend) {
     this.backend_ = Backend;
 
     /**
-     * @private @const {!Object} Data sync every 1s.
+     * @private @const {!angular.Scope} The scope of the controller.
+     */
+    this.scope_ = $scope;
+
+    /**
+     * @private {boolean} Whether the page is still displayed.
+     */
+    this.active_ = true;
+
+    /**
+     * @private {?EventSource} Stream of changes to the teams data.
      */
-    this.updateInterval_ = this.interval_(
-            angular.bind(this, this.update_), 1000);
+    this.events_ = null;
+
+    // Data is pushed by the event stream if available, otherwise synced by
+    // waiting for changes.
+    if ($window.EventSource) {
+        this.stream_($window.EventSource);
+    } else {
+        this.update_();
+    }
     $scope.$on("$destroy", angular.bind(this, function() {
-        this.interval_.cancel(this.updateInterval_);
-        this.updateInterval_ = null;
+        this.active_ = false;
+        if (this.events_) {
+            this.events_.close();
+            this.events_ = null;
+        }
     }));
 };
 
+
+/**
+ * Streams changes to data, falling back to waiting for changes if the stream
+ * isn't served.
+ * @param {function(new:EventSource, string)} EventSource The EventSource type.
+ * @private
+ */
+MissionDashboardCtrl.prototype.stream_ = function(EventSource) {
+    this.events_ = new EventSource('/events/teams');
+    this.events_.onmessage = angular.bind(this, function(event) {
+        this.scope_.$apply(angular.bind(this, function() {
+            this.setTeams_(angular.fromJson(event.data));
+        }));
+    });
+    this.events_.onerror = angular.bind(this, function() {
+        // Closed streams aren't reconnected, e.g. if not served.
+        if (this.events_.readyState == EventSource.CLOSED) {
+            this.events_ = null;
+            this.update_();
+        }
+    });
+};
+
 /**
- * Executes asynchronous updates for data.
+ * Executes asynchronous updates for data, waiting for changes.
  * @private
  */
 MissionDashboardCtrl.prototype.update_ = function() {
-    this.backend_.teamsResource.query({}).$promise
-        .then(angular.bind(this, this.setTeams_));
+    if (!this.active_) {
+        return;
+    }
+    // Updates at most every 1s, while teams change often.
+    var next = Date.now() + 1000;
+    var updateLater = angular.bind(this, function() {
+        this.timeout_(angular.bind(this, this.update_),
+                      Math.max(0, next - Date.now()));
+    });
+    this.backend_.teamsResource.get({since: this.cursor_}).$promise
+        .then(angular.bind(this, function(delta) {
+            this.setTeams_(delta);
+            updateLater();
+        }), updateLater);
 };
 
 
 /**
- * Sets the teams.
- * @param {Array<Object>} teams The teams to set.
+ * Sets the teams from changes to them.
+ * @param {Object} delta The changes to the teams.
  * @private
  */
-MissionDashboardCtrl.prototype.setTeams_ = function(teams) {
+MissionDashboardCtrl.prototype.setTeams_ = function(delta) {
+    var teams = delta.full ? [] : (this.teams || []).slice();
+    angular.forEach(delta.teams || [], function(team) {
+        var ix = teams.findIndex(function(t) {
+            return t.team.id == team.team.id;
+        });
+        if (ix < 0) {
+            teams.push(team);
+        } else {
+            teams[ix] = team;
+        }
+    });
     this.teams = teams;
+    this.cursor_ = delta.cursor;
 };
 
 
 // Register controller with app.
 angular.module('auvsiSuasApp').controller('MissionDashboardCtrl', [
     '$routeParams',
-    '$interval',
+    '$timeout',
+    '$window',
     '$scope',
     'Backend',
     MissionDashboardCtrl
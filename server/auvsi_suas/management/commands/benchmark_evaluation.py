@@ -0,0 +1,195 @@
+"""Command to benchmark evaluation on a synthetic flight."""
+
+import datetime
+import logging
+import math
+import numpy as np
+import time
+from auvsi_suas.models import distance
+from auvsi_suas.models.flight_telemetry import FlightTelemetry
+from auvsi_suas.models.gps_position import GpsPosition
+from auvsi_suas.models.stationary_obstacle import StationaryObstacle
+from auvsi_suas.models.uas_telemetry import TelemetryTrack
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from auvsi_suas.models.waypoint import Waypoint
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+logger = logging.getLogger(__name__)
+
+# Center of the synthetic mission.
+BENCHMARK_LATITUDE = 38.145
+BENCHMARK_LONGITUDE = -76.428
+# Radius of the circuit flown through the waypoints, in degrees.
+BENCHMARK_CIRCUIT_DEGREES = 0.005
+# Altitude of the waypoints and flight.
+BENCHMARK_ALTITUDE_FT = 200
+# Time to fly the circuit once.
+BENCHMARK_CIRCUIT_SEC = 120
+# Radius and height of the obstacles.
+BENCHMARK_OBSTACLE_RADIUS_FT = 50
+BENCHMARK_OBSTACLE_HEIGHT_FT = 400
+
+DEFAULT_MINUTES = 30
+DEFAULT_RATE_HZ = 2
+DEFAULT_WAYPOINTS = 10
+DEFAULT_OBSTACLES = 10
+DEFAULT_REPEAT = 3
+
+
+def _circuit_position(angle, offset=0):
+    """Gets the (latitude, longitude) at an angle around the circuit."""
+    radius = BENCHMARK_CIRCUIT_DEGREES * (1 + offset)
+    return (BENCHMARK_LATITUDE + radius * math.sin(angle),
+            BENCHMARK_LONGITUDE + radius * math.cos(angle))
+
+
+def synthetic_flight(minutes, rate_hz, num_waypoints, num_obstacles):
+    """Creates an unsaved flight circling through waypoints.
+
+    Obstacles are placed between the waypoints, alternately on and beside the
+    circuit.
+
+    Args:
+        minutes: Duration of the flight.
+        rate_hz: Rate of the telemetry.
+        num_waypoints: Number of waypoints on the circuit.
+        num_obstacles: Number of obstacles.
+    Returns:
+        A (home_pos, waypoints, obstacles, logs) tuple of unsaved models.
+    """
+    home_pos = GpsPosition(latitude=BENCHMARK_LATITUDE,
+                           longitude=BENCHMARK_LONGITUDE)
+    waypoints = []
+    for ix in range(num_waypoints):
+        latitude, longitude = _circuit_position(2 * math.pi * ix /
+                                                num_waypoints)
+        waypoints.append(
+            Waypoint(order=ix,
+                     latitude=latitude,
+                     longitude=longitude,
+                     altitude_msl=BENCHMARK_ALTITUDE_FT))
+    obstacles = []
+    for ix in range(num_obstacles):
+        latitude, longitude = _circuit_position(
+            2 * math.pi * (ix + 0.5) / num_obstacles, 0.1 * (ix % 2))
+        obstacles.append(
+            StationaryObstacle(latitude=latitude,
+                               longitude=longitude,
+                               cylinder_radius=BENCHMARK_OBSTACLE_RADIUS_FT,
+                               cylinder_height=BENCHMARK_OBSTACLE_HEIGHT_FT))
+
+    user = User(username='benchmark')
+    start = datetime.datetime(2020, 6, 1, tzinfo=datetime.timezone.utc)
+    logs = []
+    for ix in range(int(minutes * 60 * rate_hz)):
+        t = ix / rate_hz
+        angle = 2 * math.pi * t / BENCHMARK_CIRCUIT_SEC
+        latitude, longitude = _circuit_position(angle)
+        logs.append(
+            UasTelemetry(user=user,
+                         timestamp=start + datetime.timedelta(seconds=t),
+                         latitude=latitude,
+                         longitude=longitude,
+                         altitude_msl=BENCHMARK_ALTITUDE_FT + 20 * math.sin(t),
+                         uas_heading=math.degrees(angle) % 360))
+    return home_pos, waypoints, obstacles, logs
+
+
+def sampled_collisions(obstacles, logs):
+    """Evaluates collisions at each interpolated position, for comparison.
+
+    Returns:
+        A list of whether each obstacle was hit.
+    """
+    track = UasTelemetry.interpolate(TelemetryTrack.from_logs(logs))
+    hits = []
+    for obst in obstacles:
+        dist_to_center = distance.distance_to_array(track.latitude,
+                                                    track.longitude, 0,
+                                                    obst.latitude,
+                                                    obst.longitude, 0)
+        hits.append(
+            bool(
+                np.any((track.altitude_msl <= obst.cylinder_height)
+                       & (dist_to_center <= obst.cylinder_radius))))
+    return hits
+
+
+def exact_collisions(obstacles, logs):
+    """Evaluates collisions as in evaluation.
+
+    Returns:
+        A list of whether each obstacle was hit.
+    """
+    track = TelemetryTrack.from_logs(logs)
+    return [obst.evaluate_track(track).hit for obst in obstacles]
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks evaluation of a synthetic flight, reporting the best '
+            'time of each evaluator and the time of each stage of '
+            'evaluation. Doesn\'t use the database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes',
+                            type=float,
+                            default=DEFAULT_MINUTES,
+                            help='Duration of the flight.')
+        parser.add_argument('--rate-hz',
+                            type=float,
+                            default=DEFAULT_RATE_HZ,
+                            help='Rate of the flight\'s telemetry.')
+        parser.add_argument('--waypoints',
+                            type=int,
+                            default=DEFAULT_WAYPOINTS,
+                            help='Number of waypoints.')
+        parser.add_argument('--obstacles',
+                            type=int,
+                            default=DEFAULT_OBSTACLES,
+                            help='Number of stationary obstacles.')
+        parser.add_argument('--repeat',
+                            type=int,
+                            default=DEFAULT_REPEAT,
+                            help='Times to run each evaluator.')
+
+    def handle(self, *args, **options):
+        if options['minutes'] <= 0 or options['rate_hz'] <= 0:
+            raise CommandError('--minutes and --rate-hz must be positive.')
+        if options['waypoints'] <= 0 or options['repeat'] <= 0:
+            raise CommandError('--waypoints and --repeat must be positive.')
+
+        if options['obstacles'] < 0:
+            raise CommandError('--obstacles must not be negative.')
+
+        home_pos, waypoints, obstacles, logs = synthetic_flight(
+            options['minutes'], options['rate_hz'], options['waypoints'],
+            options['obstacles'])
+        self.stdout.write(
+            'Flight of %d telemetry, %d waypoints, %d obstacles.' %
+            (len(logs), len(waypoints), len(obstacles)))
+
+        evaluators = [
+            ('satisfied_waypoints', lambda: UasTelemetry.satisfied_waypoints(
+                home_pos, waypoints, logs)),
+            ('obstacles_sampled', lambda: sampled_collisions(obstacles, logs)),
+            ('obstacles', lambda: exact_collisions(obstacles, logs)),
+        ]
+        for name, evaluate in evaluators:
+            times = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                evaluate()
+                times.append(time.perf_counter() - start)
+            self.stdout.write('%s: %.3f s' % (name, min(times)))
+
+        # Stages of evaluation with telemetry prepared once.
+        telemetry = FlightTelemetry([TelemetryTrack.from_logs(logs)])
+        with telemetry.timed('waypoints'):
+            UasTelemetry.satisfied_waypoints_track(waypoints,
+                                                   telemetry.interpolated)
+        with telemetry.timed('obstacles'):
+            for obst in obstacles:
+                obst.evaluate_track(telemetry.track)
+        self.stdout.write('stages: %s' % telemetry.format_timings())
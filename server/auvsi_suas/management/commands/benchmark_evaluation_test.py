@@ -0,0 +1,42 @@
+"""Tests for the benchmark_evaluation command."""
+
+import io
+from auvsi_suas.management.commands.benchmark_evaluation import exact_collisions
+from auvsi_suas.management.commands.benchmark_evaluation import sampled_collisions
+from auvsi_suas.management.commands.benchmark_evaluation import synthetic_flight
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+
+class TestBenchmarkEvaluation(TestCase):
+    """Tests the benchmark_evaluation command."""
+    def test_synthetic_flight(self):
+        """Tests the flight hits its waypoints and alternate obstacles."""
+        home_pos, waypoints, obstacles, logs = synthetic_flight(4, 1, 5, 4)
+        self.assertEqual(240, len(logs))
+        for evaluation in UasTelemetry.satisfied_waypoints(
+                home_pos, waypoints, logs):
+            self.assertGreater(evaluation.score_ratio, 0)
+        self.assertEqual([True, False, True, False],
+                         exact_collisions(obstacles, logs))
+        self.assertEqual([True, False, True, False],
+                         sampled_collisions(obstacles, logs))
+
+    def test_benchmark(self):
+        out = io.StringIO()
+        with self.assertNumQueries(0):
+            call_command('benchmark_evaluation',
+                         '--minutes=1',
+                         '--repeat=1',
+                         stdout=out)
+        self.assertIn('satisfied_waypoints:', out.getvalue())
+        self.assertIn('obstacles:', out.getvalue())
+        self.assertIn('stages: dedupe', out.getvalue())
+
+    def test_invalid(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_evaluation', '--minutes=0')
+        with self.assertRaises(CommandError):
+            call_command('benchmark_evaluation', '--obstacles=-1')
@@ -0,0 +1,217 @@
+"""Command to downsample and purge old telemetry."""
+
+import array
+import datetime
+import time
+from auvsi_suas.models import telemetry_cache
+from auvsi_suas.models import telemetry_dedupe
+from auvsi_suas.models.flight_track import FlightTrack
+from auvsi_suas.models.mission_config import MissionConfig
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.telemetry_rate import TelemetryRate
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# Default rate to downsample telemetry outside of flights to.
+DEFAULT_RATE_HZ = 1.0
+# Default age of telemetry before it is compacted, so telemetry of a flight
+# which hasn't been marked by takeoff and landing events isn't downsampled.
+DEFAULT_MIN_AGE_HOURS = 24
+# Default number of telemetry deleted per transaction.
+DEFAULT_CHUNK_SIZE = 5000
+# Default pause between deletes, to let other queries through.
+DEFAULT_PAUSE_MS = 100
+# Downsampling buckets are aligned to the epoch.
+DOWNSAMPLE_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def flight_periods(user):
+    """Gets the flights of the user across all missions."""
+    periods = []
+    missions = MissionConfig.objects.filter(
+        pk__in=TakeoffOrLandingEvent.objects.filter(
+            user=user).values('mission_id'))
+    for mission in missions:
+        periods.extend(TakeoffOrLandingEvent.flights(mission, user))
+    return periods
+
+
+def in_flight_query(periods):
+    """Builds a query matching telemetry within any of the periods.
+
+    Periods are treated as closed, and open ended periods as unbounded.
+    """
+    query = Q(pk__in=[])
+    for period in periods:
+        period_query = Q()
+        if period.start is not None:
+            period_query &= Q(timestamp__gte=period.start)
+        if period.end is not None:
+            period_query &= Q(timestamp__lte=period.end)
+        query |= period_query
+    return query
+
+
+def average_row_bytes():
+    """Estimates the storage of a telemetry row, including indexes.
+
+    Returns:
+        The average bytes, or None if not supported by the database.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    count = UasTelemetry.objects.count()
+    if not count:
+        return None
+    with connection.cursor() as cursor:
+        # Sums over partitions, if the table is partitioned.
+        cursor.execute(
+            'SELECT COALESCE(SUM(pg_total_relation_size(relid)), '
+            'pg_total_relation_size(%s::regclass)) '
+            'FROM pg_partition_tree(%s::regclass)',
+            [UasTelemetry._meta.db_table] * 2)
+        return cursor.fetchone()[0] / count
+
+
+class Command(BaseCommand):
+    help = ('Compacts old telemetry. Telemetry within flights, as marked by '
+            'takeoff and landing events, is kept at full rate, and telemetry '
+            'outside of flights is downsampled. Optionally purges all '
+            'telemetry older than a retention window.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rate-hz',
+            type=float,
+            default=DEFAULT_RATE_HZ,
+            help='Rate to downsample telemetry outside of flights to.')
+        parser.add_argument('--min-age-hours',
+                            type=float,
+                            default=DEFAULT_MIN_AGE_HOURS,
+                            help='Only downsample telemetry older than this.')
+        parser.add_argument(
+            '--retention-days',
+            type=float,
+            help='Delete all telemetry, and flight tracks, older than this.')
+        parser.add_argument('--user',
+                            help='Only compact telemetry of this user.')
+        parser.add_argument('--chunk-size',
+                            type=int,
+                            default=DEFAULT_CHUNK_SIZE,
+                            help='Telemetry deleted per transaction.')
+        parser.add_argument('--pause-ms',
+                            type=float,
+                            default=DEFAULT_PAUSE_MS,
+                            help='Pause between deletes.')
+        parser.add_argument('--dry-run',
+                            action='store_true',
+                            help='Report what would be deleted.')
+
+    def handle(self, *args, **options):
+        if options['rate_hz'] <= 0:
+            raise CommandError('--rate-hz must be positive.')
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive.')
+        self.options = options
+
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError('Unknown user: %s' % options['user'])
+
+        row_bytes = average_row_bytes()
+        now = timezone.now()
+        purged = 0
+        retention_cutoff = None
+        if options['retention_days'] is not None:
+            retention_cutoff = now - datetime.timedelta(
+                days=options['retention_days'])
+            purged = self.purge(users, retention_cutoff)
+
+        downsampled = 0
+        cutoff = now - datetime.timedelta(hours=options['min_age_hours'])
+        period = datetime.timedelta(seconds=1.0 / options['rate_hz'])
+        for user in users:
+            deleted = self.downsample(user, retention_cutoff, cutoff, period)
+            if deleted:
+                self.stdout.write('Downsampled %d telemetry of %s.' %
+                                  (deleted, user.username))
+            downsampled += deleted
+
+        total = purged + downsampled
+        self.stdout.write(
+            '%s %d telemetry (%d purged, %d downsampled), reclaiming %s.' %
+            ('Would delete' if options['dry_run'] else 'Deleted', total,
+             purged, downsampled, 'an unknown number of bytes'
+             if row_bytes is None else '~%d bytes' % (total * row_bytes)))
+
+    def delete_chunk(self, ids):
+        """Deletes a chunk of telemetry in its own transaction."""
+        if self.options['dry_run']:
+            return
+        with transaction.atomic():
+            UasTelemetry.objects.filter(pk__in=ids).delete()
+        time.sleep(self.options['pause_ms'] / 1000.0)
+
+    def purge(self, users, cutoff):
+        """Deletes telemetry and flight tracks before the cutoff."""
+        query = UasTelemetry.objects.filter(user__in=users,
+                                            timestamp__lt=cutoff)
+        if self.options['dry_run']:
+            return query.count()
+
+        FlightTrack.objects.filter(user__in=users, end__lt=cutoff).delete()
+        TelemetryRate.invalidate(users, end=cutoff)
+        deleted = 0
+        while True:
+            ids = list(
+                query.values_list('pk',
+                                  flat=True)[:self.options['chunk_size']])
+            if not ids:
+                telemetry_cache.invalidate([u.pk for u in users])
+                telemetry_dedupe.clear()
+                return deleted
+            self.delete_chunk(ids)
+            deleted += len(ids)
+
+    def downsample(self, user, start, end, period):
+        """Downsamples telemetry of the user outside of flights.
+
+        Keeps the first telemetry within each period long bucket.
+
+        Args:
+            user: The user to downsample telemetry of.
+            start: Optional. Inclusive start time, after purged telemetry.
+            end: Exclusive end time.
+            period: The period between kept telemetry.
+
+        Returns:
+            The number of deleted telemetry.
+        """
+        query = UasTelemetry.by_user(user, start, end).exclude(
+            in_flight_query(flight_periods(user)))
+        ids = array.array('q')
+        last_bucket = None
+        for pk, timestamp in query.values_list(
+                'pk',
+                'timestamp').iterator(chunk_size=self.options['chunk_size']):
+            bucket = (timestamp - DOWNSAMPLE_EPOCH) // period
+            if bucket == last_bucket:
+                ids.append(pk)
+            last_bucket = bucket
+
+        chunk_size = self.options['chunk_size']
+        for start in range(0, len(ids), chunk_size):
+            self.delete_chunk(ids[start:start + chunk_size].tolist())
+        if ids and not self.options['dry_run']:
+            # The deleted telemetry may be the user's latest or recent.
+            telemetry_cache.invalidate([user.pk])
+            telemetry_dedupe.clear()
+        return len(ids)
@@ -0,0 +1,126 @@
+"""Tests for the compact_telemetry command."""
+
+import datetime
+import io
+from auvsi_suas.models import telemetry_cache
+from auvsi_suas.models import test_utils
+from auvsi_suas.models.flight_track import FlightTrack
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+
+class TestCompactTelemetry(TestCase):
+    """Tests the compact_telemetry command."""
+    def setUp(self):
+        self.superuser = User.objects.create_superuser('superuser',
+                                                       'email@example.com',
+                                                       'superpass')
+        self.user = User.objects.create_user('user', 'email@example.com',
+                                             'pass')
+        self.mission = test_utils.create_sample_mission(self.superuser)
+        self.start = datetime.datetime(2020, 6, 1, tzinfo=timezone.utc)
+
+        # 10 Hz telemetry for 60 seconds.
+        UasTelemetry.objects.bulk_create([
+            UasTelemetry(user=self.user,
+                         timestamp=self.timestamp(ix / 10.0),
+                         latitude=38,
+                         longitude=-76,
+                         altitude_msl=100,
+                         uas_heading=90) for ix in range(600)
+        ])
+
+    def timestamp(self, offset_sec):
+        return self.start + datetime.timedelta(seconds=offset_sec)
+
+    def create_event(self, offset_sec, uas_in_air):
+        TakeoffOrLandingEvent(user=self.user,
+                              mission=self.mission,
+                              timestamp=self.timestamp(offset_sec),
+                              uas_in_air=uas_in_air).save()
+
+    def call(self, **kwargs):
+        out = io.StringIO()
+        call_command('compact_telemetry', stdout=out, pause_ms=0, **kwargs)
+        return out.getvalue()
+
+    def count(self, start_sec, end_sec):
+        return UasTelemetry.by_user(self.user, self.timestamp(start_sec),
+                                    self.timestamp(end_sec)).count()
+
+    def test_downsample_outside_flights(self):
+        """Tests telemetry in flights is kept, and downsampled outside."""
+        self.create_event(20, True)
+        self.create_event(40, False)
+
+        out = self.call(rate_hz=1, chunk_size=7)
+        # Inclusive of the landing time.
+        self.assertEqual(201, self.count(20, 40.05))
+        self.assertEqual(20, self.count(0, 20))
+        self.assertEqual(20, self.count(40.05, 60))
+        self.assertIn('Deleted 359 telemetry', out)
+        self.assertIn('bytes', out)
+
+        # Compacting is idempotent.
+        out = self.call(rate_hz=1)
+        self.assertIn('Deleted 0 telemetry', out)
+
+    def test_downsample_invalidates_cache(self):
+        """Tests cached latest telemetry deleted by downsampling is reread."""
+        telemetry, _ = telemetry_cache.latest([self.user])[self.user.pk]
+        self.assertEqual(self.timestamp(59.9), telemetry.timestamp)
+
+        self.call(rate_hz=1)
+        telemetry, _ = telemetry_cache.latest([self.user])[self.user.pk]
+        self.assertEqual(self.timestamp(59), telemetry.timestamp)
+
+    def test_open_flight(self):
+        """Tests telemetry after an open takeoff is kept."""
+        self.create_event(30, True)
+        self.call(rate_hz=1)
+        self.assertEqual(300, self.count(30, 60))
+        self.assertEqual(30, self.count(0, 30))
+
+    def test_min_age(self):
+        """Tests recent telemetry isn't downsampled."""
+        self.call(rate_hz=1, min_age_hours=24 * 365 * 100)
+        self.assertEqual(600, self.count(0, 60))
+
+    def test_dry_run(self):
+        out = self.call(rate_hz=1, dry_run=True, retention_days=0)
+        self.assertEqual(600, self.count(0, 60))
+        self.assertIn('Would delete 600 telemetry (600 purged, 0', out)
+
+    def test_retention(self):
+        """Tests telemetry and tracks older than retention are purged."""
+        self.create_event(20, True)
+        self.create_event(40, False)
+        self.assertEqual(1, FlightTrack.objects.count())
+        other = User.objects.create_user('other', 'email@example.com', 'pass')
+        UasTelemetry(user=other,
+                     latitude=38,
+                     longitude=-76,
+                     altitude_msl=100,
+                     uas_heading=90).save()
+
+        out = self.call(retention_days=1, chunk_size=100)
+        self.assertEqual(0, self.count(0, 60))
+        self.assertEqual(1, UasTelemetry.by_user(other).count())
+        self.assertEqual(0, FlightTrack.objects.count())
+        self.assertIn('600 purged', out)
+
+    def test_user(self):
+        other = User.objects.create_user('other', 'email@example.com', 'pass')
+        self.call(rate_hz=1, user='other')
+        self.assertEqual(600, self.count(0, 60))
+        with self.assertRaises(CommandError):
+            self.call(user='unknown')
+
+    def test_invalid_rate(self):
+        with self.assertRaises(CommandError):
+            self.call(rate_hz=0)
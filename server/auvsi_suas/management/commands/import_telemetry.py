@@ -0,0 +1,296 @@
+"""Command to bulk import telemetry from log files."""
+
+import array
+import csv
+import datetime
+import io
+import iso8601
+import logging
+import numpy as np
+import os
+import time
+from auvsi_suas.models import telemetry_cache
+from auvsi_suas.models import units
+from auvsi_suas.models.mission_config import MissionConfig
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.telemetry_rate import TelemetryRate
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from auvsi_suas.proto import interop_api_pb2
+from auvsi_suas.views.telemetry import validate_telemetry_proto
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db import transaction
+from google.protobuf import json_format
+from pymavlink import mavutil
+
+logger = logging.getLogger(__name__)
+
+# Number of telemetry to insert per COPY or bulk_create.
+IMPORT_CHUNK_SIZE = 10000
+# Default time without telemetry which separates flights, for --create-events.
+DEFAULT_FLIGHT_GAP_SEC = 60
+# Formats by file extension.
+FORMATS_BY_EXTENSION = {
+    '.tlog': 'tlog',
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+# Timestamps of imported telemetry are tracked as integer microseconds.
+IMPORT_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+IMPORT_TIME_UNIT = datetime.timedelta(microseconds=1)
+
+
+def read_tlog(path):
+    """Reads telemetry from the GLOBAL_POSITION_INT packets of a MAVLink tlog.
+
+    Yields:
+        (timestamp, Telemetry) tuples, timestamped by when the packet was
+        logged.
+    """
+    mav = mavutil.mavlink_connection(path)
+    while True:
+        msg = mav.recv_match(type='GLOBAL_POSITION_INT')
+        if msg is None:
+            return
+        telemetry = interop_api_pb2.Telemetry()
+        telemetry.latitude = msg.lat / 1e7
+        telemetry.longitude = msg.lon / 1e7
+        telemetry.altitude = units.meters_to_feet(msg.alt / 1000.0)
+        telemetry.heading = msg.hdg / 100.0
+        yield (datetime.datetime.fromtimestamp(msg._timestamp,
+                                               tz=datetime.timezone.utc),
+               telemetry)
+
+
+def read_csv(path):
+    """Reads telemetry from a CSV file.
+
+    The CSV must have a header naming the columns timestamp, latitude,
+    longitude, altitude and heading, in the units of the Telemetry proto.
+    Timestamps are ISO formatted.
+
+    Yields:
+        (timestamp, Telemetry) tuples.
+    """
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            telemetry = interop_api_pb2.Telemetry()
+            telemetry.latitude = float(row['latitude'])
+            telemetry.longitude = float(row['longitude'])
+            telemetry.altitude = float(row['altitude'])
+            telemetry.heading = float(row['heading'])
+            yield (iso8601.parse_date(row['timestamp']), telemetry)
+
+
+def read_ndjson(path):
+    """Reads telemetry from a file of JSON formatted Telemetry, one per line.
+
+    Each Telemetry must have its timestamp set.
+
+    Yields:
+        (timestamp, Telemetry) tuples.
+    """
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            telemetry = interop_api_pb2.Telemetry()
+            json_format.Parse(line, telemetry)
+            if not telemetry.HasField('timestamp'):
+                raise ValueError('Telemetry missing timestamp.')
+            yield (iso8601.parse_date(telemetry.timestamp), telemetry)
+
+
+READERS = {
+    'tlog': read_tlog,
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+
+
+class Command(BaseCommand):
+    help = ('Bulk imports telemetry for a team from MAVLink tlogs, CSV files '
+            'or NDJSON files of Telemetry protos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='Files to import.')
+        parser.add_argument('--user',
+                            required=True,
+                            help='Username of the team the telemetry is for.')
+        parser.add_argument('--format',
+                            choices=sorted(READERS.keys()),
+                            help='Format of the files. Default by extension.')
+        parser.add_argument(
+            '--create-events',
+            action='store_true',
+            help='Create takeoff and landing events around each flight.')
+        parser.add_argument('--mission',
+                            type=int,
+                            help='ID of the mission, for --create-events.')
+        parser.add_argument(
+            '--flight-gap-sec',
+            type=float,
+            default=DEFAULT_FLIGHT_GAP_SEC,
+            help='Time without telemetry which separates flights, for '
+            '--create-events.')
+        parser.add_argument('--chunk-size',
+                            type=int,
+                            default=IMPORT_CHUNK_SIZE,
+                            help='Telemetry per insert.')
+        parser.add_argument('--no-copy',
+                            action='store_true',
+                            help='Insert with bulk_create instead of COPY.')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError('Unknown user: %s' % options['user'])
+
+        mission = None
+        if options['create_events']:
+            if options['mission'] is None:
+                raise CommandError('--create-events requires --mission.')
+            try:
+                mission = MissionConfig.objects.get(pk=options['mission'])
+            except MissionConfig.DoesNotExist:
+                raise CommandError('Unknown mission: %d' % options['mission'])
+
+        readers = []
+        for path in options['files']:
+            file_format = options['format']
+            if file_format is None:
+                ext = os.path.splitext(path)[1].lower()
+                if ext not in FORMATS_BY_EXTENSION:
+                    raise CommandError('Unknown format of file: %s' % path)
+                file_format = FORMATS_BY_EXTENSION[ext]
+            readers.append((path, READERS[file_format]))
+
+        use_copy = (not options['no_copy']
+                    and connection.vendor == 'postgresql')
+        insert = self._insert_copy if use_copy else self._insert_bulk_create
+
+        start = time.time()
+        timestamps_us = array.array('q')
+        invalid = 0
+        with transaction.atomic():
+            for path, reader in readers:
+                self.stdout.write('Importing %s.' % path)
+                chunk = []
+                try:
+                    for timestamp, telemetry in reader(path):
+                        try:
+                            validate_telemetry_proto(telemetry)
+                        except ValueError as e:
+                            invalid += 1
+                            logger.warning('Skipping invalid telemetry: %s', e)
+                            continue
+                        chunk.append((timestamp, telemetry))
+                        timestamps_us.append(
+                            (timestamp - IMPORT_EPOCH) // IMPORT_TIME_UNIT)
+                        if len(chunk) >= options['chunk_size']:
+                            insert(user, chunk)
+                            chunk = []
+                except (ValueError, KeyError, iso8601.ParseError,
+                        json_format.ParseError) as e:
+                    raise CommandError('Failed to read %s: %s' % (path, e))
+                if chunk:
+                    insert(user, chunk)
+
+            # Rates of flights weren't updated by the insert.
+            if timestamps_us:
+                TelemetryRate.invalidate(
+                    [user],
+                    IMPORT_EPOCH + min(timestamps_us) * IMPORT_TIME_UNIT,
+                    IMPORT_EPOCH + max(timestamps_us) * IMPORT_TIME_UNIT)
+
+            if mission is not None:
+                self._create_events(mission, user, timestamps_us,
+                                    options['flight_gap_sec'])
+            telemetry_cache.invalidate([user.pk])
+
+        self.stdout.write(
+            'Imported %d telemetry (%d invalid skipped) in %.1f sec using %s.'
+            % (len(timestamps_us), invalid, time.time() - start,
+               'COPY' if use_copy else 'bulk_create'))
+
+    def _insert_copy(self, user, chunk):
+        """Inserts a chunk of telemetry with a Postgres COPY."""
+        meta = UasTelemetry._meta
+        fields = [
+            'user', 'timestamp', 'latitude', 'longitude', 'altitude_msl',
+            'uas_heading'
+        ]
+        columns = ', '.join(
+            connection.ops.quote_name(meta.get_field(f).column)
+            for f in fields)
+
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for timestamp, telemetry in chunk:
+            writer.writerow([
+                user.pk,
+                timestamp.isoformat(),
+                repr(telemetry.latitude),
+                repr(telemetry.longitude),
+                repr(telemetry.altitude),
+                repr(telemetry.heading),
+            ])
+        buf.seek(0)
+
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                'COPY %s (%s) FROM STDIN WITH (FORMAT csv)' %
+                (connection.ops.quote_name(meta.db_table), columns), buf)
+
+    def _insert_bulk_create(self, user, chunk):
+        """Inserts a chunk of telemetry with bulk_create."""
+        UasTelemetry.objects.bulk_create([
+            UasTelemetry(user=user,
+                         timestamp=timestamp,
+                         latitude=telemetry.latitude,
+                         longitude=telemetry.longitude,
+                         altitude_msl=telemetry.altitude,
+                         uas_heading=telemetry.heading)
+            for timestamp, telemetry in chunk
+        ])
+
+    def _create_events(self, mission, user, timestamps_us, flight_gap_sec):
+        """Creates takeoff and landing events around the imported flights.
+
+        Flights are separated by gaps of at least flight_gap_sec without
+        telemetry.
+        """
+        if not timestamps_us:
+            return
+        timestamps_us = np.sort(np.frombuffer(timestamps_us, dtype=np.int64))
+        gaps = np.flatnonzero(np.diff(timestamps_us) >= flight_gap_sec * 1e6)
+        starts = np.concatenate(([0], gaps + 1))
+        ends = np.concatenate((gaps, [len(timestamps_us) - 1]))
+
+        to_datetime = lambda us: IMPORT_EPOCH + int(us) * IMPORT_TIME_UNIT
+        first = to_datetime(timestamps_us[0])
+        last = to_datetime(timestamps_us[-1])
+        if TakeoffOrLandingEvent.by_user(
+                user, first, last).filter(mission=mission).exists():
+            raise CommandError(
+                'Events already exist for %s between %s and %s.' %
+                (user.username, first, last))
+
+        for start_ix, end_ix in zip(starts, ends):
+            TakeoffOrLandingEvent(user=user,
+                                  mission=mission,
+                                  timestamp=to_datetime(
+                                      timestamps_us[start_ix]),
+                                  uas_in_air=True).save()
+            # Flights exclude their end time, so land just after the last
+            # telemetry.
+            TakeoffOrLandingEvent(user=user,
+                                  mission=mission,
+                                  timestamp=to_datetime(timestamps_us[end_ix] +
+                                                        1),
+                                  uas_in_air=False).save()
+        self.stdout.write('Created events for %d flights.' % len(starts))
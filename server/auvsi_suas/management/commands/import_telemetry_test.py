@@ -0,0 +1,177 @@
+"""Tests for the import_telemetry command."""
+
+import datetime
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+from auvsi_suas.models import test_utils
+from auvsi_suas.models.flight_track import FlightTrack
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from pymavlink import mavutil
+
+
+class TestImportTelemetry(TestCase):
+    """Tests the import_telemetry command."""
+    def setUp(self):
+        self.superuser = User.objects.create_superuser('superuser',
+                                                       'email@example.com',
+                                                       'superpass')
+        self.user = User.objects.create_user('user', 'email@example.com',
+                                             'pass')
+        self.mission = test_utils.create_sample_mission(self.superuser)
+        self.start = datetime.datetime(2020, 6, 1, tzinfo=timezone.utc)
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def timestamp(self, offset_sec):
+        return self.start + datetime.timedelta(seconds=offset_sec)
+
+    def write_csv(self, offsets_sec, name='telemetry.csv'):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write('timestamp,latitude,longitude,altitude,heading\n')
+            for offset_sec in offsets_sec:
+                f.write('%s,%r,%r,%r,%r\n' %
+                        (self.timestamp(offset_sec).isoformat(), 38 +
+                         offset_sec * 1e-5, -76.0, 100.0 + offset_sec, 90.0))
+        return path
+
+    def write_ndjson(self, offsets_sec):
+        path = os.path.join(self.dir, 'telemetry.ndjson')
+        with open(path, 'w') as f:
+            for offset_sec in offsets_sec:
+                f.write(
+                    json.
+                    dumps({
+                        'timestamp': self.timestamp(offset_sec).isoformat(),
+                        'latitude': 38 + offset_sec * 1e-5,
+                        'longitude': -76.0,
+                        'altitude': 100.0 + offset_sec,
+                        'heading': 90.0,
+                    }) + '\n')
+        return path
+
+    def write_tlog(self, offsets_sec):
+        path = os.path.join(self.dir, 'telemetry.tlog')
+        mav = mavutil.mavlink.MAVLink(None)
+        epoch = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+        with open(path, 'wb') as f:
+            for offset_sec in offsets_sec:
+                timestamp_us = ((self.timestamp(offset_sec) - epoch) //
+                                datetime.timedelta(microseconds=1))
+                msg = mav.global_position_int_encode(
+                    0, round((38 + offset_sec * 1e-5) * 1e7), int(-76 * 1e7),
+                    30480, 0, 0, 0, 0, 9000)
+                f.write(struct.pack('>Q', timestamp_us) + msg.pack(mav))
+        return path
+
+    def call(self, *args, **kwargs):
+        out = io.StringIO()
+        call_command('import_telemetry',
+                     *args,
+                     user='user',
+                     stdout=out,
+                     **kwargs)
+        return out.getvalue()
+
+    def assertImported(self, offsets_sec):
+        logs = UasTelemetry.by_user(self.user)
+        self.assertEqual(len(offsets_sec), len(logs))
+        for offset_sec, log in zip(offsets_sec, logs):
+            self.assertEqual(self.timestamp(offset_sec), log.timestamp)
+            self.assertAlmostEqual(38 + offset_sec * 1e-5, log.latitude)
+            self.assertAlmostEqual(-76, log.longitude)
+
+    def test_csv(self):
+        out = self.call(self.write_csv(range(10)))
+        self.assertImported(range(10))
+        self.assertIn('COPY', out)
+
+    def test_csv_bulk_create(self):
+        out = self.call(self.write_csv(range(10)), no_copy=True)
+        self.assertImported(range(10))
+        self.assertIn('bulk_create', out)
+
+    def test_chunks(self):
+        self.call(self.write_csv(range(25)), chunk_size=10)
+        self.assertImported(range(25))
+
+    def test_ndjson(self):
+        self.call(self.write_ndjson(range(10)))
+        self.assertImported(range(10))
+        self.assertAlmostEqual(
+            109,
+            UasTelemetry.by_user(self.user).last().altitude_msl)
+
+    def test_tlog(self):
+        self.call(self.write_tlog(range(10)))
+        self.assertImported(range(10))
+        log = UasTelemetry.by_user(self.user).first()
+        self.assertAlmostEqual(100, log.altitude_msl, places=3)
+        self.assertAlmostEqual(90, log.uas_heading)
+
+    def test_skips_invalid(self):
+        path = self.write_csv(range(3))
+        with open(path, 'a') as f:
+            f.write('%s,91,-76,100,90\n' % self.timestamp(3).isoformat())
+        out = self.call(path)
+        self.assertImported(range(3))
+        self.assertIn('1 invalid', out)
+
+    def test_malformed(self):
+        path = os.path.join(self.dir, 'telemetry.csv')
+        with open(path, 'w') as f:
+            f.write('timestamp,latitude,longitude,altitude,heading\n')
+            f.write('not a time,38,-76,100,90\n')
+        with self.assertRaises(CommandError):
+            self.call(path)
+        self.assertImported([])
+
+    def test_unknown_format(self):
+        with self.assertRaises(CommandError):
+            self.call(os.path.join(self.dir, 'telemetry.txt'))
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('import_telemetry',
+                         self.write_csv(range(3)),
+                         user='unknown')
+
+    def test_create_events(self):
+        """Tests events are created around each flight, with tracks."""
+        path = self.write_csv(list(range(10)) + list(range(100, 110)))
+        self.call(path, create_events=True, mission=self.mission.pk)
+
+        flights = TakeoffOrLandingEvent.flights(self.mission, self.user)
+        self.assertEqual(2, len(flights))
+        self.assertEqual(self.timestamp(0), flights[0].start)
+        self.assertEqual(self.timestamp(100), flights[1].start)
+        logs = UasTelemetry.by_time_period(self.user, flights)
+        self.assertEqual([10, 10], [len(l) for l in logs])
+        self.assertEqual(2, FlightTrack.objects.count())
+
+    def test_create_events_requires_mission(self):
+        with self.assertRaises(CommandError):
+            self.call(self.write_csv(range(3)), create_events=True)
+
+    def test_create_events_existing(self):
+        TakeoffOrLandingEvent(user=self.user,
+                              mission=self.mission,
+                              timestamp=self.timestamp(5),
+                              uas_in_air=True).save()
+        with self.assertRaises(CommandError):
+            self.call(self.write_csv(range(10)),
+                      create_events=True,
+                      mission=self.mission.pk)
+        self.assertImported([])
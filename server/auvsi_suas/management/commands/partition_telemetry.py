@@ -0,0 +1,66 @@
+"""Command to maintain the partitions of the telemetry table."""
+
+import datetime
+import iso8601
+from auvsi_suas.models import telemetry_partitions
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import DatabaseError
+from django.utils import timezone
+
+
+def parse_date(value):
+    try:
+        return iso8601.parse_date(value)
+    except iso8601.ParseError as e:
+        raise CommandError('Invalid date %s: %s' % (value, e))
+
+
+class Command(BaseCommand):
+    help = ('Creates upcoming partitions of the telemetry table, and detaches '
+            'old partitions. Converts the table to a partitioned table if '
+            'TELEMETRY_PARTITIONING is enabled.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='Date to create partitions from, such as the first day of a '
+            'competition with existing data. Default now.')
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.TELEMETRY_PARTITIONING['PRECREATE_DAYS'],
+            help='Days of partitions to create after the start.')
+        parser.add_argument(
+            '--detach-before',
+            help='Detach partitions ending at or before this date.')
+        parser.add_argument('--drop',
+                            action='store_true',
+                            help='Drop partitions after detaching them.')
+
+    def handle(self, *args, **options):
+        if not telemetry_partitions.is_partitioned():
+            if not telemetry_partitions.enabled():
+                raise CommandError(
+                    'Telemetry table is not partitioned. Enable '
+                    'TELEMETRY_PARTITIONING on a Postgres database.')
+            telemetry_partitions.convert()
+            self.stdout.write('Converted telemetry table to partitioned.')
+
+        start = timezone.now()
+        if options['start']:
+            start = parse_date(options['start'])
+        end = start + datetime.timedelta(days=options['days'])
+        try:
+            for name in telemetry_partitions.create_partitions(start, end):
+                self.stdout.write('Created partition %s.' % name)
+            if options['detach_before']:
+                for name in telemetry_partitions.detach_partitions(
+                        parse_date(options['detach_before']),
+                        drop=options['drop']):
+                    self.stdout.write(
+                        '%s partition %s.' %
+                        ('Dropped' if options['drop'] else 'Detached', name))
+        except DatabaseError as e:
+            raise CommandError('Failed to partition telemetry: %s' % e)
@@ -0,0 +1,43 @@
+"""Tests for the partition_telemetry command."""
+
+import io
+from auvsi_suas.models import telemetry_partitions
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.test import override_settings
+
+PARTITIONING = {
+    'ENABLED': True,
+    'INTERVAL_DAYS': 1,
+    'PRECREATE_DAYS': 7,
+}
+
+
+class TestPartitionTelemetry(TestCase):
+    """Tests the partition_telemetry command."""
+    def call(self, *args, **kwargs):
+        out = io.StringIO()
+        call_command('partition_telemetry', *args, stdout=out, **kwargs)
+        return out.getvalue()
+
+    def test_disabled(self):
+        with self.assertRaises(CommandError):
+            self.call()
+        self.assertFalse(telemetry_partitions.is_partitioned())
+
+    @override_settings(TELEMETRY_PARTITIONING=PARTITIONING)
+    def test_create_and_detach(self):
+        out = self.call(start='2020-06-01', days=3)
+        self.assertIn('Converted', out)
+        self.assertEqual(3, len(telemetry_partitions.partitions()))
+
+        out = self.call(start='2020-06-01', days=0, detach_before='2020-06-03')
+        self.assertNotIn('Converted', out)
+        self.assertIn('Detached', out)
+        self.assertEqual(1, len(telemetry_partitions.partitions()))
+
+    @override_settings(TELEMETRY_PARTITIONING=PARTITIONING)
+    def test_invalid_date(self):
+        with self.assertRaises(CommandError):
+            self.call(start='not a date')
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auvsi_suas', '0004_missionconfig_map'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightTrack',
+            fields=[
+                ('id',
+                 models.AutoField(auto_created=True,
+                                  primary_key=True,
+                                  serialize=False,
+                                  verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('telemetry_count', models.IntegerField()),
+                ('telemetry_max_id', models.IntegerField(blank=True,
+                                                         null=True)),
+                ('data', models.BinaryField()),
+                ('mission',
+                 models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                   to='auvsi_suas.MissionConfig')),
+                ('user',
+                 models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                   to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'index_together': {('user', 'mission', 'start', 'end')},
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.db import migrations
+
+# Suffix of the DEFAULT partition's name, and of its renamed constraints.
+DEFAULT_PARTITION_SUFFIX = '_default'
+# Max length of a Postgres identifier.
+MAX_IDENTIFIER_LENGTH = 63
+
+
+def is_partitioned(cursor, table):
+    """Whether the table is a partitioned table."""
+    cursor.execute(
+        'SELECT relkind FROM pg_class WHERE relname = %s '
+        'AND relnamespace = current_schema()::regnamespace', [table])
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def partition_telemetry(apps, schema_editor):
+    """Converts the telemetry table to a partitioned table, if enabled.
+
+    The existing table becomes the DEFAULT partition of a new partitioned
+    table, with the same columns, indexes and foreign keys. Does nothing if
+    the table is already partitioned.
+    """
+    connection = schema_editor.connection
+    if not (settings.TELEMETRY_PARTITIONING['ENABLED']
+            and connection.vendor == 'postgresql'):
+        return
+    UasTelemetry = apps.get_model('auvsi_suas', 'UasTelemetry')
+    table = UasTelemetry._meta.db_table
+    default = table + DEFAULT_PARTITION_SUFFIX
+    partition_key = UasTelemetry._meta.get_field('timestamp').column
+    qn = connection.ops.quote_name
+
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return
+        # Check pending deferred constraints, which would block ALTER TABLE.
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+        constraints = connection.introspection.get_constraints(cursor, table)
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)',
+                       [table, UasTelemetry._meta.pk.column])
+        sequence = cursor.fetchone()[0]
+
+        cursor.execute('ALTER TABLE %s RENAME TO %s' %
+                       (qn(table), qn(default)))
+        # Free the constraint names for the partitioned table. Foreign keys
+        # and the primary key are dropped, as the partitioned table's are
+        # cloned when attached.
+        for name, c in constraints.items():
+            renamed = (
+                name[:MAX_IDENTIFIER_LENGTH - len(DEFAULT_PARTITION_SUFFIX)] +
+                DEFAULT_PARTITION_SUFFIX)
+            if c['foreign_key'] or c['primary_key']:
+                cursor.execute('ALTER TABLE %s DROP CONSTRAINT %s' %
+                               (qn(default), qn(name)))
+            elif c['index']:
+                cursor.execute('ALTER INDEX %s RENAME TO %s' %
+                               (qn(name), qn(renamed)))
+
+        cursor.execute('CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS) '
+                       'PARTITION BY RANGE (%s)' %
+                       (qn(table), qn(default), qn(partition_key)))
+        for name, c in constraints.items():
+            columns = ', '.join(qn(col) for col in c['columns'])
+            if c['foreign_key']:
+                cursor.execute(
+                    'ALTER TABLE %s ADD CONSTRAINT %s FOREIGN KEY (%s) '
+                    'REFERENCES %s (%s) DEFERRABLE INITIALLY DEFERRED' %
+                    (qn(table), qn(name), columns, qn(
+                        c['foreign_key'][0]), qn(c['foreign_key'][1])))
+            elif c['primary_key']:
+                cursor.execute(
+                    'ALTER TABLE %s ADD CONSTRAINT %s PRIMARY KEY (%s, %s)' %
+                    (qn(table), qn(name), columns, qn(partition_key)))
+            elif c['index']:
+                cursor.execute('CREATE INDEX %s ON %s (%s)' %
+                               (qn(name), qn(table), columns))
+        cursor.execute('ALTER SEQUENCE %s OWNED BY %s.%s' %
+                       (sequence, qn(table), qn(UasTelemetry._meta.pk.column)))
+        cursor.execute('ALTER TABLE %s ATTACH PARTITION %s DEFAULT' %
+                       (qn(table), qn(default)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auvsi_suas', '0005_flighttrack'),
+    ]
+
+    # Converting leaves the same columns and indexes, so reversing is a no-op.
+    operations = [
+        migrations.RunPython(partition_telemetry, migrations.RunPython.noop),
+    ]
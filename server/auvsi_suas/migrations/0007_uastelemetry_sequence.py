@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auvsi_suas', '0006_partition_uastelemetry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uastelemetry',
+            name='sequence',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
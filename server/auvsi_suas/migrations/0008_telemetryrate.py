@@ -0,0 +1,45 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:16
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auvsi_suas', '0007_uastelemetry_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelemetryRate',
+            fields=[
+                ('id',
+                 models.AutoField(auto_created=True,
+                                  primary_key=True,
+                                  serialize=False,
+                                  verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField(blank=True, null=True)),
+                ('last_timestamp', models.DateTimeField()),
+                ('gap_count', models.IntegerField(default=0)),
+                ('gap_sum',
+                 models.DurationField(default=datetime.timedelta(0))),
+                ('gap_max',
+                 models.DurationField(default=datetime.timedelta(0))),
+                ('stale', models.BooleanField(default=False)),
+                ('mission',
+                 models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                   to='auvsi_suas.MissionConfig')),
+                ('user',
+                 models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                   to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'index_together': {('user', 'start')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auvsi_suas', '0008_telemetryrate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedbackCache',
+            fields=[
+                ('id',
+                 models.AutoField(auto_created=True,
+                                  primary_key=True,
+                                  serialize=False,
+                                  verbose_name='ID')),
+                ('part',
+                 models.CharField(choices=[('telemetry', 'Telemetry'),
+                                           ('odlc', 'ODLC')],
+                                  max_length=16)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('evaluation', models.BinaryField()),
+                ('mission',
+                 models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                   to='auvsi_suas.MissionConfig')),
+                ('user',
+                 models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                   to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'mission', 'part')},
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auvsi_suas', '0009_feedbackcache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EvaluationJob',
+            fields=[
+                ('id',
+                 models.AutoField(auto_created=True,
+                                  primary_key=True,
+                                  serialize=False,
+                                  verbose_name='ID')),
+                ('status',
+                 models.IntegerField(choices=[(1, 'QUEUED'), (2, 'RUNNING'),
+                                              (3, 'SUCCEEDED'), (4, 'FAILED')],
+                                     default=1)),
+                ('created',
+                 models.DateTimeField(default=django.utils.timezone.now)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('progressed', models.DateTimeField(blank=True, null=True)),
+                ('teams_evaluated', models.IntegerField(default=0)),
+                ('teams_total', models.IntegerField(default=0)),
+                ('result', models.BinaryField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('mission',
+                 models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                   to='auvsi_suas.MissionConfig')),
+                ('team',
+                 models.ForeignKey(blank=True,
+                                   null=True,
+                                   on_delete=django.db.models.deletion.CASCADE,
+                                   to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'index_together': {('mission', 'team', 'status'),
+                                   ('status', 'created')},
+            },
+        ),
+    ]
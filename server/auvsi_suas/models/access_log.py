@@ -1,14 +1,25 @@
 """Model for an access log."""
 
+import datetime
 import functools
+import itertools
 import logging
 import numpy as np
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import OuterRef
+from django.db.models import Subquery
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+# Number of access logs fetched from the database at a time when streamed.
+ACCESS_LOG_CHUNK_SIZE = 2000
+# Times in access log arrays are integer microseconds since the epoch.
+ACCESS_LOG_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+ACCESS_LOG_TIME_UNIT = datetime.timedelta(microseconds=1)
+
 
 class AccessLogMixin(models.Model):
     """Base class which logs access of information."""
@@ -46,6 +57,89 @@ class AccessLogMixin(models.Model):
             query = query.filter(timestamp__lt=end_time)
         return query.order_by('timestamp')
 
+    @classmethod
+    def values_by_user(cls,
+                       user,
+                       fields,
+                       start_time=None,
+                       end_time=None,
+                       chunk_size=ACCESS_LOG_CHUNK_SIZE):
+        """Streams values of the time-sorted access logs for the given user.
+
+        Rows are fetched in chunks with a server-side cursor, so memory is
+        bounded by the chunk size rather than the number of logs, and no model
+        instances are created.
+
+        Args:
+            user: The user to get the access log for.
+            fields: The names of the fields to get.
+            start_time: Optional. Inclusive start time.
+            end_time: Optional. Exclusive end time.
+            chunk_size: Optional. The number of rows fetched at a time.
+        Returns:
+            An iterator of tuples of the fields' values for each log.
+        """
+        return cls.by_user(
+            user, start_time,
+            end_time).values_list(*fields).iterator(chunk_size=chunk_size)
+
+    @classmethod
+    def array_by_user(cls,
+                      user,
+                      fields,
+                      start_time=None,
+                      end_time=None,
+                      chunk_size=ACCESS_LOG_CHUNK_SIZE):
+        """Reads the time-sorted access logs for the user into an array.
+
+        Rows are streamed with values_by_user() and packed a chunk at a time,
+        so only the compact array and one chunk of rows are held. Times are
+        stored as integer ACCESS_LOG_TIME_UNIT since ACCESS_LOG_EPOCH, floats
+        as float64 and other fields as int64. Fields must not be null.
+
+        Args:
+            user: The user to get the access log for.
+            fields: The names of the fields to get.
+            start_time: Optional. Inclusive start time.
+            end_time: Optional. Exclusive end time.
+            chunk_size: Optional. The number of rows fetched at a time.
+        Returns:
+            A NumPy structured array with a record per log and a field per
+            name in fields.
+        """
+        types = []
+        times = []
+        for ix, name in enumerate(fields):
+            field = cls._meta.get_field(name)
+            if isinstance(field, models.DateTimeField):
+                times.append(ix)
+                types.append((name, np.int64))
+            elif isinstance(field, models.FloatField):
+                types.append((name, np.float64))
+            else:
+                types.append((name, np.int64))
+        dtype = np.dtype(types)
+
+        def to_record(row):
+            row = list(row)
+            for ix in times:
+                row[ix] = (row[ix] - ACCESS_LOG_EPOCH) // ACCESS_LOG_TIME_UNIT
+            return tuple(row)
+
+        rows = cls.values_by_user(user, fields, start_time, end_time,
+                                  chunk_size)
+        chunks = []
+        while True:
+            chunk = [
+                to_record(row) for row in itertools.islice(rows, chunk_size)
+            ]
+            if not chunk:
+                break
+            chunks.append(np.array(chunk, dtype=dtype))
+        if not chunks:
+            return np.zeros(0, dtype=dtype)
+        return np.concatenate(chunks)
+
     @classmethod
     def last_for_user(cls, user, start_time=None, end_time=None):
         """Gets the last access log for the user.
@@ -59,6 +153,26 @@ class AccessLogMixin(models.Model):
         """
         return cls.by_user(user, start_time, end_time).last()
 
+    @classmethod
+    def last_for_users(cls, users):
+        """Gets the last access log for each of the users with one query.
+
+        Each user's last log is found with an index lookup, rather than
+        reading all logs of the users.
+
+        Args:
+            users: The users to get the access logs for.
+        Returns:
+            A dict from user ID to the user's last access log. Users without
+            access logs are omitted.
+        """
+        last_pk = cls.objects.filter(
+            user_id=OuterRef('pk')).order_by('-timestamp').values('pk')[:1]
+        pks = get_user_model().objects.filter(
+            pk__in=[u.pk for u in users]).annotate(
+                last_pk=Subquery(last_pk)).values('last_pk')
+        return {log.user_id: log for log in cls.objects.filter(pk__in=pks)}
+
     @classmethod
     def by_time_period(cls, user, time_periods):
         """Gets a list of time-sorted lists of access logs for each time period.
@@ -76,6 +190,45 @@ class AccessLogMixin(models.Model):
         """
         return [cls.by_user(user, p.start, p.end) for p in time_periods]
 
+    @classmethod
+    def gap_stats(cls, user, time_periods, time_period_logs=None):
+        """Gets statistics of the time between access logs.
+
+        Args:
+            user: The user to get the access log statistics for.
+            time_periods: A list of closed TimePeriod objects. Note: to avoid
+                computing statistics with duplicate logs, ensure that all
+                time periods are non-overlapping.
+            time_period_logs: Optional. A sequence of AccessLogMixin sequences,
+                where each AccessLogMixin sequence contains all AccessLogMixins
+                corresponding to the related TimePeriod. If None, will stream
+                the timestamps with values_by_user().
+        Returns:
+            A (max, sum, count) tuple of the times between logs, including the
+            times between the period bounds and the first and last logs.
+        """
+
+        # Timestamps of the logs, streamed if logs were not provided.
+        def period_timestamps(ix, period):
+            if time_period_logs:
+                return (log.timestamp for log in time_period_logs[ix])
+            return (row[0] for row in cls.values_by_user(
+                user, ['timestamp'], period.start, period.end))
+
+        # Utility generator for time durations.
+        def time_between_logs(time_periods):
+            for ix, period in enumerate(time_periods):
+                prev_time = period.start
+                for timestamp in period_timestamps(ix, period):
+                    yield (timestamp - prev_time).total_seconds()
+                    prev_time = timestamp
+                yield (period.end - prev_time).total_seconds()
+
+        # Calculate max, sum, count for time durations.
+        return functools.reduce(
+            lambda r, d: (max(r[0], d), r[1] + d, r[2] + 1),
+            time_between_logs(time_periods), (0.0, 0.0, 0))
+
     @classmethod
     def rates(cls, user, time_periods, time_period_logs=None):
         """Gets the access log rates.
@@ -87,8 +240,8 @@ class AccessLogMixin(models.Model):
                 time periods are non-overlapping.
             time_period_logs: Optional. A sequence of AccessLogMixin sequences,
                 where each AccessLogMixin sequence contains all AccessLogMixins
-                corresponding to the related TimePeriod. If None, will obtain
-                by calling by_time_period().
+                corresponding to the related TimePeriod. If None, will stream
+                the timestamps with values_by_user().
         Returns:
             A (max, avg) tuple. The max is the max time between logs, and avg
             is the avg time between logs.
@@ -102,22 +255,6 @@ class AccessLogMixin(models.Model):
             if time_period.duration() is None:
                 return (None, None)
 
-        # If logs were not provided, obtain.
-        if not time_period_logs:
-            time_period_logs = cls.by_time_period(user, time_periods)
-
-        # Utility generator for time durations.
-        def time_between_logs(time_periods, time_period_logs):
-            for ix, period in enumerate(time_periods):
-                prev_time = period.start
-                for log in time_period_logs[ix]:
-                    yield (log.timestamp - prev_time).total_seconds()
-                    prev_time = log.timestamp
-                yield (period.end - prev_time).total_seconds()
-
-        # Calculate max, sum, count for time durations.
-        (m, s, c) = functools.reduce(
-            lambda r, d: (max(r[0], d), r[1] + d, r[2] + 1),
-            time_between_logs(time_periods, time_period_logs), (0.0, 0.0, 0))
+        (m, s, c) = cls.gap_stats(user, time_periods, time_period_logs)
         # Convert to max and average.
         return (m, s / c)
@@ -1,6 +1,8 @@
 """Tests for the access_log module."""
 
 import datetime
+from auvsi_suas.models.access_log import ACCESS_LOG_EPOCH
+from auvsi_suas.models.access_log import ACCESS_LOG_TIME_UNIT
 from auvsi_suas.models.access_log import AccessLogMixin
 from auvsi_suas.models.aerial_position import AerialPosition
 from auvsi_suas.models.time_period import TimePeriod
@@ -145,6 +147,39 @@ class TestAccessLogMixinBasic(TestAccessLogMixinCommon):
         logs = UasTelemetry.by_user(self.user1, end_time=start)
         self.assertSequenceEqual([], logs)
 
+    def test_values_by_user(self):
+        """Tests values are streamed in chunks, in order."""
+        start = timezone.now()
+        delta = datetime.timedelta(seconds=1)
+        logs = self.create_logs(self.user1, num=5, start=start, delta=delta)
+        self.create_logs(self.user2, num=3, start=start)
+
+        rows = UasTelemetry.values_by_user(self.user1, ['id', 'timestamp'],
+                                           start_time=start + delta,
+                                           chunk_size=2)
+        self.assertEqual([(l.pk, l.timestamp) for l in logs[1:]], list(rows))
+
+    def test_array_by_user(self):
+        """Tests values are read into a structured array, in order."""
+        start = timezone.now()
+        delta = datetime.timedelta(seconds=1)
+        logs = self.create_logs(self.user1, num=5, start=start, delta=delta)
+        self.create_logs(self.user2, num=3, start=start)
+
+        records = UasTelemetry.array_by_user(self.user1,
+                                             ['id', 'timestamp', 'latitude'],
+                                             start_time=start + delta,
+                                             chunk_size=3)
+        self.assertEqual(['int64', 'int64', 'float64'],
+                         [records.dtype[ix].name for ix in range(3)])
+        self.assertEqual([(l.pk, (l.timestamp - ACCESS_LOG_EPOCH) //
+                           ACCESS_LOG_TIME_UNIT, l.latitude)
+                          for l in logs[1:]], records.tolist())
+
+        records = UasTelemetry.array_by_user(self.user1, ['timestamp'],
+                                             start_time=start + delta * 5)
+        self.assertEqual(0, len(records))
+
     def test_last_for_user_time_restrict(self):
         start = timezone.now()
         delta = datetime.timedelta(seconds=1)
@@ -161,6 +196,20 @@ class TestAccessLogMixinBasic(TestAccessLogMixinCommon):
         log = UasTelemetry.last_for_user(self.user1, end_time=start - delta)
         self.assertIsNone(log)
 
+    def test_last_for_users(self):
+        logs1 = self.create_logs(self.user1, num=5)
+        logs2 = self.create_logs(self.user2, num=3)
+        user3 = User.objects.create_user('user3', 'email@example.com',
+                                         'testpass')
+
+        with self.assertNumQueries(1):
+            last = UasTelemetry.last_for_users([self.user1, self.user2, user3])
+        self.assertDictEqual(
+            {
+                self.user1.pk: logs1[-1],
+                self.user2.pk: logs2[-1],
+            }, last)
+
 
 class TestAccessLogMixinByTimePeriod(TestAccessLogMixinCommon):
     """Test AccessLogMixin.by_time_period()"""
@@ -63,6 +63,55 @@ def distance_to(latitude_1, longitude_1, altitude_1, latitude_2, longitude_2,
     return math.hypot(gps_dist_ft, alt_dist_ft)
 
 
+def haversine_array(lon1, lat1, lon2, lat2):
+    """Calculates haversine() elementwise over arrays.
+
+    Args:
+        lon1, lat1: Arrays of the latitude and longitude of positions 1
+        lon2, lat2: Arrays of the latitude and longitude of positions 2,
+            which broadcast against positions 1.
+
+    Returns:
+        An array of the distances in kilometers
+    """
+    lon1 = np.radians(lon1)
+    lat1 = np.radians(lat1)
+    lon2 = np.radians(lon2)
+    lat2 = np.radians(lat2)
+
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    hav_a = (np.sin(dlat / 2)**2 +
+             np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2)**2)
+    hav_c = 2 * np.arcsin(np.sqrt(hav_a))
+    return 6371 * hav_c
+
+
+def distance_to_array(latitude_1, longitude_1, altitude_1, latitude_2,
+                      longitude_2, altitude_2):
+    """Get the distances in feet between positions, elementwise over arrays.
+
+    Computes distance_to() for all positions together. Positions 2 broadcast
+    against positions 1, so e.g. a column of N positions and a row of M
+    positions give an N by M array of distances.
+
+    Args:
+        latitude_1: The latitudes of the first positions.
+        longitude_1: The longitudes of the first positions.
+        altitude_1: The altitudes in feet of the first positions.
+        latitude_2: The latitudes of the second positions.
+        longitude_2: The longitudes of the second positions.
+        altitude_2: The altitudes in feet of the second positions.
+    Returns:
+        An array of the distances in feet.
+    """
+    gps_dist_km = haversine_array(longitude_1, latitude_1, longitude_2,
+                                  latitude_2)
+    gps_dist_ft = units.kilometers_to_feet(gps_dist_km)
+    alt_dist_ft = np.abs(np.subtract(altitude_1, altitude_2))
+    return np.hypot(gps_dist_ft, alt_dist_ft)
+
+
 def proj_utm(lat, lon):
     """Proj instance for the given zone.
 
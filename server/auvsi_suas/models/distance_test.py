@@ -1,5 +1,6 @@
 """Tests for the distance module."""
 
+import numpy as np
 from auvsi_suas.models import distance
 from django.test import TestCase
 
@@ -51,3 +52,29 @@ class TestHaversine(TestCase):
             (-76.428537, 38.145399, -76.427818, 38.144686, 0.10045),
             (-76.434261, 38.142471, -76.418876, 38.147838, 1.46914),
         ])  # yapf: disable
+
+
+class TestDistanceToArray(TestCase):
+    """Tests computing distances over arrays."""
+    def test_matches_distance_to(self):
+        """Tests each distance matches distance_to."""
+        rand = np.random.RandomState(0)
+        positions_1 = np.column_stack([
+            rand.uniform(38.14, 38.15, 50),
+            rand.uniform(-76.44, -76.42, 50),
+            rand.uniform(0, 500, 50),
+        ])
+        positions_2 = np.column_stack([
+            rand.uniform(38.14, 38.15, 5),
+            rand.uniform(-76.44, -76.42, 5),
+            rand.uniform(0, 500, 5),
+        ])
+        dists = distance.distance_to_array(*positions_1.T[:, :, np.newaxis],
+                                           *positions_2.T)
+        self.assertEqual((50, 5), dists.shape)
+        for i, position_1 in enumerate(positions_1):
+            for j, position_2 in enumerate(positions_2):
+                self.assertAlmostEqual(distance.distance_to(
+                    *position_1, *position_2),
+                                       dists[i, j],
+                                       places=6)
@@ -0,0 +1,340 @@
+"""Evaluation job model.
+
+Evaluating a full field of teams can take minutes, so evaluations are queued
+in the database and run by a worker thread in the server processes, rather
+than within a request. Each job records its progress as teams are evaluated,
+and stores the resulting zip file for download.
+
+Submitting an evaluation identical to a queued or running job returns that job,
+so repeated requests don't start more evaluations. Each process's worker claims
+queued jobs with a row lock, so a job is run by only one worker. Workers start
+with each server process, so jobs left running by a process which died are run
+again once stale, even if no more jobs are submitted.
+"""
+
+import copy
+import csv
+import datetime
+import io
+import json
+import logging
+import threading
+import zipfile
+from auvsi_suas.models import mission_evaluation
+from auvsi_suas.models import pb_utils
+from auvsi_suas.models.mission_config import MissionConfig
+from auvsi_suas.proto import interop_admin_api_pb2
+from django.conf import settings
+from django.contrib import admin
+from django.db import connection
+from django.db import models
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import get_template
+from django.utils import timezone
+from google.protobuf import json_format
+
+logger = logging.getLogger(__name__)
+
+# How often each worker checks for jobs submitted by other processes.
+WORKER_POLL_INTERVAL_SEC = 5
+# Time without progress after which a running job's worker is presumed dead.
+# Progress is recorded as each team is evaluated.
+JOB_STALE_TIME = datetime.timedelta(minutes=10)
+# Time after which finished jobs and their results are deleted.
+JOB_RETENTION_TIME = datetime.timedelta(days=1)
+
+
+def pretty_json(json_str):
+    """Generates a pretty-print json from any json."""
+    return json.dumps(json.loads(json_str), indent=4)
+
+
+def csv_from_json(json_list):
+    """Generates a CSV string from a list of rows as JSON strings."""
+    csv_list = []
+    for json_row in json_list:
+        csv_dict = {}
+        work_queue = [([], json.loads(json_row))]
+        while len(work_queue) > 0:
+            (cur_prefixes, cur_val) = work_queue.pop()
+            if isinstance(cur_val, dict):
+                for (key, val) in cur_val.items():
+                    new_prefixes = copy.copy(cur_prefixes)
+                    new_prefixes.append(str(key))
+                    work_queue.append((new_prefixes, val))
+            elif isinstance(cur_val, list):
+                for ix, val in enumerate(cur_val):
+                    new_prefixes = copy.copy(cur_prefixes)
+                    new_prefixes.append(str(ix))
+                    work_queue.append((new_prefixes, val))
+            else:
+                column_key = '.'.join(cur_prefixes)
+                csv_dict[column_key] = cur_val
+        csv_list.append(csv_dict)
+
+    col_headers = set()
+    for csv_dict in csv_list:
+        col_headers.update(csv_dict.keys())
+    col_headers = sorted(col_headers)
+
+    csv_io = io.StringIO()
+    writer = csv.DictWriter(csv_io, fieldnames=col_headers)
+    writer.writeheader()
+    for csv_dict in csv_list:
+        writer.writerow(csv_dict)
+    csv_output = csv_io.getvalue()
+    csv_io.close()
+
+    return csv_output
+
+
+def evaluation_zip(mission_eval):
+    """Creates a zip file with CSV & JSON data of the evaluation.
+
+    Zip file contains a master CSV and JSON file with all evaluation data.
+    It also contains per-team JSON files for individual team feedback.
+
+    Args:
+        mission_eval: A MultiUserMissionEvaluation.
+    Returns:
+        The bytes of the zip file.
+    """
+    zip_io = io.BytesIO()
+    with zipfile.ZipFile(zip_io, 'w') as zip_file:
+        zip_file.writestr('/evaluate_teams/all.json',
+                          pretty_json(json_format.MessageToJson(mission_eval)))
+        team_jsons = []
+        for team_eval in mission_eval.teams:
+            team_json = pretty_json(json_format.MessageToJson(team_eval))
+            zip_file.writestr(
+                '/evaluate_teams/teams/%s.json' % team_eval.team.username,
+                team_json)
+            team_jsons.append(team_json)
+
+        zip_file.writestr(
+            '/evaluate_teams/all.html',
+            get_template('feedback.html').render({'feedbacks': team_jsons}))
+
+        zip_file.writestr('/evaluate_teams/all.csv', csv_from_json(team_jsons))
+    zip_output = zip_io.getvalue()
+    zip_io.close()
+    return zip_output
+
+
+class EvaluationJob(models.Model):
+    """An evaluation of teams run in the background."""
+
+    # The mission to evaluate.
+    mission = models.ForeignKey(MissionConfig, on_delete=models.CASCADE)
+    # The team to evaluate, or all teams if null.
+    team = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             null=True,
+                             blank=True,
+                             on_delete=models.CASCADE)
+    # Status of the job.
+    status = models.IntegerField(
+        choices=pb_utils.FieldChoicesFromEnum(
+            interop_admin_api_pb2.EvaluationJob.Status),
+        default=interop_admin_api_pb2.EvaluationJob.QUEUED)
+    # When the job was created, started and finished.
+    created = models.DateTimeField(default=timezone.now)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    # When the job last started or recorded progress.
+    progressed = models.DateTimeField(null=True, blank=True)
+    # Number of teams evaluated, and to evaluate once running.
+    teams_evaluated = models.IntegerField(default=0)
+    teams_total = models.IntegerField(default=0)
+    # The zip file of the evaluation, once succeeded.
+    result = models.BinaryField(null=True, blank=True)
+    # Why the job failed.
+    error = models.TextField(blank=True)
+
+    class Meta:
+        index_together = (('mission', 'team', 'status'), ('status', 'created'))
+
+    def proto(self):
+        """Gets the proto of the job, without its result."""
+        job = interop_admin_api_pb2.EvaluationJob()
+        job.id = self.pk
+        job.mission = self.mission_id
+        if self.team_id is not None:
+            job.team = self.team_id
+        job.status = self.status
+        job.teams_evaluated = self.teams_evaluated
+        job.teams_total = self.teams_total
+        job.created_timestamp = self.created.isoformat()
+        if self.started:
+            job.started_timestamp = self.started.isoformat()
+        if self.finished:
+            job.finished_timestamp = self.finished.isoformat()
+        if self.error:
+            job.error = self.error
+        return job
+
+    @classmethod
+    def _runnable(cls):
+        """Gets a query of queued jobs and jobs whose worker died."""
+        return cls.objects.filter(
+            Q(status=interop_admin_api_pb2.EvaluationJob.QUEUED)
+            | Q(status=interop_admin_api_pb2.EvaluationJob.RUNNING,
+                progressed__lt=timezone.now() - JOB_STALE_TIME))
+
+    @classmethod
+    def submit(cls, mission, team=None):
+        """Submits an evaluation, unless an identical one is in progress.
+
+        The worker of this process is woken to run the job once the
+        submission is committed, including when returning an identical job, in
+        case its worker died.
+
+        Args:
+            mission: The mission to evaluate.
+            team: Optional. The team to evaluate, or all teams if None.
+        Returns:
+            The new job, or the identical queued or running job.
+        """
+        with transaction.atomic():
+            # Lock the mission, so concurrent submissions see each other's
+            # jobs.
+            MissionConfig.objects.select_for_update().filter(
+                pk=mission.pk).exists()
+            job = cls.objects.defer('result').filter(
+                mission=mission,
+                team=team,
+                status__in=[
+                    interop_admin_api_pb2.EvaluationJob.QUEUED,
+                    interop_admin_api_pb2.EvaluationJob.RUNNING
+                ]).order_by('created').last()
+            transaction.on_commit(wake_worker)
+            if job is not None:
+                return job
+
+            cls.objects.filter(finished__lt=timezone.now() -
+                               JOB_RETENTION_TIME).delete()
+            job = cls.objects.create(mission=mission, team=team)
+        logger.info('Submitted evaluation job %d.', job.pk)
+        return job
+
+    @classmethod
+    def run_next(cls):
+        """Claims and runs the oldest runnable job.
+
+        Returns:
+            The job run, or None if no jobs were runnable.
+        """
+        with transaction.atomic():
+            job = cls._runnable().select_for_update(
+                skip_locked=True).defer('result').order_by('created').first()
+            if job is None:
+                return None
+            job.status = interop_admin_api_pb2.EvaluationJob.RUNNING
+            job.started = job.progressed = timezone.now()
+            job.teams_evaluated = job.teams_total = 0
+            job.save(update_fields=[
+                'status', 'started', 'progressed', 'teams_evaluated',
+                'teams_total'
+            ])
+        job.run()
+        return job
+
+    def run(self):
+        """Evaluates the teams and stores the result."""
+        logger.info('Running evaluation job %d.', self.pk)
+        try:
+            users = None if self.team is None else [self.team]
+            mission_eval = mission_evaluation.evaluate_teams(
+                self.mission, users, progress=self._record_progress)
+            self.result = evaluation_zip(mission_eval)
+            self.status = interop_admin_api_pb2.EvaluationJob.SUCCEEDED
+        except Exception as e:
+            logger.exception('Evaluation job %d failed.', self.pk)
+            self.status = interop_admin_api_pb2.EvaluationJob.FAILED
+            self.error = str(e)
+        self.finished = timezone.now()
+        self.save(update_fields=['status', 'finished', 'result', 'error'])
+
+    def _record_progress(self, teams_evaluated, teams_total):
+        """Records the number of teams evaluated."""
+        self.teams_evaluated = teams_evaluated
+        self.teams_total = teams_total
+        self.progressed = timezone.now()
+        EvaluationJob.objects.filter(pk=self.pk).update(
+            teams_evaluated=teams_evaluated,
+            teams_total=teams_total,
+            progressed=self.progressed)
+
+
+# The worker thread of this process, and the events which wake and stop it.
+_worker = None
+_worker_lock = threading.Lock()
+_worker_wake = threading.Event()
+_worker_stop = threading.Event()
+
+
+def enabled():
+    """Whether this process runs a worker."""
+    return settings.MISSION_EVALUATION['JOB_WORKER']
+
+
+def start_worker():
+    """Starts this process's worker, unless disabled or already running.
+
+    The worker first runs jobs after WORKER_POLL_INTERVAL_SEC, unless woken.
+    """
+    global _worker
+    if not enabled():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker_stop.clear()
+            _worker = threading.Thread(target=_run_worker,
+                                       name='EvaluationJobs',
+                                       daemon=True)
+            _worker.start()
+
+
+def wake_worker():
+    """Wakes this process's worker to run jobs, starting it if needed."""
+    start_worker()
+    _worker_wake.set()
+
+
+def stop_worker():
+    """Stops this process's worker, after any job it's running."""
+    global _worker
+    with _worker_lock:
+        if _worker is not None:
+            _worker_stop.set()
+            _worker_wake.set()
+            _worker.join()
+        _worker = None
+
+
+def _run_worker():
+    """Runs jobs until stopped."""
+    while True:
+        _worker_wake.wait(WORKER_POLL_INTERVAL_SEC)
+        _worker_wake.clear()
+        while not _worker_stop.is_set():
+            try:
+                job = EvaluationJob.run_next()
+            except Exception:
+                logger.exception('Failed to run evaluation jobs.')
+                job = None
+            finally:
+                # Don't hold the connection while idle, or once stopped.
+                connection.close()
+            if job is None:
+                break
+        if _worker_stop.is_set():
+            return
+
+
+@admin.register(EvaluationJob)
+class EvaluationJobModelAdmin(admin.ModelAdmin):
+    show_full_result_count = False
+    list_display = ('pk', 'mission', 'team', 'status', 'created', 'finished',
+                    'teams_evaluated', 'teams_total')
+    exclude = ('result', )
@@ -0,0 +1,147 @@
+"""Tests for the evaluation_job module."""
+
+import datetime
+import io
+import json
+import time
+import zipfile
+from auvsi_suas.models import evaluation_job
+from auvsi_suas.models import mission_evaluation
+from auvsi_suas.models import test_utils
+from auvsi_suas.models.evaluation_job import EvaluationJob
+from auvsi_suas.proto import interop_admin_api_pb2
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test import override_settings
+from django.utils import timezone
+from unittest import mock
+
+QUEUED = interop_admin_api_pb2.EvaluationJob.QUEUED
+RUNNING = interop_admin_api_pb2.EvaluationJob.RUNNING
+SUCCEEDED = interop_admin_api_pb2.EvaluationJob.SUCCEEDED
+FAILED = interop_admin_api_pb2.EvaluationJob.FAILED
+
+
+class TestEvaluationJob(TestCase):
+    """Tests queueing and running evaluation jobs."""
+    def setUp(self):
+        self.superuser = User.objects.create_superuser('superuser',
+                                                       'email@example.com',
+                                                       'superpass')
+        self.user = User.objects.create_user('user', 'email@example.com',
+                                             'pass')
+        self.mission = test_utils.create_sample_mission(self.superuser)
+        test_utils.simulate_team_mission(self, self.mission, self.superuser,
+                                         self.user)
+
+    def test_submit_coalesces(self):
+        """Tests identical jobs are coalesced until finished."""
+        job = EvaluationJob.submit(self.mission)
+        self.assertEqual(QUEUED, job.status)
+        self.assertEqual(job, EvaluationJob.submit(self.mission))
+        team_job = EvaluationJob.submit(self.mission, self.user)
+        self.assertNotEqual(job, team_job)
+        self.assertEqual(team_job,
+                         EvaluationJob.submit(self.mission, self.user))
+
+        EvaluationJob.objects.filter(pk=job.pk).update(status=RUNNING)
+        self.assertEqual(job, EvaluationJob.submit(self.mission))
+        EvaluationJob.objects.filter(pk=job.pk).update(status=SUCCEEDED)
+        self.assertNotEqual(job, EvaluationJob.submit(self.mission))
+
+    def test_run_next(self):
+        """Tests jobs are run in order, recording progress and the result."""
+        first = EvaluationJob.submit(self.mission)
+        second = EvaluationJob.submit(self.mission, self.user)
+
+        self.assertEqual(first, EvaluationJob.run_next())
+        first.refresh_from_db()
+        self.assertEqual(SUCCEEDED, first.status)
+        self.assertEqual((1, 1), (first.teams_evaluated, first.teams_total))
+        self.assertIsNotNone(first.finished)
+        with zipfile.ZipFile(io.BytesIO(first.result)) as zip_file:
+            data = json.loads(zip_file.read('/evaluate_teams/all.json'))
+        self.assertEqual(['user'],
+                         [t['team']['username'] for t in data['teams']])
+
+        self.assertEqual(second, EvaluationJob.run_next())
+        self.assertIsNone(EvaluationJob.run_next())
+
+        job = first.proto()
+        self.assertEqual(first.pk, job.id)
+        self.assertEqual(self.mission.pk, job.mission)
+        self.assertFalse(job.HasField('team'))
+        self.assertEqual(self.user.pk, second.proto().team)
+
+    def test_run_failed(self):
+        """Tests errors evaluating are recorded."""
+        job = EvaluationJob.submit(self.mission)
+        with mock.patch.object(mission_evaluation,
+                               'evaluate_teams',
+                               side_effect=ValueError('Bad mission.')):
+            EvaluationJob.run_next()
+        job.refresh_from_db()
+        self.assertEqual(FAILED, job.status)
+        self.assertEqual('Bad mission.', job.error)
+        self.assertIsNone(job.result)
+
+    def test_stale_job_run_again(self):
+        """Tests running jobs without progress are run again."""
+        job = EvaluationJob.submit(self.mission)
+        EvaluationJob.objects.filter(pk=job.pk).update(
+            status=RUNNING, progressed=timezone.now())
+        self.assertIsNone(EvaluationJob.run_next())
+
+        EvaluationJob.objects.filter(pk=job.pk).update(
+            progressed=timezone.now() - evaluation_job.JOB_STALE_TIME -
+            datetime.timedelta(seconds=1))
+        self.assertEqual(job, EvaluationJob.run_next())
+        job.refresh_from_db()
+        self.assertEqual(SUCCEEDED, job.status)
+
+    def test_old_jobs_deleted(self):
+        """Tests finished jobs are deleted after the retention time."""
+        old = EvaluationJob.submit(self.mission)
+        EvaluationJob.run_next()
+        EvaluationJob.objects.filter(pk=old.pk).update(
+            finished=timezone.now() - evaluation_job.JOB_RETENTION_TIME -
+            datetime.timedelta(seconds=1))
+        EvaluationJob.submit(self.mission)
+        self.assertFalse(EvaluationJob.objects.filter(pk=old.pk).exists())
+
+
+class TestEvaluationJobWorker(TransactionTestCase):
+    """Tests the worker runs jobs once a submission is committed."""
+    def setUp(self):
+        self.superuser = User.objects.create_superuser('superuser',
+                                                       'email@example.com',
+                                                       'superpass')
+        self.mission = test_utils.create_sample_mission(self.superuser)
+
+    def tearDown(self):
+        evaluation_job.stop_worker()
+
+    def test_wakes_worker(self):
+        """Tests new and identical submissions wake the worker."""
+        with mock.patch.object(evaluation_job, 'wake_worker') as wake:
+            EvaluationJob.submit(self.mission)
+            EvaluationJob.submit(self.mission)
+        self.assertEqual(2, wake.call_count)
+
+    def test_disabled(self):
+        """Tests a disabled worker isn't started."""
+        EvaluationJob.submit(self.mission)
+        self.assertIsNone(evaluation_job._worker)
+
+    @override_settings(MISSION_EVALUATION={'PROCESSES': 0, 'JOB_WORKER': True})
+    def test_runs_jobs(self):
+        """Tests the worker runs submitted jobs until stopped."""
+        job = EvaluationJob.submit(self.mission)
+        deadline = time.monotonic() + 10
+        while EvaluationJob.objects.get(pk=job.pk).status != SUCCEEDED:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+        evaluation_job.stop_worker()
+        self.assertIsNone(evaluation_job._worker)
@@ -0,0 +1,104 @@
+"""Feedback cache model."""
+
+import hashlib
+import logging
+from auvsi_suas.models.mission_config import MissionConfig
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from auvsi_suas.proto import interop_admin_api_pb2
+from django.conf import settings
+from django.contrib import admin
+from django.db import models
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(*values):
+    """Gets a fingerprint of the values, which must have a stable repr."""
+    return hashlib.sha256(repr(values).encode()).hexdigest()
+
+
+class FeedbackCache(models.Model):
+    """A part of a team's mission feedback, cached with its input fingerprint.
+
+    Parts are evaluated again only when the fingerprint of their inputs
+    changes, so evaluating teams whose inputs didn't change reads the cached
+    part rather than the team's telemetry. Telemetry edited individually
+    doesn't change the fingerprint, so the team's telemetry parts are deleted.
+    """
+
+    # Feedback derived from telemetry: rates, waypoints and obstacles.
+    TELEMETRY = 'telemetry'
+    # Feedback derived from ODLCs.
+    ODLC = 'odlc'
+
+    # The team the feedback is for.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE)
+    # The mission the feedback is for.
+    mission = models.ForeignKey(MissionConfig, on_delete=models.CASCADE)
+    # The part of the feedback.
+    part = models.CharField(max_length=16,
+                            choices=((TELEMETRY, 'Telemetry'), (ODLC, 'ODLC')))
+    # Fingerprint of the inputs the part was evaluated from.
+    fingerprint = models.CharField(max_length=64)
+    # Serialized MissionEvaluation with only the fields of the part.
+    evaluation = models.BinaryField()
+
+    class Meta:
+        unique_together = (('user', 'mission', 'part'), )
+
+    @classmethod
+    def get_or_evaluate(cls, mission, user, part, input_fingerprint, evaluate):
+        """Gets a part of the feedback, evaluating it if its inputs changed.
+
+        Args:
+            mission: The mission the feedback is for.
+            user: The team the feedback is for.
+            part: The part of the feedback.
+            input_fingerprint: The fingerprint of the part's current inputs.
+            evaluate: Function which fills a MissionEvaluation with the part.
+        Returns:
+            A MissionEvaluation with only the fields of the part.
+        """
+        team_eval = interop_admin_api_pb2.MissionEvaluation()
+        cached = cls.objects.filter(user=user,
+                                    mission=mission,
+                                    part=part,
+                                    fingerprint=input_fingerprint).values_list(
+                                        'evaluation', flat=True).first()
+        if cached is not None:
+            team_eval.ParseFromString(bytes(cached))
+            return team_eval
+
+        logger.info('Evaluating %s feedback for %s.', part, user.username)
+        evaluate(team_eval)
+        cls.objects.update_or_create(user=user,
+                                     mission=mission,
+                                     part=part,
+                                     defaults={
+                                         'fingerprint':
+                                         input_fingerprint,
+                                         'evaluation':
+                                         team_eval.SerializeToString(),
+                                     })
+        return team_eval
+
+
+@receiver(post_save, sender=UasTelemetry)
+@receiver(post_delete, sender=UasTelemetry)
+def delete_on_telemetry(sender, instance, created=False, **kwargs):
+    """Deletes telemetry feedback of a team whose telemetry was edited."""
+    if created:
+        return
+    FeedbackCache.objects.filter(user_id=instance.user_id,
+                                 part=FeedbackCache.TELEMETRY).delete()
+
+
+@admin.register(FeedbackCache)
+class FeedbackCacheModelAdmin(admin.ModelAdmin):
+    show_full_result_count = False
+    list_display = ('pk', 'user', 'mission', 'part', 'fingerprint')
+    exclude = ('evaluation', )
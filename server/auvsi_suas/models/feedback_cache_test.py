@@ -0,0 +1,47 @@
+"""Tests for the feedback_cache module."""
+
+from auvsi_suas.models import test_utils
+from auvsi_suas.models.feedback_cache import FeedbackCache
+from auvsi_suas.models.feedback_cache import fingerprint
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+
+class TestFeedbackCache(TestCase):
+    """Tests caching parts of feedback."""
+    def setUp(self):
+        self.superuser = User.objects.create_superuser('superuser',
+                                                       'email@example.com',
+                                                       'superpass')
+        self.user = User.objects.create_user('user', 'email@example.com',
+                                             'pass')
+        self.mission = test_utils.create_sample_mission(self.superuser)
+        self.evaluated = 0
+
+    def evaluate(self, team_eval):
+        self.evaluated += 1
+        team_eval.feedback.uas_telemetry_time_max_sec = self.evaluated
+
+    def get(self, input_fingerprint):
+        return FeedbackCache.get_or_evaluate(self.mission, self.user,
+                                             FeedbackCache.TELEMETRY,
+                                             input_fingerprint, self.evaluate)
+
+    def test_fingerprint(self):
+        self.assertEqual(fingerprint(1, [2, 'a']), fingerprint(1, [2, 'a']))
+        self.assertNotEqual(fingerprint(1, [2, 'a']), fingerprint(1, [2, 'b']))
+
+    def test_get_or_evaluate(self):
+        """Tests parts are evaluated only when the fingerprint changes."""
+        self.assertEqual(1, self.get('a').feedback.uas_telemetry_time_max_sec)
+        self.assertEqual(1, self.get('a').feedback.uas_telemetry_time_max_sec)
+        self.assertEqual(1, self.evaluated)
+
+        self.assertEqual(2, self.get('b').feedback.uas_telemetry_time_max_sec)
+        self.assertEqual(2, self.evaluated)
+        self.assertEqual(1, FeedbackCache.objects.count())
+
+        # Parts are cached separately.
+        FeedbackCache.get_or_evaluate(self.mission, self.user,
+                                      FeedbackCache.ODLC, 'b', self.evaluate)
+        self.assertEqual(3, self.evaluated)
@@ -0,0 +1,77 @@
+"""A team's flight telemetry, prepared once for evaluation."""
+
+import collections
+import contextlib
+import logging
+import time
+from auvsi_suas.models.flight_track import FlightTrack
+from auvsi_suas.models.uas_telemetry import TelemetryTrack
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+
+logger = logging.getLogger(__name__)
+
+
+class FlightTelemetry(object):
+    """The telemetry of a team's flights, prepared once for all evaluators.
+
+    Telemetry is read as TelemetryTracks, without a model instance per
+    telemetry, then deduped, filtered and interpolated once, and every
+    evaluator is given the same tracks. The time of each stage is recorded,
+    including the evaluators run within timed().
+
+    Attributes:
+        period_tracks: A list of deduped TelemetryTracks, one per flight. Bad
+            telemetry is kept, as it was still uploaded.
+        track: The TelemetryTrack of the good telemetry of all flights.
+        interpolated: The track, interpolated.
+        timings: OrderedDict from the name of each stage to its seconds.
+    """
+    def __init__(self, period_tracks, timings=None):
+        """Prepares the telemetry of the flights.
+
+        Args:
+            period_tracks: A list of time-sorted TelemetryTracks, one per
+                flight.
+            timings: Optional. The timings of stages already run.
+        """
+        self.timings = collections.OrderedDict(timings or {})
+        with self.timed('dedupe'):
+            self.period_tracks = [
+                UasTelemetry.dedupe(track) for track in period_tracks
+            ]
+        with self.timed('filter_bad'):
+            self.track = UasTelemetry.filter_bad(
+                TelemetryTrack.concatenate(self.period_tracks))
+        with self.timed('interpolate'):
+            self.interpolated = UasTelemetry.interpolate(self.track)
+
+    @classmethod
+    def read(cls, mission, user, flight_periods):
+        """Reads and prepares the telemetry of the team's flights.
+
+        Args:
+            mission: The mission the flights were for.
+            user: The user which flew the flights.
+            flight_periods: A list of TimePeriod objects for the flights.
+        Returns:
+            A FlightTelemetry.
+        """
+        start = time.perf_counter()
+        period_tracks = FlightTrack.tracks_by_time_period(
+            mission, user, flight_periods)
+        return cls(period_tracks, [('read', time.perf_counter() - start)])
+
+    @contextlib.contextmanager
+    def timed(self, stage):
+        """Records the time of the stage run within the context."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] = (self.timings.get(stage, 0) +
+                                   time.perf_counter() - start)
+
+    def format_timings(self):
+        """Formats the timings of the stages for logs."""
+        return ', '.join('%s %.3f s' % (stage, sec)
+                         for stage, sec in self.timings.items())
@@ -0,0 +1,85 @@
+"""Tests for the flight_telemetry module."""
+
+import datetime
+from auvsi_suas.models import test_utils
+from auvsi_suas.models.flight_telemetry import FlightTelemetry
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.uas_telemetry import TelemetryTrack
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+
+class TestFlightTelemetry(TestCase):
+    """Tests preparing flight telemetry for evaluation."""
+    def setUp(self):
+        self.superuser = User.objects.create_superuser('superuser',
+                                                       'email@example.com',
+                                                       'superpass')
+        self.user = User.objects.create_user('user', 'email@example.com',
+                                             'pass')
+        self.mission = test_utils.create_sample_mission(self.superuser)
+        self.start = datetime.datetime(2020, 6, 1, tzinfo=timezone.utc)
+
+    def create_log(self, offset_sec, latitude=38, longitude=-76):
+        log = UasTelemetry(user=self.user,
+                           timestamp=self.start +
+                           datetime.timedelta(seconds=offset_sec),
+                           latitude=latitude,
+                           longitude=longitude,
+                           altitude_msl=100,
+                           uas_heading=90)
+        log.save()
+        return log
+
+    def test_prepare(self):
+        """Tests telemetry is deduped, filtered and interpolated."""
+        logs = [
+            self.create_log(0),
+            # Duplicate.
+            self.create_log(0.5),
+            self.create_log(1, latitude=38.001),
+            # Bad.
+            self.create_log(1.5, latitude=0, longitude=0),
+            self.create_log(2, latitude=38.002),
+        ]
+        telemetry = FlightTelemetry([
+            TelemetryTrack.from_logs(logs[:2]),
+            TelemetryTrack.from_logs(logs[2:])
+        ])
+
+        # Bad telemetry was still uploaded.
+        self.assertEqual(
+            [[38], [38.001, 0, 38.002]],
+            [t.latitude.tolist() for t in telemetry.period_tracks])
+        self.assertEqual([38, 38.001, 38.002],
+                         telemetry.track.latitude.tolist())
+        self.assertEqual(21, len(telemetry.interpolated.latitude))
+        self.assertEqual(['dedupe', 'filter_bad', 'interpolate'],
+                         list(telemetry.timings))
+
+    def test_read(self):
+        for offset_sec in range(0, 100):
+            self.create_log(offset_sec, latitude=38 + offset_sec * 1e-5)
+        for offset_sec, uas_in_air in [(10, True), (50, False)]:
+            TakeoffOrLandingEvent(user=self.user,
+                                  mission=self.mission,
+                                  timestamp=self.start +
+                                  datetime.timedelta(seconds=offset_sec),
+                                  uas_in_air=uas_in_air).save()
+        periods = TakeoffOrLandingEvent.flights(self.mission, self.user)
+
+        telemetry = FlightTelemetry.read(self.mission, self.user, periods)
+        self.assertEqual(40, len(telemetry.track))
+        self.assertEqual('read', list(telemetry.timings)[0])
+
+    def test_timed(self):
+        telemetry = FlightTelemetry([])
+        with telemetry.timed('evaluate'):
+            pass
+        with telemetry.timed('evaluate'):
+            pass
+        self.assertEqual('evaluate', list(telemetry.timings)[-1])
+        self.assertGreaterEqual(telemetry.timings['evaluate'], 0)
+        self.assertIn('evaluate 0.0', telemetry.format_timings())
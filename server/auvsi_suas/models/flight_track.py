@@ -0,0 +1,258 @@
+"""Flight track model."""
+
+import logging
+import numpy as np
+import struct
+import zlib
+from auvsi_suas.models.mission_config import MissionConfig
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.uas_telemetry import TelemetryTrack
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.conf import settings
+from django.contrib import admin
+from django.db import models
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import Max
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Version of the encoding, stored in the header of each track.
+TRACK_ENCODING_VERSION = 1
+# Header of an encoded track: version and number of telemetry.
+TRACK_HEADER = struct.Struct('<BI')
+# Telemetry fields stored as float columns, in encoded order.
+TRACK_FLOAT_FIELDS = ('latitude', 'longitude', 'altitude_msl', 'uas_heading')
+
+
+def _byte_planes(values):
+    """Transposes 8-byte values so each byte position is contiguous."""
+    return np.ascontiguousarray(values.view('<u1').reshape(-1, 8).T)
+
+
+def _from_byte_planes(data, count):
+    """Inverts _byte_planes."""
+    planes = np.frombuffer(data, dtype='<u1').reshape(8, count)
+    return np.ascontiguousarray(planes.T).view('<u8').reshape(count)
+
+
+def encode_track_us(timestamps_us, columns):
+    """Encodes a telemetry track as compressed, delta-encoded columns.
+
+    Timestamps are stored as deltas of integer microseconds. Floats are stored
+    losslessly as the XOR of consecutive values' bits, as consecutive telemetry
+    share sign, exponent and high mantissa bits. Each column is transposed into
+    byte planes before compression, so the mostly zero high bytes compress
+    well.
+
+    Args:
+        timestamps_us: Sequence of integer microseconds since the epoch.
+        columns: Sequence of float sequences, one per TRACK_FLOAT_FIELDS.
+    Returns:
+        The encoded bytes.
+    """
+    timestamps_us = np.array(timestamps_us, dtype='<i8')
+    parts = [_byte_planes(np.diff(timestamps_us, prepend=0).view('<u8'))]
+    for column in columns:
+        bits = np.array(column, dtype='<f8').view('<u8')
+        deltas = bits.copy()
+        deltas[1:] ^= bits[:-1]
+        parts.append(_byte_planes(deltas))
+    return TRACK_HEADER.pack(TRACK_ENCODING_VERSION,
+                             len(timestamps_us)) + zlib.compress(b''.join(
+                                 p.tobytes() for p in parts))
+
+
+def decode_track(data):
+    """Decodes a track encoded by encode_track_us.
+
+    Args:
+        data: The encoded bytes.
+    Returns:
+        A (timestamps_us, columns) tuple, where timestamps_us is an int64 array
+        of microseconds since the epoch and columns is a list of float64
+        arrays, one per TRACK_FLOAT_FIELDS.
+    Raises:
+        ValueError: The data is not a valid track.
+    """
+    version, count = TRACK_HEADER.unpack_from(data)
+    if version != TRACK_ENCODING_VERSION:
+        raise ValueError('Unknown track encoding version: %d' % version)
+    raw = zlib.decompress(data[TRACK_HEADER.size:])
+    column_size = 8 * count
+    if len(raw) != column_size * (1 + len(TRACK_FLOAT_FIELDS)):
+        raise ValueError('Track size does not match count.')
+
+    timestamps_us = np.cumsum(
+        _from_byte_planes(raw[:column_size], count).view('<i8'))
+    columns = []
+    for ix in range(len(TRACK_FLOAT_FIELDS)):
+        offset = column_size * (ix + 1)
+        bits = _from_byte_planes(raw[offset:offset + column_size], count)
+        columns.append(np.bitwise_xor.accumulate(bits).view('<f8'))
+    return timestamps_us, columns
+
+
+class FlightTrack(models.Model):
+    """Telemetry of a completed flight, materialized into a compact blob.
+
+    Reading a flight's telemetry from its track avoids fetching every
+    UasTelemetry row. A track is stale if telemetry within the flight was
+    added or removed after it was materialized, which is detected by the
+    count and max ID of telemetry in the flight. Tracks containing telemetry
+    edited or deleted individually are deleted, as edits don't change either.
+    """
+
+    # The user which flew the flight.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE)
+    # The mission the flight was for.
+    mission = models.ForeignKey(MissionConfig, on_delete=models.CASCADE)
+    # Inclusive start and exclusive end of the flight.
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+
+    # Number and max ID of telemetry in the flight when materialized.
+    telemetry_count = models.IntegerField()
+    telemetry_max_id = models.IntegerField(null=True, blank=True)
+    # The telemetry, encoded by encode_track_us.
+    data = models.BinaryField()
+
+    class Meta:
+        index_together = (('user', 'mission', 'start', 'end'), )
+
+    @classmethod
+    def _query_telemetry(cls, user, period):
+        """Queries the telemetry within the flight."""
+        return UasTelemetry.by_user(user, period.start, period.end)
+
+    @classmethod
+    def materialize(cls, mission, user, period):
+        """Materializes the telemetry of a flight into a track.
+
+        Replaces any existing tracks for the flight.
+
+        Args:
+            mission: The mission the flight was for.
+            user: The user which flew the flight.
+            period: The closed TimePeriod of the flight.
+        Returns:
+            The saved FlightTrack.
+        """
+        # Read the IDs with the telemetry, so the count and max ID match the
+        # telemetry encoded.
+        telemetry = UasTelemetry.array_by_user(
+            user, ('id', 'timestamp') + TRACK_FLOAT_FIELDS, period.start,
+            period.end)
+        track = cls(user=user,
+                    mission=mission,
+                    start=period.start,
+                    end=period.end,
+                    telemetry_count=len(telemetry),
+                    telemetry_max_id=(telemetry['id'].max().item()
+                                      if len(telemetry) else None),
+                    data=encode_track_us(
+                        telemetry['timestamp'],
+                        [telemetry[field] for field in TRACK_FLOAT_FIELDS]))
+        with transaction.atomic():
+            cls.objects.filter(user=user,
+                               mission=mission,
+                               start=period.start,
+                               end=period.end).delete()
+            track.save()
+        return track
+
+    @classmethod
+    def for_flight(cls, mission, user, period):
+        """Gets an up to date track for the flight, materializing if needed.
+
+        Args:
+            mission: The mission the flight was for.
+            user: The user which flew the flight.
+            period: The TimePeriod of the flight.
+        Returns:
+            The FlightTrack, or None if the flight has not ended.
+        """
+        if period.start is None or period.end is None:
+            return None
+
+        track = cls.objects.filter(user=user,
+                                   mission=mission,
+                                   start=period.start,
+                                   end=period.end).last()
+        if track is not None:
+            track.user = user
+            current = cls._query_telemetry(user,
+                                           period).aggregate(count=Count('id'),
+                                                             max_id=Max('id'))
+            if (current['count'] == track.telemetry_count
+                    and current['max_id'] == track.telemetry_max_id):
+                return track
+            logger.info('Rematerializing stale track for %s.', user.username)
+        return cls.materialize(mission, user, period)
+
+    @classmethod
+    def tracks_by_time_period(cls, mission, user, time_periods):
+        """Gets the telemetry for each flight as a TelemetryTrack.
+
+        Equivalent to UasTelemetry.by_time_period, but without creating a
+        model instance per telemetry. Tracks are read where possible, and
+        flights without tracks are streamed from the database.
+
+        Args:
+            mission: The mission the flights were for.
+            user: The user which flew the flights.
+            time_periods: A list of TimePeriod objects for the flights.
+        Returns:
+            A list of TelemetryTracks, one per time period.
+        """
+        period_tracks = []
+        for period in time_periods:
+            flight_track = cls.for_flight(mission, user, period)
+            if flight_track is None:
+                period_tracks.append(
+                    UasTelemetry.track_by_user(user, period.start, period.end))
+            else:
+                period_tracks.append(flight_track.telemetry_track())
+        return period_tracks
+
+    def telemetry_track(self):
+        """Decodes the track into a TelemetryTrack."""
+        timestamps_us, columns = decode_track(bytes(self.data))
+        return TelemetryTrack.from_columns(timestamps_us, *columns)
+
+
+@receiver(post_save, sender=TakeoffOrLandingEvent)
+def materialize_on_landing(sender, instance, **kwargs):
+    """Materializes a flight's track when a landing event ends it."""
+    if instance.uas_in_air:
+        return
+    for period in TakeoffOrLandingEvent.flights(instance.mission,
+                                                instance.user):
+        if period.end == instance.timestamp and period.start is not None:
+            FlightTrack.materialize(instance.mission, instance.user, period)
+
+
+@receiver(post_save, sender=UasTelemetry)
+@receiver(post_delete, sender=UasTelemetry)
+def delete_on_telemetry(sender, instance, created=False, **kwargs):
+    """Deletes tracks containing telemetry edited or deleted individually.
+
+    Telemetry moved out of a track changes its count, so only tracks
+    containing the new timestamp need deleting.
+    """
+    if created:
+        return
+    FlightTrack.objects.filter(user_id=instance.user_id,
+                               start__lte=instance.timestamp,
+                               end__gt=instance.timestamp).delete()
+
+
+@admin.register(FlightTrack)
+class FlightTrackModelAdmin(admin.ModelAdmin):
+    show_full_result_count = False
+    list_display = ('pk', 'user', 'mission', 'start', 'end', 'telemetry_count')
+    exclude = ('data', )
@@ -0,0 +1,202 @@
+"""Tests for the flight_track module."""
+
+import datetime
+import numpy as np
+from auvsi_suas.models import test_utils
+from auvsi_suas.models.flight_track import FlightTrack
+from auvsi_suas.models.flight_track import decode_track
+from auvsi_suas.models.flight_track import encode_track_us
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.uas_telemetry import TelemetryTrack
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+
+class TestTrackEncoding(TestCase):
+    """Tests encoding and decoding tracks."""
+    def assertRoundTrip(self, timestamps_us, columns):
+        decoded_us, decoded = decode_track(
+            encode_track_us(timestamps_us, columns))
+        self.assertEqual(list(timestamps_us), decoded_us.tolist())
+        self.assertEqual(len(columns), len(decoded))
+        for column, decoded_column in zip(columns, decoded):
+            # Exact, not approximate, equality.
+            self.assertEqual(list(column), decoded_column.tolist())
+
+    def test_empty(self):
+        self.assertRoundTrip([], [[], [], [], []])
+
+    def test_lossless(self):
+        """Tests values round trip exactly."""
+        rand = np.random.RandomState(0)
+        start_us = 1590969600 * 1000000
+        timestamps_us = (start_us +
+                         np.cumsum(rand.randint(0, 200000, 1000))).tolist()
+        columns = [
+            (38.14 + np.cumsum(rand.normal(0, 1e-5, 1000))).tolist(),
+            (-76.42 + np.cumsum(rand.normal(0, 1e-5, 1000))).tolist(),
+            rand.uniform(-10, 500, 1000).tolist(),
+            [0.0, -0.0, 360.0, 1e-300] * 250,
+        ]
+        self.assertRoundTrip(timestamps_us, columns)
+
+    def test_compresses(self):
+        """Tests a regular track is much smaller than raw values."""
+        start_us = 1590969600 * 1000000
+        count = 10000
+        timestamps_us = [start_us + i * 100000 for i in range(count)]
+        columns = [
+            [38.14 + i * 1e-6 for i in range(count)],
+            [-76.42] * count,
+            [100.0 + (i % 10) for i in range(count)],
+            [90.0] * count,
+        ]
+        data = encode_track_us(timestamps_us, columns)
+        self.assertLess(len(data), count * 8 * 5 / 4)
+
+    def test_invalid(self):
+        data = encode_track_us([0], [[1.0], [2.0], [3.0], [4.0]])
+        with self.assertRaises(ValueError):
+            decode_track(b'\x02' + data[1:])
+
+
+class TestFlightTrack(TestCase):
+    """Tests the FlightTrack model."""
+    def setUp(self):
+        self.superuser = User.objects.create_superuser('superuser',
+                                                       'email@example.com',
+                                                       'superpass')
+        self.user = User.objects.create_user('user', 'email@example.com',
+                                             'pass')
+        self.mission = test_utils.create_sample_mission(self.superuser)
+        self.start = datetime.datetime(2020, 6, 1, tzinfo=timezone.utc)
+
+    def create_telemetry(self, offsets_sec):
+        for offset_sec in offsets_sec:
+            UasTelemetry(user=self.user,
+                         timestamp=self.start +
+                         datetime.timedelta(seconds=offset_sec),
+                         latitude=38 + offset_sec * 1e-5,
+                         longitude=-76 - offset_sec * 1e-5,
+                         altitude_msl=100 + offset_sec / 3.0,
+                         uas_heading=offset_sec % 360).save()
+
+    def create_event(self, offset_sec, uas_in_air):
+        TakeoffOrLandingEvent(user=self.user,
+                              mission=self.mission,
+                              timestamp=self.start +
+                              datetime.timedelta(seconds=offset_sec),
+                              uas_in_air=uas_in_air).save()
+
+    def assertTrackEqual(self, expected_logs, actual_track):
+        self.assertEqual(
+            TelemetryTrack.from_logs(expected_logs).records.tolist(),
+            actual_track.records.tolist())
+
+    def test_materialize_on_landing(self):
+        """Tests landing materializes the flight, and takeoff doesn't."""
+        self.create_telemetry(range(0, 100))
+        self.create_event(10, True)
+        self.assertEqual(0, FlightTrack.objects.count())
+        self.create_event(50, False)
+        self.assertEqual(1, FlightTrack.objects.count())
+
+        track = FlightTrack.objects.get()
+        self.assertEqual(self.user, track.user)
+        self.assertEqual(self.mission, track.mission)
+        self.assertEqual(40, track.telemetry_count)
+        self.assertTrackEqual(
+            UasTelemetry.by_user(self.user, track.start, track.end),
+            track.telemetry_track())
+
+    def test_tracks_by_time_period(self):
+        """Tests tracks match the raw telemetry."""
+        self.create_telemetry(range(0, 100))
+        self.create_event(10, True)
+        self.create_event(50, False)
+        self.create_event(60, True)
+        self.create_event(70, False)
+        self.create_event(80, True)
+
+        periods = TakeoffOrLandingEvent.flights(self.mission, self.user)
+        self.assertEqual(3, len(periods))
+        expected = UasTelemetry.by_time_period(self.user, periods)
+        actual = FlightTrack.tracks_by_time_period(self.mission, self.user,
+                                                   periods)
+        self.assertEqual(len(expected), len(actual))
+        for e, a in zip(expected, actual):
+            self.assertTrackEqual(e, a)
+        # Open flight isn't materialized.
+        self.assertEqual(2, FlightTrack.objects.count())
+
+    def test_reads_track(self):
+        """Tests a valid track is read without fetching telemetry rows."""
+        self.create_telemetry(range(0, 100))
+        self.create_event(10, True)
+        self.create_event(50, False)
+        periods = TakeoffOrLandingEvent.flights(self.mission, self.user)
+
+        # Track lookup and validation.
+        with self.assertNumQueries(2):
+            tracks = FlightTrack.tracks_by_time_period(self.mission, self.user,
+                                                       periods)
+        self.assertEqual(40, len(tracks[0]))
+
+    def test_stale_track(self):
+        """Tests a stale track is rematerialized."""
+        self.create_telemetry(range(0, 100, 2))
+        self.create_event(10, True)
+        self.create_event(50, False)
+        periods = TakeoffOrLandingEvent.flights(self.mission, self.user)
+
+        # Telemetry uploaded late.
+        self.create_telemetry([11, 13])
+        tracks = FlightTrack.tracks_by_time_period(self.mission, self.user,
+                                                   periods)
+        self.assertTrackEqual(
+            UasTelemetry.by_time_period(self.user, periods)[0], tracks[0])
+        self.assertEqual(1, FlightTrack.objects.count())
+        self.assertEqual(22, FlightTrack.objects.get().telemetry_count)
+
+        # Telemetry deleted.
+        UasTelemetry.objects.filter(timestamp=self.start +
+                                    datetime.timedelta(seconds=12)).delete()
+        tracks = FlightTrack.tracks_by_time_period(self.mission, self.user,
+                                                   periods)
+        self.assertEqual(21, len(tracks[0]))
+
+    def test_edited_telemetry(self):
+        """Tests editing telemetry deletes the tracks containing it."""
+        self.create_telemetry(range(0, 100))
+        self.create_event(10, True)
+        self.create_event(50, False)
+        self.create_event(60, True)
+        self.create_event(70, False)
+        periods = TakeoffOrLandingEvent.flights(self.mission, self.user)
+        self.assertEqual(2, FlightTrack.objects.count())
+
+        log = UasTelemetry.objects.get(timestamp=self.start +
+                                       datetime.timedelta(seconds=20))
+        log.altitude_msl = 1000
+        log.save()
+        # Only the edited flight's track is deleted.
+        self.assertEqual(1, FlightTrack.objects.count())
+        tracks = FlightTrack.tracks_by_time_period(self.mission, self.user,
+                                                   periods)
+        self.assertEqual(1000, tracks[0].altitude_msl[10])
+        self.assertEqual(2, FlightTrack.objects.count())
+
+        # Moved between flights.
+        log.timestamp = self.start + datetime.timedelta(seconds=65,
+                                                        microseconds=1)
+        log.save()
+        tracks = FlightTrack.tracks_by_time_period(self.mission, self.user,
+                                                   periods)
+        self.assertEqual(39, len(tracks[0]))
+        self.assertEqual(11, len(tracks[1]))
+        self.assertEqual(1000, tracks[1].altitude_msl[6])
+
+        log.delete()
+        self.assertEqual(1, FlightTrack.objects.count())
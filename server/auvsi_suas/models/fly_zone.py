@@ -4,6 +4,8 @@ import datetime
 import logging
 import numpy as np
 from auvsi_suas.models import aerial_position
+from auvsi_suas.models.uas_telemetry import TELEMETRY_TIME_UNIT
+from auvsi_suas.models.uas_telemetry import TelemetryTrack
 from auvsi_suas.models.waypoint import Waypoint
 from django.contrib import admin
 from django.core import exceptions
@@ -58,43 +60,41 @@ class FlyZone(models.Model):
         Returns:
             A list storing whether each position is inside the boundary.
         """
+        return self.contains_arrays(
+            np.array([p.latitude for p in aerial_pos_list], dtype=np.float64),
+            np.array([p.longitude for p in aerial_pos_list], dtype=np.float64),
+            np.array([p.altitude_msl for p in aerial_pos_list],
+                     dtype=np.float64)).tolist()
+
+    def contains_arrays(self, latitude, longitude, altitude_msl):
+        """Evaluates arrays of positions together.
+
+        Args:
+            latitude: Array of the positions' latitudes.
+            longitude: Array of the positions' longitudes.
+            altitude_msl: Array of the positions' altitudes.
+        Returns:
+            A boolean array of whether each position is inside the boundary.
+        """
         # Get boundary points
         ordered_pts = self.boundary_pts.order_by('order')
         path_pts = [[wpt.latitude, wpt.longitude] for wpt in ordered_pts]
         # First check enough points to define a polygon
         if len(path_pts) < 3:
-            return [False] * len(aerial_pos_list)
+            return np.zeros(len(altitude_msl), dtype=bool)
 
         # Create path to use for testing polygon inclusion
         path_pts.append(path_pts[0])
         path = mplpath.Path(np.array(path_pts))
 
-        # Test each aerial position for altitude
-        results = []
-        for aerial_pos in aerial_pos_list:
-            # Check altitude bounds
-            alt = aerial_pos.altitude_msl
-            altitude_check = (alt <= self.altitude_msl_max
-                              and alt >= self.altitude_msl_min)
-            results.append(altitude_check)
-
-        # Create a list of positions to test whether inside polygon
-        polygon_test_point_ids = [
-            cur_id for cur_id in range(len(aerial_pos_list)) if results[cur_id]
-        ]
-        if len(polygon_test_point_ids) == 0:
-            return results
-        polygon_test_points = [[
-            aerial_pos_list[cur_id].latitude, aerial_pos_list[cur_id].longitude
-        ] for cur_id in polygon_test_point_ids]
-
-        # Test each point for inside polygon
-        polygon_test_results = path.contains_points(
-            np.array(polygon_test_points))
-        for test_id in range(len(polygon_test_point_ids)):
-            cur_id = polygon_test_point_ids[test_id]
-            results[cur_id] = polygon_test_results[test_id]
-
+        # Check altitude bounds, then whether those within are inside polygon
+        results = ((altitude_msl <= self.altitude_msl_max)
+                   & (altitude_msl >= self.altitude_msl_min))
+        polygon_test_ids = np.nonzero(results)[0]
+        if len(polygon_test_ids):
+            results[polygon_test_ids] = path.contains_points(
+                np.column_stack(
+                    [latitude[polygon_test_ids], longitude[polygon_test_ids]]))
         return results
 
     @classmethod
@@ -110,35 +110,43 @@ class FlyZone(models.Model):
             total_time: The timedelta for time spent out of bounds
                 as indicated by the telemetry logs.
         """
-        # Get the aerial positions for the logs
-        aerial_pos_list = uas_telemetry_logs
-        log_ids_to_process = range(len(aerial_pos_list))
+        return cls.out_of_bounds_track(
+            fly_zones, TelemetryTrack.from_logs(uas_telemetry_logs))
 
-        # Evaluate zones against the logs, eliminating satisfied ones, until
-        # only the out of boundary ids remain
+    @classmethod
+    def out_of_bounds_track(cls, fly_zones, track):
+        """Determines amount of time spent out of bounds.
+
+        Args:
+            fly_zones: The list of FlyZone that the UAS must be in.
+            track: The TelemetryTrack of the flight, sorted by time.
+        Returns:
+            num_violations: The number of times fly zone boundaries violated.
+            total_time: The timedelta for time spent out of bounds
+                as indicated by the telemetry.
+        """
+        # Evaluate zones against the telemetry, eliminating satisfied ones,
+        # until only the out of boundary ids remain
+        in_bounds = np.zeros(len(track.timestamps_us), dtype=bool)
         for zone in fly_zones:
+            ids_to_process = np.nonzero(~in_bounds)[0]
             # Stop processing if no ids
-            if len(log_ids_to_process) == 0:
+            if len(ids_to_process) == 0:
                 break
-            # Evaluate the positions still not satisfied
-            cur_positions = [
-                aerial_pos_list[cur_id] for cur_id in log_ids_to_process
-            ]
-            satisfied_positions = zone.contains_many_pos(cur_positions)
-            # Retain those which were not satisfied in this pass
-            log_ids_to_process = [
-                log_ids_to_process[cur_id]
-                for cur_id in range(len(log_ids_to_process))
-                if not satisfied_positions[cur_id]
-            ]
-
-        out_of_bounds_time = datetime.timedelta()
+            in_bounds[ids_to_process] = zone.contains_arrays(
+                track.latitude[ids_to_process],
+                track.longitude[ids_to_process],
+                track.altitude_msl[ids_to_process])
+
+        debounce_us = (
+            datetime.timedelta(seconds=OUT_OF_BOUNDS_DEBOUNCE_SEC) //
+            TELEMETRY_TIME_UNIT)
+        timestamps_us = track.timestamps_us.tolist()
+        out_of_bounds_us = 0
         violations = 0
         prev_event_id = -1
         currently_in_bounds = True
-        out_of_bounds_ids = set(log_ids_to_process)
-        for i in range(len(aerial_pos_list)):
-            i_in_bounds = i not in out_of_bounds_ids
+        for i, i_in_bounds in enumerate(in_bounds.tolist()):
             if currently_in_bounds and not i_in_bounds:
                 # As soon as there is one telemetry log out of bounds, we count
                 # it as a violation.
@@ -148,17 +156,14 @@ class FlyZone(models.Model):
             elif not currently_in_bounds and i_in_bounds:
                 # A switch of state needs to happen. But first make sure
                 # enough time has passed.
-                time_diff = (uas_telemetry_logs[i].timestamp -
-                             uas_telemetry_logs[prev_event_id].timestamp)
-                currently_in_bounds = (time_diff.total_seconds() >=
-                                       OUT_OF_BOUNDS_DEBOUNCE_SEC)
+                currently_in_bounds = (
+                    timestamps_us[i] - timestamps_us[prev_event_id] >=
+                    debounce_us)
 
             if not currently_in_bounds and i > 0:
-                time_diff = (uas_telemetry_logs[i].timestamp -
-                             uas_telemetry_logs[i - 1].timestamp)
-                out_of_bounds_time += time_diff
+                out_of_bounds_us += timestamps_us[i] - timestamps_us[i - 1]
 
-        return (violations, out_of_bounds_time)
+        return (violations, out_of_bounds_us * TELEMETRY_TIME_UNIT)
 
 
 @admin.register(FlyZone)
@@ -1,18 +1,34 @@
 """Mission evaluation."""
 
-import itertools
 import logging
+import multiprocessing
+from auvsi_suas import apps
+from auvsi_suas.models import telemetry_buffer
+from auvsi_suas.models.feedback_cache import FeedbackCache
+from auvsi_suas.models.feedback_cache import fingerprint
+from auvsi_suas.models.flight_telemetry import FlightTelemetry
+from auvsi_suas.models.fly_zone import FlyZone
+from auvsi_suas.models.mission_config import MissionConfig
 from auvsi_suas.models.mission_judge_feedback import MissionJudgeFeedback
 from auvsi_suas.models.odlc import Odlc
 from auvsi_suas.models.odlc import OdlcEvaluator
 from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.telemetry_rate import TelemetryRate
 from auvsi_suas.models.uas_telemetry import UasTelemetry
 from auvsi_suas.proto import interop_admin_api_pb2
 from auvsi_suas.proto import interop_api_pb2
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import Count
+from django.db.models import Max
 
 logger = logging.getLogger(__name__)
 
+# Version of feedback evaluation, changed to invalidate cached feedback.
+FEEDBACK_VERSION = 3
+
 # The time between interop telemetry posts that's a prereq for other tasks.
 INTEROP_TELEM_THRESHOLD_TIME_SEC = 1.0
 
@@ -63,9 +79,106 @@ AIR_DROP_WEIGHT = 0.2
 OPERATIONAL_WEIGHT = 0.1
 
 
+def _values(query, *related):
+    """Gets the values of all fields of the query's objects, and related."""
+    fields = [f.attname for f in query.model._meta.concrete_fields]
+    return list(query.order_by('pk').values_list(*(fields + list(related))))
+
+
+def _telemetry_fingerprint(mission_config, user, flight_periods):
+    """Fingerprints the inputs of the telemetry feedback.
+
+    Telemetry within each flight is identified by its count and max ID.
+    Edits don't change either, so the cached feedback is deleted on edits.
+    """
+    telemetry = [
+        UasTelemetry.by_user(user, p.start, p.end).aggregate(count=Count('id'),
+                                                             max_id=Max('id'))
+        for p in flight_periods
+    ]
+    return fingerprint(
+        FEEDBACK_VERSION, [(p.start, p.end) for p in flight_periods],
+        [(t['count'], t['max_id']) for t in telemetry],
+        (mission_config.home_pos.latitude, mission_config.home_pos.longitude),
+        _values(mission_config.mission_waypoints.all()),
+        _values(mission_config.stationary_obstacles.all()),
+        _values(mission_config.fly_zones.all(), 'boundary_pts__order',
+                'boundary_pts__latitude', 'boundary_pts__longitude'))
+
+
+def _telemetry_feedback(mission_config, user, flight_periods, team_eval):
+    """Fills the feedback derived from the team's telemetry."""
+    feedback = team_eval.feedback
+    # Read and interpolate the telemetry once for all evaluators.
+    telemetry = FlightTelemetry.read(mission_config, user, flight_periods)
+
+    # Determine interop telemetry rates.
+    with telemetry.timed('rates'):
+        telem_max, telem_avg = TelemetryRate.rates(
+            user, flight_periods, time_period_logs=telemetry.period_tracks)
+    if telem_max:
+        feedback.uas_telemetry_time_max_sec = telem_max
+    if telem_avg:
+        feedback.uas_telemetry_time_avg_sec = telem_avg
+
+    # Determine if the uas hit the waypoints.
+    with telemetry.timed('waypoints'):
+        feedback.waypoints.extend(
+            UasTelemetry.satisfied_waypoints_track(
+                mission_config.mission_waypoints.order_by('order'),
+                telemetry.interpolated))
+
+    # Determine collisions with stationary.
+    with telemetry.timed('obstacles'):
+        for obst in mission_config.stationary_obstacles.all():
+            collision = obst.evaluate_track(telemetry.track)
+            obst_eval = feedback.stationary_obstacles.add()
+            obst_eval.id = obst.pk
+            obst_eval.hit = collision.hit
+            if collision.first_hit is not None:
+                obst_eval.first_hit_timestamp = (
+                    collision.first_hit.isoformat())
+            if collision.closest_approach_ft is not None:
+                obst_eval.closest_approach_ft = collision.closest_approach_ft
+
+    # Determine time out of the fly zones.
+    with telemetry.timed('fly_zones'):
+        violations, out_of_bounds_time = FlyZone.out_of_bounds_track(
+            mission_config.fly_zones.all(), telemetry.track)
+    feedback.uas_out_of_bounds = violations
+    feedback.uas_out_of_bounds_sec = out_of_bounds_time.total_seconds()
+
+    logger.info('Evaluated telemetry of %s: %s.', user.username,
+                telemetry.format_timings())
+
+
+def _odlc_fingerprint(mission_config, user_odlcs, flight_periods):
+    """Fingerprints the inputs of the ODLC feedback."""
+    location = ('location__latitude', 'location__longitude')
+    return fingerprint(FEEDBACK_VERSION,
+                       [(p.start, p.end) for p in flight_periods],
+                       _values(user_odlcs, *location),
+                       _values(mission_config.odlcs.all(), *location))
+
+
+def _odlc_feedback(mission_config, user_odlcs, flight_periods, team_eval):
+    """Fills the feedback derived from the team's ODLCs."""
+    for odlc in user_odlcs:
+        if odlc.thumbnail and odlc.thumbnail_approved is None:
+            team_eval.warnings.append(
+                'Odlc thumbnail review not set, may need to review ODLCs.')
+            break
+    evaluator = OdlcEvaluator(user_odlcs, mission_config.odlcs.all(),
+                              flight_periods)
+    team_eval.feedback.odlc.CopyFrom(evaluator.evaluate())
+
+
 def generate_feedback(mission_config, user, team_eval):
     """Generates mission feedback for the given team and mission.
 
+    Feedback derived from telemetry and from ODLCs is cached, and only
+    evaluated again if its inputs changed.
+
     Args:
         mission_config: The mission to evaluate the team against.
         user: The team user object for which to evaluate and provide feedback.
@@ -81,44 +194,24 @@ def generate_feedback(mission_config, user, team_eval):
                 'Infinite flight period, may be missing TakeoffOrLandingEvent.'
             )
             break
-    uas_period_logs = [
-        UasTelemetry.dedupe(logs)
-        for logs in UasTelemetry.by_time_period(user, flight_periods)
-    ]
-    uas_logs = list(itertools.chain.from_iterable(uas_period_logs))
 
-    # Determine interop telemetry rates.
-    telem_max, telem_avg = UasTelemetry.rates(user,
-                                              flight_periods,
-                                              time_period_logs=uas_period_logs)
-    if telem_max:
-        feedback.uas_telemetry_time_max_sec = telem_max
-    if telem_avg:
-        feedback.uas_telemetry_time_avg_sec = telem_avg
-
-    # Determine if the uas hit the waypoints.
-    feedback.waypoints.extend(
-        UasTelemetry.satisfied_waypoints(
-            mission_config.home_pos,
-            mission_config.mission_waypoints.order_by('order'), uas_logs))
+    # Evaluate the telemetry.
+    team_eval.MergeFrom(
+        FeedbackCache.get_or_evaluate(
+            mission_config, user, FeedbackCache.TELEMETRY,
+            _telemetry_fingerprint(mission_config, user, flight_periods),
+            lambda e: _telemetry_feedback(mission_config, user, flight_periods,
+                                          e)))
 
     # Evaluate the object detections.
     user_odlcs = Odlc.objects.filter(user=user).filter(
         mission=mission_config.pk).all()
-    for odlc in user_odlcs:
-        if odlc.thumbnail and odlc.thumbnail_approved is None:
-            team_eval.warnings.append(
-                'Odlc thumbnail review not set, may need to review ODLCs.')
-            break
-    evaluator = OdlcEvaluator(user_odlcs, mission_config.odlcs.all(),
-                              flight_periods)
-    feedback.odlc.CopyFrom(evaluator.evaluate())
-
-    # Determine collisions with stationary.
-    for obst in mission_config.stationary_obstacles.all():
-        obst_eval = feedback.stationary_obstacles.add()
-        obst_eval.id = obst.pk
-        obst_eval.hit = obst.evaluate_collision_with_uas(uas_logs)
+    team_eval.MergeFrom(
+        FeedbackCache.get_or_evaluate(
+            mission_config, user, FeedbackCache.ODLC,
+            _odlc_fingerprint(mission_config, user_odlcs, flight_periods),
+            lambda e: _odlc_feedback(mission_config, user_odlcs,
+                                     flight_periods, e)))
 
     # Add judge feedback.
     try:
@@ -256,15 +349,56 @@ def score_team(team_eval):
         score.score_ratio = 0
 
 
-def evaluate_teams(mission_config, users=None):
+def evaluate_team(mission_config, user, team_eval):
+    """Evaluates a team.
+
+    Args:
+        mission_config: The mission to evaluate the team against.
+        user: The team user object to evaluate.
+        team_eval: The team evaluation to fill.
+    """
+    logger.info('Evaluation starting for user: %s.' % user.username)
+    team_eval.mission = mission_config.pk
+    team_eval.team.username = user.username
+    team_eval.team.name = user.first_name
+    team_eval.team.university = user.last_name
+    # Generate feedback.
+    generate_feedback(mission_config, user, team_eval)
+    # Generate score from feedback.
+    score_team(team_eval)
+
+
+def _evaluate_team_in_worker(mission_pk, user_pk):
+    """Evaluates a team in a worker process.
+
+    Returns:
+        The serialized MissionEvaluation.
+    """
+    mission_config = MissionConfig.objects.get(pk=mission_pk)
+    user = User.objects.get(pk=user_pk)
+    team_eval = interop_admin_api_pb2.MissionEvaluation()
+    evaluate_team(mission_config, user, team_eval)
+    return team_eval.SerializeToString()
+
+
+def evaluate_teams(mission_config, users=None, processes=None, progress=None):
     """Evaluates the teams (non admin users) of the competition.
 
     Args:
         mission_config: The mission to evaluate users against.
         users: Optional list of users to eval. If None will evaluate all.
+        processes: Optional number of processes to evaluate teams in
+            parallel. If None uses settings.MISSION_EVALUATION, and if 0
+            evaluates in this thread.
+        progress: Optional function called with the number of teams
+            evaluated and the number to evaluate, before evaluating and as
+            each team's evaluation is added.
     Returns:
         A auvsi_suas.proto.MultiUserMissionEvaluation.
     """
+    # Ensure buffered telemetry is visible before evaluating it.
+    telemetry_buffer.sync()
+
     # Start a results map from user to MissionEvaluation.
     mission_eval = interop_admin_api_pb2.MultiUserMissionEvaluation()
 
@@ -273,6 +407,7 @@ def evaluate_teams(mission_config, users=None):
         users = User.objects.all()
 
     logger.info('Starting team evaluations.')
+    active_users = []
     for user in sorted(users, key=lambda u: u.username):
         # Ignore admins.
         if user.is_superuser:
@@ -289,17 +424,41 @@ def evaluate_teams(mission_config, users=None):
         if not has_flights and not has_odlcs and not has_feedback:
             logger.info('Filtering inactive user: %s.' % user.username)
             continue
-
-        # Start the evaluation data structure.
-        logger.info('Evaluation starting for user: %s.' % user.username)
-        team_eval = mission_eval.teams.add()
-        team_eval.mission = mission_config.pk
-        team_eval.team.username = user.username
-        team_eval.team.name = user.first_name
-        team_eval.team.university = user.last_name
-        # Generate feedback.
-        generate_feedback(mission_config, user, team_eval)
-        # Generate score from feedback.
-        score_team(team_eval)
-
+        active_users.append(user)
+
+    def added_team():
+        if progress:
+            progress(len(mission_eval.teams), len(active_users))
+
+    added_team()
+    if processes is None:
+        processes = settings.MISSION_EVALUATION['PROCESSES']
+    processes = min(processes, len(active_users))
+    if processes > 1 and multiprocessing.current_process().daemon:
+        logger.warning('Daemon processes can\'t start evaluation processes.')
+        processes = 0
+    if processes <= 1:
+        for user in active_users:
+            evaluate_team(mission_config, user, mission_eval.teams.add())
+            added_team()
+        return mission_eval
+
+    # Workers are spawned rather than forked, as forking copies locks held by
+    # other threads of this process, such as the telemetry buffer's.
+    databases = {
+        alias: connections[alias].settings_dict
+        for alias in connections
+    }
+    with ProcessPoolExecutor(processes,
+                             multiprocessing.get_context('spawn'),
+                             initializer=apps.setup_process,
+                             initargs=(databases, )) as pool:
+        results = [
+            pool.submit(_evaluate_team_in_worker, mission_config.pk, user.pk)
+            for user in active_users
+        ]
+        # Merged in username order, regardless of completion order.
+        for result in results:
+            mission_eval.teams.add().ParseFromString(result.result())
+            added_team()
     return mission_eval
@@ -1,11 +1,17 @@
 """Tests for the mission_evaluation module."""
 
+import multiprocessing
+from unittest import mock
 from django.contrib.auth.models import User
 from django.test import TestCase
+from django.test import TransactionTestCase
 
 from auvsi_suas.models import mission_config
 from auvsi_suas.models import mission_evaluation
 from auvsi_suas.models import test_utils
+from auvsi_suas.models.feedback_cache import FeedbackCache
+from auvsi_suas.models.odlc import Odlc
+from auvsi_suas.models.uas_telemetry import UasTelemetry
 from auvsi_suas.proto import interop_admin_api_pb2
 
 
@@ -322,6 +328,12 @@ class TestMissionEvaluation(TestCase):
         for obst in feedback.stationary_obstacles:
             self.assertGreaterEqual(obst.id, 0)
             self.assertTrue(obst.HasField('hit'))
+            self.assertEqual(obst.hit, obst.HasField('first_hit_timestamp'))
+            if obst.HasField('closest_approach_ft'):
+                self.assertGreaterEqual(obst.closest_approach_ft, 0)
+
+        self.assertTrue(feedback.HasField('uas_out_of_bounds'))
+        self.assertGreaterEqual(feedback.uas_out_of_bounds_sec, 0)
 
         self.assertGreater(feedback.judge.flight_time_sec, 0)
 
@@ -362,3 +374,110 @@ class TestMissionEvaluation(TestCase):
         self.assertEqual(1, len(mission_eval.teams))
         self.assertEqual(self.user0.username,
                          mission_eval.teams[0].team.username)
+
+    def test_progress(self):
+        """Tests progress is reported as each team is evaluated."""
+        progress = []
+        mission_evaluation.evaluate_teams(
+            self.mission, [self.user0],
+            progress=lambda *args: progress.append(args))
+        self.assertEqual([(0, 1), (1, 1)], progress)
+
+    def test_cached_feedback(self):
+        """Tests feedback is only evaluated again when its inputs change."""
+        def evaluate():
+            return mission_evaluation.evaluate_teams(self.mission,
+                                                     [self.user0])
+
+        with mock.patch.object(
+                mission_evaluation,
+                '_telemetry_feedback',
+                wraps=mission_evaluation._telemetry_feedback
+        ) as telemetry, mock.patch.object(
+                mission_evaluation,
+                '_odlc_feedback',
+                wraps=mission_evaluation._odlc_feedback) as odlc:
+            first = evaluate()
+            self.assertEqual(first, evaluate())
+            self.assertEqual(1, telemetry.call_count)
+            self.assertEqual(1, odlc.call_count)
+
+            # Judge feedback isn't cached.
+            judge = self.user0.missionjudgefeedback_set.get()
+            judge.operational_excellence_percent = 50
+            judge.save()
+            self.assertEqual(
+                50,
+                evaluate().teams[0].feedback.judge.
+                operational_excellence_percent)
+            self.assertEqual(1, telemetry.call_count)
+            self.assertEqual(1, odlc.call_count)
+
+            # Reviews change ODLC feedback.
+            Odlc.objects.filter(user=self.user0).update(
+                thumbnail_approved=False)
+            evaluate()
+            self.assertEqual(1, telemetry.call_count)
+            self.assertEqual(2, odlc.call_count)
+
+            # Telemetry removed from a flight changes telemetry feedback.
+            UasTelemetry.objects.filter(
+                user=self.user0).order_by('timestamp').last().delete()
+            evaluate()
+            self.assertEqual(2, telemetry.call_count)
+            self.assertEqual(2, odlc.call_count)
+
+            # Telemetry edited in place changes telemetry feedback.
+            log = UasTelemetry.objects.filter(
+                user=self.user0).order_by('timestamp').last()
+            log.altitude_msl += 100
+            log.save()
+            evaluate()
+            self.assertEqual(3, telemetry.call_count)
+            self.assertEqual(2, odlc.call_count)
+
+            # Mission geometry changes telemetry feedback.
+            waypoint = self.mission.mission_waypoints.first()
+            waypoint.altitude_msl += 100
+            waypoint.save()
+            cached = evaluate()
+            self.assertEqual(4, telemetry.call_count)
+            self.assertEqual(2, odlc.call_count)
+
+        # Cached feedback matches evaluating it again.
+        FeedbackCache.objects.all().delete()
+        self.assertEqual(cached, evaluate())
+
+
+class TestMissionEvaluationProcesses(TransactionTestCase):
+    """Tests evaluating teams in parallel processes.
+
+    The processes use their own database connections, so changes must be
+    committed.
+    """
+    def setUp(self):
+        self.superuser = User.objects.create_superuser(username='superuser',
+                                                       password='testpass',
+                                                       email='test@test.com')
+        self.mission = test_utils.create_sample_mission(self.superuser)
+        for username in ['user2', 'user0', 'user1']:
+            user = User.objects.create_user(username=username,
+                                            password='testpass',
+                                            email='test@test.com')
+            test_utils.simulate_team_mission(self, self.mission,
+                                             self.superuser, user)
+
+    def test_same_as_serial(self):
+        """Tests results match serial evaluation, in username order."""
+        if multiprocessing.current_process().daemon:
+            self.skipTest('Daemon processes can\'t start processes.')
+        serial = mission_evaluation.evaluate_teams(self.mission, processes=0)
+        progress = []
+        parallel = mission_evaluation.evaluate_teams(
+            self.mission,
+            processes=2,
+            progress=lambda *args: progress.append(args))
+        self.assertEqual(['user0', 'user1', 'user2'],
+                         [t.team.username for t in parallel.teams])
+        self.assertEqual(serial, parallel)
+        self.assertEqual([(0, 3), (1, 3), (2, 3), (3, 3)], progress)
@@ -1,8 +1,15 @@
 """Stationary obstacle model."""
 
+import collections
 import logging
+import math
+import numpy as np
+from auvsi_suas.models import units
 from auvsi_suas.models.gps_position import GpsPositionMixin
-from auvsi_suas.models.uas_telemetry import UasTelemetry
+from auvsi_suas.models.uas_telemetry import TELEMETRY_EPOCH
+from auvsi_suas.models.uas_telemetry import TELEMETRY_INTERPOLATION_MAX_GAP
+from auvsi_suas.models.uas_telemetry import TELEMETRY_TIME_UNIT
+from auvsi_suas.models.uas_telemetry import TelemetryTrack
 from django.contrib import admin
 from django.core import validators
 from django.db import models
@@ -11,6 +18,15 @@ logger = logging.getLogger(__name__)
 
 STATIONARY_OBSTACLE_RADIUS_FT_MIN = 30
 STATIONARY_OBSTACLE_RAIDUS_FT_MAX = 300
+# Radius of the Earth, as used by distance.haversine().
+EARTH_RADIUS_FT = units.kilometers_to_feet(6371)
+
+# Result of evaluating a flight against an obstacle. first_hit is the time the
+# UAS first entered the obstacle, or None if it didn't. closest_approach_ft is
+# the closest horizontal distance to the obstacle while at or below its
+# height, 0 if hit, or None if never that low.
+ObstacleCollision = collections.namedtuple(
+    'ObstacleCollision', ['hit', 'first_hit', 'closest_approach_ft'])
 
 
 class StationaryObstacle(GpsPositionMixin):
@@ -40,6 +56,79 @@ class StationaryObstacle(GpsPositionMixin):
         dist_to_center = self.distance_to(aerial_pos)
         return dist_to_center <= self.cylinder_radius
 
+    def evaluate_track(self, track, max_gap=TELEMETRY_INTERPOLATION_MAX_GAP):
+        """Evaluates the flight against the obstacle exactly.
+
+        The UAS flies straight between telemetry which would be interpolated,
+        as by UasTelemetry.interpolate(), and is otherwise only at each
+        telemetry. Each of these segments is intersected with the cylinder in
+        closed form, in a frame of feet east and north of the obstacle in
+        which interpolated positions lie on the segment.
+
+        Args:
+            track: The TelemetryTrack of the flight, sorted by time.
+            max_gap: The max time between telemetry to fly between.
+        Returns:
+            An ObstacleCollision.
+        """
+        lat0 = math.radians(self.latitude)
+        x = (EARTH_RADIUS_FT * math.cos(lat0) *
+             np.radians(track.longitude - self.longitude))
+        y = EARTH_RADIUS_FT * np.radians(track.latitude - self.latitude)
+        z = track.altitude_msl
+        timestamps_us = track.timestamps_us
+
+        # Each segment flown, then each telemetry not on one by itself.
+        dt = np.diff(timestamps_us)
+        flown = np.nonzero((dt > 0)
+                           & (dt <= max_gap // TELEMETRY_TIME_UNIT))[0]
+        alone = np.ones(len(timestamps_us), dtype=bool)
+        alone[flown] = False
+        alone[flown + 1] = False
+        alone = np.nonzero(alone)[0]
+        start = np.concatenate([flown, alone])
+        end = np.concatenate([flown + 1, alone])
+        ax, ay, az = x[start], y[start], z[start]
+        dx, dy, dz = x[end] - ax, y[end] - ay, z[end] - az
+
+        # Interval of each segment, as a fraction along it, at or below the
+        # top of the obstacle.
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s_top = (self.cylinder_height - az) / dz
+            lo = np.where(dz < 0, np.maximum(0, s_top), 0.0)
+            hi = np.where(dz > 0, np.minimum(1, s_top), 1.0)
+        hi = np.where((dz == 0) & (az > self.cylinder_height), -1.0, hi)
+        below = lo <= hi
+
+        # Closest horizontal approach within the interval.
+        a = dx * dx + dy * dy
+        b = ax * dx + ay * dy
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s_closest = np.where(a > 0, -b / a, 0)
+        s_closest = np.clip(s_closest, lo, hi)
+        closest = np.hypot(ax + s_closest * dx, ay + s_closest * dy)
+        hit = below & (closest <= self.cylinder_radius)
+
+        first_hit = None
+        if np.any(hit):
+            # First entry into the radius, within the interval.
+            c = ax * ax + ay * ay - self.cylinder_radius**2
+            disc = np.sqrt(np.maximum(0, b * b - a * c))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                s_enter = np.where(a > 0, (-b - disc) / a, 0)
+            s_enter = np.maximum(lo, s_enter)
+            entered_us = timestamps_us[start] + s_enter * (
+                timestamps_us[end] - timestamps_us[start])
+            first_hit = TELEMETRY_EPOCH + int(round(
+                entered_us[hit].min())) * TELEMETRY_TIME_UNIT
+
+        closest_approach_ft = None
+        if np.any(below):
+            closest_approach_ft = max(
+                0, closest[below].min().item() - self.cylinder_radius)
+        return ObstacleCollision(bool(np.any(hit)), first_hit,
+                                 closest_approach_ft)
+
     def evaluate_collision_with_uas(self, uas_telemetry_logs):
         """Evaluates whether the Uas logs indicate a collision.
 
@@ -50,10 +139,8 @@ class StationaryObstacle(GpsPositionMixin):
             Whether a UAS telemetry log reported indicates a collision with the
             obstacle.
         """
-        for log in UasTelemetry.interpolate(uas_telemetry_logs):
-            if self.contains_pos(log):
-                return True
-        return False
+        return self.evaluate_track(
+            TelemetryTrack.from_logs(uas_telemetry_logs)).hit
 
 
 @admin.register(StationaryObstacle)
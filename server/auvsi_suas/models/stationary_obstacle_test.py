@@ -1,8 +1,18 @@
 """Tests for the stationary_obstacle module."""
 
+import datetime
+import math
+import numpy as np
+import random
+from auvsi_suas.models import distance
 from auvsi_suas.models.aerial_position import AerialPosition
 from auvsi_suas.models.gps_position import GpsPosition
+from auvsi_suas.models.stationary_obstacle import EARTH_RADIUS_FT
+from auvsi_suas.models.stationary_obstacle import ObstacleCollision
 from auvsi_suas.models.stationary_obstacle import StationaryObstacle
+from auvsi_suas.models.uas_telemetry import TELEMETRY_EPOCH
+from auvsi_suas.models.uas_telemetry import TELEMETRY_TIME_UNIT
+from auvsi_suas.models.uas_telemetry import TelemetryTrack
 from auvsi_suas.models.uas_telemetry import UasTelemetry
 from datetime import timedelta
 from django.contrib.auth.models import User
@@ -140,3 +150,113 @@ class TestStationaryObstacleModel(TestCase):
             (45.4338393, -71.8523446, 769.881926415),
         ])
         self.assertFalse(obst.evaluate_collision_with_uas(logs))
+
+
+class TestStationaryObstacleEvaluateTrack(TestCase):
+    """Tests evaluating flights against the obstacle exactly."""
+    def setUp(self):
+        self.obst = StationaryObstacle(latitude=38,
+                                       longitude=-76,
+                                       cylinder_radius=30,
+                                       cylinder_height=100)
+        self.start = datetime.datetime(2020,
+                                       6,
+                                       1,
+                                       tzinfo=datetime.timezone.utc)
+
+    def track(self, entries):
+        """Creates a TelemetryTrack around the obstacle.
+
+        Args:
+            entries: List of (sec, east_ft, north_ft, alt) tuples.
+        """
+        timestamps_us, lat, lon, alt = [], [], [], []
+        for sec, east_ft, north_ft, alt_msl in entries:
+            timestamps_us.append(
+                (self.start + datetime.timedelta(seconds=sec) -
+                 TELEMETRY_EPOCH) // TELEMETRY_TIME_UNIT)
+            lat.append(self.obst.latitude +
+                       math.degrees(north_ft / EARTH_RADIUS_FT))
+            lon.append(self.obst.longitude + math.degrees(east_ft / (
+                EARTH_RADIUS_FT * math.cos(math.radians(self.obst.latitude)))))
+            alt.append(alt_msl)
+        return TelemetryTrack.from_columns(timestamps_us, lat, lon, alt,
+                                           np.zeros(len(entries)))
+
+    def test_empty(self):
+        self.assertEqual(ObstacleCollision(False, None, None),
+                         self.obst.evaluate_track(self.track([])))
+
+    def test_between_samples(self):
+        """Tests a pass the interpolated positions all miss."""
+        track = self.track([(0, -110, 29, 50), (1, 90, 29, 50)])
+        interpolated = UasTelemetry.interpolate(track)
+        self.assertTrue(
+            np.all(
+                distance.distance_to_array(
+                    interpolated.latitude, interpolated.longitude, 0,
+                    self.obst.latitude, self.obst.longitude, 0) > 30))
+
+        collision = self.obst.evaluate_track(track)
+        self.assertTrue(collision.hit)
+        # Enters at 7.68 ft west, 102.32 ft into the 200 ft pass.
+        self.assertAlmostEqual(0.5116, (collision.first_hit -
+                                        self.start).total_seconds(),
+                               places=3)
+        self.assertEqual(0, collision.closest_approach_ft)
+
+    def test_miss(self):
+        collision = self.obst.evaluate_track(
+            self.track([(0, -100, 50, 50), (1, 100, 50, 50)]))
+        self.assertFalse(collision.hit)
+        self.assertIsNone(collision.first_hit)
+        self.assertAlmostEqual(20, collision.closest_approach_ft, places=3)
+
+    def test_above(self):
+        collision = self.obst.evaluate_track(
+            self.track([(0, -100, 0, 150), (1, 100, 0, 101)]))
+        self.assertEqual(ObstacleCollision(False, None, None), collision)
+
+    def test_descent(self):
+        """Tests descending into the top of the obstacle."""
+        collision = self.obst.evaluate_track(
+            self.track([(0, 0, 0, 200), (2, 0, 0, 0)]))
+        self.assertTrue(collision.hit)
+        self.assertAlmostEqual(1, (collision.first_hit -
+                                   self.start).total_seconds())
+
+    def test_over_max_gap(self):
+        """Tests the UAS isn't flown between distant telemetry."""
+        collision = self.obst.evaluate_track(
+            self.track([(0, -100, 0, 50), (10, 100, 0, 50)]))
+        self.assertFalse(collision.hit)
+        self.assertAlmostEqual(70, collision.closest_approach_ft, places=3)
+
+        collision = self.obst.evaluate_track(
+            self.track([(0, 0, 0, 50), (10, 100, 0, 50)]))
+        self.assertTrue(collision.hit)
+        self.assertEqual(self.start, collision.first_hit)
+
+    def test_sampled_hits(self):
+        """Tests the UAS hits whenever an interpolated position does."""
+        rand = random.Random(0)
+        for _ in range(50):
+            sec = 0
+            entries = []
+            for _ in range(10):
+                entries.append((sec, rand.uniform(-200, 200),
+                                rand.uniform(-200, 200), rand.uniform(0, 200)))
+                sec += rand.uniform(0.1, 3)
+            track = self.track(entries)
+            interpolated = UasTelemetry.interpolate(track)
+            dist_to_center = distance.distance_to_array(
+                interpolated.latitude, interpolated.longitude, 0,
+                self.obst.latitude, self.obst.longitude, 0)
+            sampled = np.any((interpolated.altitude_msl <= 100)
+                             & (dist_to_center <= 30))
+            collision = self.obst.evaluate_track(track)
+            if sampled:
+                self.assertTrue(collision.hit)
+            if collision.hit:
+                self.assertEqual(0, collision.closest_approach_ft)
+                self.assertLessEqual(self.start, collision.first_hit)
@@ -52,6 +52,21 @@ class TakeoffOrLandingEvent(AccessLogMixin):
             return event.uas_in_air
         return False
 
+    @classmethod
+    def users_in_air(cls, users):
+        """Determine if the given users are currently in-air, with one query.
+
+        Args:
+            users: Users to get in-flight status for
+        Returns:
+            A dict from user ID to whether the user is currently in-flight.
+        """
+        events = cls.last_for_users(users)
+        return {
+            u.pk: u.pk in events and events[u.pk].uas_in_air
+            for u in users
+        }
+
 
 @admin.register(TakeoffOrLandingEvent)
 class TakeoffOrLandingEventModelAdmin(admin.ModelAdmin):
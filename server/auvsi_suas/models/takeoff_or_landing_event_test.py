@@ -220,6 +220,18 @@ class TestTakeoffOrLandingEventModel(TestAccessLogMixinCommon):
 
         self.assertTrue(TakeoffOrLandingEvent.user_in_air(self.user1))
 
+    def test_users_in_air(self):
+        """In-air status of multiple users."""
+        self.create_event(self.year2000, True)
+
+        with self.assertNumQueries(1):
+            in_air = TakeoffOrLandingEvent.users_in_air(
+                [self.user1, self.user2])
+        self.assertDictEqual({
+            self.user1.pk: True,
+            self.user2.pk: False
+        }, in_air)
+
     def test_user_in_air_time(self):
         """In-air base time check."""
         self.create_event(self.year2000, True)
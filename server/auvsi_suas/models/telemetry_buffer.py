@@ -0,0 +1,531 @@
+"""Write-behind buffer for UAS telemetry.
+
+When enabled, uploaded telemetry is appended to a per-process buffer and to a
+local append-only journal, and is acknowledged without waiting for a database
+commit. A background thread flushes the buffer to the database with a single
+bulk insert every FLUSH_INTERVAL_MS or FLUSH_SIZE samples, whichever is first.
+Telemetry is counted in the rates of the users' flights once inserted.
+
+The journal is split into segments. A segment is created by the first sample
+after a flush, and is deleted once all of its samples are committed. Segments
+are locked by the owning process while open, so a segment which can be locked
+by another process belongs to a process which died before flushing it. Such
+segments are recovered by inserting any samples not already in the database.
+
+The journal is written but not fsync'd, so it protects against process crashes
+and restarts but not against loss of the host.
+
+A flush which fails because of invalid telemetry, such as telemetry of a
+deleted user, is retried in halves until the invalid telemetry is isolated,
+which is logged as journal lines and dropped. A flush which fails for other
+reasons is retried whole by the next flush. Telemetry beyond MAX_PENDING isn't
+buffered, so uploads are inserted directly while flushes fall behind.
+"""
+
+import atexit
+import datetime
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from auvsi_suas.models.telemetry_rate import TelemetryRate
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.conf import settings
+from django.db import DataError
+from django.db import IntegrityError
+from django.db import connection
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Filename pattern of journal segments, formatted with the pid, a token unique
+# to the buffer (as pids are reused), and a counter.
+JOURNAL_SEGMENT_FORMAT = 'telemetry-%d-%s-%d.journal'
+# Glob which matches all journal segments.
+JOURNAL_SEGMENT_GLOB = 'telemetry-*.journal'
+# How often the flush thread logs metrics.
+METRICS_LOG_INTERVAL_SEC = 60
+# How often sync() checks whether other processes have flushed.
+SYNC_POLL_INTERVAL_SEC = 0.01
+# Journal timestamps are integer microseconds since the epoch.
+JOURNAL_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+JOURNAL_TIME_UNIT = datetime.timedelta(microseconds=1)
+
+
+def _to_journal_line(telemetry):
+    """Serializes the telemetry as a line of the journal."""
+    timestamp_us = (telemetry.timestamp - JOURNAL_EPOCH) // JOURNAL_TIME_UNIT
+    return json.dumps([
+        telemetry.user_id, timestamp_us, telemetry.latitude,
+        telemetry.longitude, telemetry.altitude_msl, telemetry.uas_heading,
+        telemetry.sequence
+    ]) + '\n'
+
+
+def _from_journal_line(line):
+    """Deserializes a line of the journal into an unsaved UasTelemetry."""
+    values = json.loads(line)
+    # Journals written before sequence numbers omit them.
+    if len(values) == 6:
+        values.append(None)
+    (user_id, timestamp_us, latitude, longitude, altitude_msl, uas_heading,
+     sequence) = values
+    timestamp = JOURNAL_EPOCH + timestamp_us * JOURNAL_TIME_UNIT
+    return UasTelemetry(user_id=user_id,
+                        timestamp=timestamp,
+                        latitude=latitude,
+                        longitude=longitude,
+                        altitude_msl=altitude_msl,
+                        uas_heading=uas_heading,
+                        sequence=sequence)
+
+
+class _Segment(object):
+    """An open, locked journal segment."""
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def write(self, line):
+        os.write(self.fd, line.encode())
+
+    def remove(self):
+        """Removes the segment, then releases the lock."""
+        os.remove(self.path)
+        os.close(self.fd)
+
+
+def _record_rates(telemetry, not_inserted):
+    """Counts inserted telemetry in the rates of each user's flights.
+
+    Args:
+        telemetry: The telemetry passed to an insert.
+        not_inserted: The telemetry dropped or not inserted.
+    """
+    not_inserted = set(id(t) for t in not_inserted)
+    by_user = {}
+    for t in telemetry:
+        if id(t) not in not_inserted:
+            by_user.setdefault(t.user_id, []).append(t)
+    for user_id, user_telemetry in by_user.items():
+        try:
+            TelemetryRate.record_telemetry(user_id, user_telemetry)
+        except Exception:
+            logger.exception(
+                'Failed to count %d telemetry in rates of user '
+                '%d.', len(user_telemetry), user_id)
+
+
+class TelemetryBuffer(object):
+    """Buffers telemetry in the process and flushes it in batches."""
+    def __init__(self, journal_dir, flush_interval_ms, flush_size,
+                 max_pending):
+        """Creates a buffer.
+
+        Args:
+            journal_dir: Directory in which to write journal segments.
+            flush_interval_ms: Max time between flushes of buffered telemetry.
+            flush_size: Number of buffered telemetry which triggers a flush.
+            max_pending: Max number of telemetry not yet flushed.
+        """
+        self.journal_dir = journal_dir
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_size = flush_size
+        self.max_pending = max_pending
+        os.makedirs(self.journal_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Telemetry not yet flushed, the segment they're journaled in, and
+        # segments of telemetry from failed flushes.
+        self._pending = []
+        self._pending_since = None
+        self._segment = None
+        self._segment_token = uuid.uuid4().hex[:8]
+        self._segment_count = 0
+        self._failed_segments = []
+
+        self._flushes = 0
+        self._flush_errors = 0
+        self._flushed_samples = 0
+        self._dropped_samples = 0
+        self._rejected_samples = 0
+        self._recovered_samples = 0
+        self._last_flush_latency_ms = None
+        self._max_flush_latency_ms = None
+        self._max_queue_depth = 0
+
+    def start(self):
+        """Starts the background flush thread."""
+        self._thread = threading.Thread(target=self._run,
+                                        name='TelemetryBuffer',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background flush thread, and flushes remaining telemetry.
+        """
+        if self._thread is not None:
+            self._stop_event.set()
+            self._flush_event.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def append(self, telemetry):
+        """Journals and buffers the telemetry, like extend()."""
+        return self.extend([telemetry])
+
+    def extend(self, telemetry):
+        """Journals and buffers the telemetry, unless the buffer is full.
+
+        Args:
+            telemetry: A list of unsaved UasTelemetry. Timestamps are set to
+                now if not already set.
+        Returns:
+            Whether the telemetry was buffered. None is buffered if it would
+            exceed max_pending.
+        """
+        now = timezone.now()
+        for t in telemetry:
+            if t.timestamp is None:
+                t.timestamp = now
+        lines = ''.join(_to_journal_line(t) for t in telemetry)
+
+        with self._lock:
+            if len(self._pending) + len(telemetry) > self.max_pending:
+                self._rejected_samples += len(telemetry)
+                return False
+            if self._segment is None:
+                self._segment_count += 1
+                self._segment = _Segment(
+                    os.path.join(
+                        self.journal_dir, JOURNAL_SEGMENT_FORMAT %
+                        (os.getpid(), self._segment_token,
+                         self._segment_count)))
+            self._segment.write(lines)
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.extend(telemetry)
+            queue_depth = len(self._pending)
+            self._max_queue_depth = max(self._max_queue_depth, queue_depth)
+
+        if queue_depth >= self.flush_size:
+            self._flush_event.set()
+        return True
+
+    def flush(self):
+        """Flushes buffered telemetry to the database.
+
+        Returns:
+            Whether all telemetry buffered before the call was committed,
+            rather than dropped or kept for the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                segments = self._failed_segments
+                if self._segment is not None:
+                    segments.append(self._segment)
+                self._pending = []
+                self._pending_since = None
+                self._segment = None
+                self._failed_segments = []
+            if not batch and not segments:
+                return True
+
+            start = time.monotonic()
+            dropped, unflushed = self._insert(batch)
+            _record_rates(batch, dropped + unflushed)
+            if unflushed:
+                # Retry with the next flush, keeping the journal for recovery.
+                # Reconnect if the connection broke, unless the caller is in a
+                # transaction.
+                if not connection.in_atomic_block:
+                    connection.close_if_unusable_or_obsolete()
+                with self._lock:
+                    self._pending = unflushed + self._pending
+                    self._pending_since = start
+                    self._failed_segments = segments
+                    self._flush_errors += 1
+                    self._flushed_samples += (len(batch) - len(dropped) -
+                                              len(unflushed))
+                    self._dropped_samples += len(dropped)
+                return False
+
+            for segment in segments:
+                segment.remove()
+
+            latency_ms = (time.monotonic() - start) * 1000
+            with self._lock:
+                self._flushes += 1
+                self._flushed_samples += len(batch) - len(dropped)
+                self._dropped_samples += len(dropped)
+                self._last_flush_latency_ms = latency_ms
+                self._max_flush_latency_ms = max(
+                    self._max_flush_latency_ms or 0, latency_ms)
+            return not dropped
+
+    def _insert(self, telemetry):
+        """Inserts telemetry, dropping invalid telemetry.
+
+        Telemetry is inserted with a single query. If that fails because of
+        invalid telemetry, it is inserted again in halves, each in its own
+        transaction with deferred foreign keys checked, and failing halves
+        are split until the invalid telemetry is inserted alone.
+
+        Args:
+            telemetry: A list of unsaved UasTelemetry.
+        Returns:
+            A (dropped, unflushed) tuple of lists of the invalid telemetry, and
+            of the telemetry not inserted due to other errors.
+        """
+        try:
+            UasTelemetry.objects.bulk_create(telemetry)
+            return [], []
+        except (DataError, IntegrityError):
+            logger.exception('Failed to insert %d telemetry, retrying halves.',
+                             len(telemetry))
+        except Exception:
+            logger.exception('Failed to insert %d telemetry.', len(telemetry))
+            return [], telemetry
+
+        dropped = []
+        unflushed = []
+        # Stack of telemetry to insert, the next at the end.
+        chunks = [telemetry]
+        while chunks:
+            chunk = chunks.pop()
+            try:
+                with transaction.atomic():
+                    UasTelemetry.objects.bulk_create(chunk)
+                    connection.check_constraints(
+                        table_names=[UasTelemetry._meta.db_table])
+            except (DataError, IntegrityError):
+                if len(chunk) == 1:
+                    dropped.extend(chunk)
+                else:
+                    half = len(chunk) // 2
+                    chunks.extend([chunk[half:], chunk[:half]])
+            except Exception:
+                logger.exception('Failed to insert %d telemetry.', len(chunk))
+                unflushed = chunk + [t for c in reversed(chunks) for t in c]
+                break
+        if dropped:
+            logger.error('Dropped %d invalid telemetry:\n%s', len(dropped),
+                         ''.join(_to_journal_line(t) for t in dropped))
+        return dropped, unflushed
+
+    def recover(self):
+        """Recovers journal segments left by processes which have died.
+
+        Telemetry in the segments which is already in the database, because
+        the process died after committing but before removing the segment, is
+        not inserted again.
+
+        Returns:
+            The number of segments which are still owned by live processes.
+        """
+        live_segments = 0
+        for path in sorted(
+                glob.glob(os.path.join(self.journal_dir,
+                                       JOURNAL_SEGMENT_GLOB))):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                # Flushed by its owner.
+                continue
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    live_segments += 1
+                    continue
+                if not os.path.exists(path):
+                    # Flushed by its owner, or recovered by another process.
+                    continue
+                with os.fdopen(os.dup(fd)) as f:
+                    recovered, unflushed = self._recover_lines(f.readlines())
+                if unflushed:
+                    # Recovered again later, skipping the telemetry inserted.
+                    logger.error(
+                        'Failed to recover %d telemetry from journal segment '
+                        '%s.', unflushed, path)
+                else:
+                    os.remove(path)
+            finally:
+                os.close(fd)
+            logger.warning('Recovered %d telemetry from journal segment %s.',
+                           recovered, path)
+            with self._lock:
+                self._recovered_samples += recovered
+        return live_segments
+
+    def _recover_lines(self, lines):
+        """Inserts telemetry from journal lines not already in the database.
+
+        Returns:
+            A (recovered, unflushed) tuple of the number of telemetry inserted,
+            and of telemetry not inserted due to errors other than invalid
+            telemetry, which is dropped.
+        """
+        telemetry = []
+        for line in lines:
+            try:
+                telemetry.append(_from_journal_line(line))
+            except ValueError:
+                # Partially written line from a crash.
+                logger.warning('Skipping corrupt journal line: %s', line)
+        if not telemetry:
+            return 0, 0
+
+        existing = set(
+            UasTelemetry.objects.filter(
+                user_id__in=set(t.user_id for t in telemetry),
+                timestamp__gte=min(t.timestamp for t in telemetry),
+                timestamp__lte=max(t.timestamp for t in telemetry),
+            ).values_list('user_id', 'timestamp'))
+        telemetry = [
+            t for t in telemetry if (t.user_id, t.timestamp) not in existing
+        ]
+        dropped, unflushed = self._insert(telemetry)
+        _record_rates(telemetry, dropped + unflushed)
+        return (len(telemetry) - len(dropped) - len(unflushed), len(unflushed))
+
+    def sync(self, timeout_sec):
+        """Ensures telemetry acknowledged before the call is in the database.
+
+        Flushes this process's buffer, recovers segments of dead processes, and
+        waits for live processes to flush segments which existed at the call.
+
+        Args:
+            timeout_sec: Max time to wait for other processes.
+        Returns:
+            Whether all telemetry was flushed before the timeout.
+        """
+        deadline = time.monotonic() + timeout_sec
+        self.flush()
+        waiting = set(
+            glob.glob(os.path.join(self.journal_dir, JOURNAL_SEGMENT_GLOB)))
+        while True:
+            self.recover()
+            waiting = set(p for p in waiting if os.path.exists(p))
+            if not waiting:
+                return True
+            if time.monotonic() > deadline:
+                logger.error('Timed out waiting for telemetry flush of: %s',
+                             ', '.join(sorted(waiting)))
+                return False
+            time.sleep(SYNC_POLL_INTERVAL_SEC)
+
+    def stats(self):
+        """Gets metrics for the buffer of this process.
+
+        Returns:
+            A dict of metric name to value.
+        """
+        with self._lock:
+            oldest_pending_ms = None
+            if self._pending_since is not None:
+                oldest_pending_ms = (time.monotonic() -
+                                     self._pending_since) * 1000
+            return {
+                'queue_depth': len(self._pending),
+                'max_queue_depth': self._max_queue_depth,
+                'oldest_pending_ms': oldest_pending_ms,
+                'flushes': self._flushes,
+                'flush_errors': self._flush_errors,
+                'flushed_samples': self._flushed_samples,
+                'dropped_samples': self._dropped_samples,
+                'rejected_samples': self._rejected_samples,
+                'recovered_samples': self._recovered_samples,
+                'last_flush_latency_ms': self._last_flush_latency_ms,
+                'max_flush_latency_ms': self._max_flush_latency_ms,
+            }
+
+    def _run(self):
+        """Flushes the buffer until stopped."""
+        try:
+            self.recover()
+        except Exception:
+            logger.exception('Failed to recover telemetry journal.')
+
+        last_metrics_log = time.monotonic()
+        try:
+            while not self._stop_event.is_set():
+                self._flush_event.wait(self.flush_interval)
+                self._flush_event.clear()
+                self.flush()
+
+                if (time.monotonic() - last_metrics_log >
+                        METRICS_LOG_INTERVAL_SEC):
+                    logger.info('Telemetry buffer metrics: %s', self.stats())
+                    last_metrics_log = time.monotonic()
+        finally:
+            # The thread's connection isn't closed by Django.
+            connection.close()
+
+
+# The buffer of this process, and the pid which created it.
+_buffer = None
+_buffer_pid = None
+_buffer_lock = threading.Lock()
+
+
+def enabled():
+    """Whether telemetry uploads should be buffered."""
+    return settings.TELEMETRY_BUFFER['ENABLED']
+
+
+def get_buffer():
+    """Gets the buffer for this process, starting it if needed.
+
+    Buffers are not shared with forked children, which get their own buffer.
+    """
+    global _buffer, _buffer_pid
+    with _buffer_lock:
+        if _buffer is None or _buffer_pid != os.getpid():
+            config = settings.TELEMETRY_BUFFER
+            _buffer = TelemetryBuffer(config['JOURNAL_DIR'],
+                                      config['FLUSH_INTERVAL_MS'],
+                                      config['FLUSH_SIZE'],
+                                      config['MAX_PENDING'])
+            _buffer_pid = os.getpid()
+            _buffer.start()
+        return _buffer
+
+
+def shutdown():
+    """Stops the buffer for this process, flushing remaining telemetry."""
+    global _buffer, _buffer_pid
+    with _buffer_lock:
+        if _buffer is not None and _buffer_pid == os.getpid():
+            _buffer.stop()
+        _buffer = None
+        _buffer_pid = None
+
+
+atexit.register(shutdown)
+
+
+def sync():
+    """Ensures all acknowledged telemetry is visible in the database.
+
+    Must be called before reading telemetry for evaluation. Does nothing if
+    no process has ever buffered telemetry.
+    """
+    config = settings.TELEMETRY_BUFFER
+    if not enabled() and not glob.glob(
+            os.path.join(config['JOURNAL_DIR'], JOURNAL_SEGMENT_GLOB)):
+        return
+    get_buffer().sync(config['SYNC_TIMEOUT_SEC'])
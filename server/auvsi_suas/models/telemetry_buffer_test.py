@@ -0,0 +1,317 @@
+"""Tests for the telemetry_buffer module."""
+
+import datetime
+import glob
+import os
+import shutil
+import tempfile
+from unittest import mock
+from auvsi_suas.models import telemetry_buffer
+from auvsi_suas.models import test_utils
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.telemetry_buffer import TelemetryBuffer
+from auvsi_suas.models.telemetry_rate import TelemetryRate
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.contrib.auth.models import User
+from django.db import DatabaseError
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test import override_settings
+from django.utils import timezone
+
+
+class TestTelemetryBufferBase(object):
+    """Common setup for telemetry buffer tests."""
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', 'testemail@x.com',
+                                             'testpass')
+        self.journal_dir = tempfile.mkdtemp()
+        self.now = timezone.now()
+
+    def tearDown(self):
+        shutil.rmtree(self.journal_dir)
+
+    def create_buffer(self, flush_size=1000, max_pending=10000):
+        return TelemetryBuffer(self.journal_dir,
+                               flush_interval_ms=10,
+                               flush_size=flush_size,
+                               max_pending=max_pending)
+
+    def create_telemetry(self, ix):
+        return UasTelemetry(user=self.user,
+                            timestamp=self.now +
+                            datetime.timedelta(microseconds=ix),
+                            latitude=38 + ix * 1e-6,
+                            longitude=-76,
+                            altitude_msl=100,
+                            uas_heading=90)
+
+    def create_flight(self):
+        """Creates a flight in progress, which counts telemetry in rates."""
+        superuser = User.objects.create_superuser('superuser',
+                                                  'email@example.com',
+                                                  'superpass')
+        mission = test_utils.create_sample_mission(superuser)
+        takeoff = self.now - datetime.timedelta(seconds=1)
+        TakeoffOrLandingEvent(user=self.user,
+                              mission=mission,
+                              timestamp=takeoff,
+                              uas_in_air=True).save()
+
+    def segments(self):
+        return glob.glob(
+            os.path.join(self.journal_dir,
+                         telemetry_buffer.JOURNAL_SEGMENT_GLOB))
+
+    def assertStored(self, count):
+        logs = UasTelemetry.by_user(self.user)
+        self.assertEqual(count, len(logs))
+        for ix, log in enumerate(logs):
+            expected = self.create_telemetry(ix)
+            self.assertEqual(expected.timestamp, log.timestamp)
+            self.assertAlmostEqual(expected.latitude, log.latitude)
+
+
+class TestTelemetryBuffer(TestTelemetryBufferBase, TestCase):
+    """Tests the TelemetryBuffer class."""
+    def test_flush(self):
+        """Tests buffered telemetry is only stored after flush."""
+        buf = self.create_buffer()
+        for ix in range(10):
+            buf.append(self.create_telemetry(ix))
+
+        self.assertStored(0)
+        self.assertEqual(1, len(self.segments()))
+        self.assertEqual(10, buf.stats()['queue_depth'])
+
+        self.assertTrue(buf.flush())
+        self.assertStored(10)
+        self.assertEqual(0, len(self.segments()))
+
+        stats = buf.stats()
+        self.assertEqual(0, stats['queue_depth'])
+        self.assertEqual(10, stats['max_queue_depth'])
+        self.assertEqual(1, stats['flushes'])
+        self.assertEqual(10, stats['flushed_samples'])
+        self.assertIsNotNone(stats['last_flush_latency_ms'])
+
+    def test_flush_single_query(self):
+        """Tests a flush is a single insert and update of rates."""
+        buf = self.create_buffer()
+        for ix in range(100):
+            buf.append(self.create_telemetry(ix))
+        with self.assertNumQueries(2):
+            buf.flush()
+
+    def test_flush_records_rates(self):
+        """Tests telemetry is counted in rates once flushed."""
+        self.create_flight()
+        buf = self.create_buffer()
+        for ix in range(10):
+            buf.append(self.create_telemetry(ix))
+        self.assertEqual(0, TelemetryRate.objects.get().gap_count)
+
+        self.assertTrue(buf.flush())
+        self.assertEqual(10, TelemetryRate.objects.get().gap_count)
+
+    def test_flush_empty(self):
+        """Tests flushing an empty buffer does nothing."""
+        buf = self.create_buffer()
+        with self.assertNumQueries(0):
+            self.assertTrue(buf.flush())
+        self.assertEqual(0, buf.stats()['flushes'])
+
+    def test_flush_failure_retries(self):
+        """Tests telemetry is kept and journaled when a flush fails."""
+        buf = self.create_buffer()
+        for ix in range(3):
+            buf.append(self.create_telemetry(ix))
+
+        with mock.patch.object(UasTelemetry.objects,
+                               'bulk_create',
+                               side_effect=DatabaseError):
+            self.assertFalse(buf.flush())
+        self.assertEqual(3, buf.stats()['queue_depth'])
+        self.assertEqual(1, buf.stats()['flush_errors'])
+        self.assertEqual(1, len(self.segments()))
+
+        buf.append(self.create_telemetry(3))
+        self.assertEqual(2, len(self.segments()))
+        self.assertTrue(buf.flush())
+        self.assertStored(4)
+        self.assertEqual(0, len(self.segments()))
+
+    def test_extend_full(self):
+        """Tests telemetry beyond max_pending isn't buffered or journaled."""
+        buf = self.create_buffer(max_pending=5)
+        self.assertTrue(
+            buf.extend([self.create_telemetry(ix) for ix in range(3)]))
+        self.assertFalse(
+            buf.extend([self.create_telemetry(ix) for ix in range(3, 6)]))
+        self.assertEqual(3, buf.stats()['queue_depth'])
+        self.assertEqual(3, buf.stats()['rejected_samples'])
+
+        self.assertTrue(buf.flush())
+        self.assertStored(3)
+        self.assertTrue(buf.append(self.create_telemetry(3)))
+
+    def test_recover_dead_segment(self):
+        """Tests segments of dead processes are recovered."""
+        dead = self.create_buffer()
+        for ix in range(5):
+            dead.append(self.create_telemetry(ix))
+
+        # Segment is owned by a live buffer.
+        buf = self.create_buffer()
+        self.assertEqual(1, buf.recover())
+        self.assertStored(0)
+
+        # Simulate the owner dying by releasing its lock.
+        os.close(dead._segment.fd)
+        self.assertEqual(0, buf.recover())
+        self.assertStored(5)
+        self.assertEqual(0, len(self.segments()))
+        self.assertEqual(5, buf.stats()['recovered_samples'])
+
+    def test_recover_skips_committed(self):
+        """Tests recovered telemetry already in the database is skipped."""
+        dead = self.create_buffer()
+        for ix in range(5):
+            dead.append(self.create_telemetry(ix))
+        # Simulate death after commit but before the segment is removed.
+        UasTelemetry.objects.bulk_create(
+            [self.create_telemetry(ix) for ix in range(3)])
+        os.close(dead._segment.fd)
+
+        buf = self.create_buffer()
+        buf.recover()
+        self.assertStored(5)
+        self.assertEqual(2, buf.stats()['recovered_samples'])
+
+    def test_recover_sequence(self):
+        """Tests sequence numbers are recovered, and may be absent."""
+        dead = self.create_buffer()
+        telemetry = self.create_telemetry(0)
+        telemetry.sequence = 42
+        dead.append(telemetry)
+        # Line written before sequence numbers were journaled.
+        dead._segment.write('[%d, %d, 38.000001, -76, 100, 90]\n' %
+                            (self.user.pk,
+                             (self.create_telemetry(1).timestamp -
+                              telemetry_buffer.JOURNAL_EPOCH) //
+                             telemetry_buffer.JOURNAL_TIME_UNIT))
+        os.close(dead._segment.fd)
+
+        buf = self.create_buffer()
+        buf.recover()
+        self.assertStored(2)
+        logs = UasTelemetry.by_user(self.user)
+        self.assertEqual([42, None], [l.sequence for l in logs])
+
+    def test_recover_skips_corrupt_line(self):
+        """Tests a partially written line is skipped."""
+        dead = self.create_buffer()
+        dead.append(self.create_telemetry(0))
+        dead._segment.write('[1, 2, 3')
+        os.close(dead._segment.fd)
+
+        buf = self.create_buffer()
+        buf.recover()
+        self.assertStored(1)
+
+    def test_sync(self):
+        """Tests sync flushes and recovers, and times out on live segments."""
+        dead = self.create_buffer()
+        dead.append(self.create_telemetry(0))
+        os.close(dead._segment.fd)
+
+        buf = self.create_buffer()
+        buf.append(self.create_telemetry(1))
+        self.assertTrue(buf.sync(timeout_sec=1))
+        self.assertStored(2)
+
+        live = self.create_buffer()
+        live.append(self.create_telemetry(2))
+        self.assertFalse(buf.sync(timeout_sec=0.05))
+
+
+class TestTelemetryBufferThread(TestTelemetryBufferBase, TransactionTestCase):
+    """Tests the background flush thread of the process buffer."""
+    def setUp(self):
+        super(TestTelemetryBufferThread, self).setUp()
+        self.settings_override = override_settings(
+            TELEMETRY_BUFFER={
+                'ENABLED': True,
+                'FLUSH_INTERVAL_MS': 10,
+                'FLUSH_SIZE': 5,
+                'MAX_PENDING': 1000,
+                'JOURNAL_DIR': self.journal_dir,
+                'SYNC_TIMEOUT_SEC': 1,
+            })
+        self.settings_override.enable()
+
+    def tearDown(self):
+        telemetry_buffer.shutdown()
+        self.settings_override.disable()
+        super(TestTelemetryBufferThread, self).tearDown()
+
+    def test_background_flush(self):
+        """Tests the thread flushes, and sync makes telemetry visible."""
+        buf = telemetry_buffer.get_buffer()
+        self.assertIs(buf, telemetry_buffer.get_buffer())
+        for ix in range(12):
+            buf.append(self.create_telemetry(ix))
+
+        telemetry_buffer.sync()
+        self.assertStored(12)
+        self.assertEqual(0, len(self.segments()))
+        self.assertEqual(12, buf.stats()['flushed_samples'])
+
+    def test_flush_drops_invalid(self):
+        """Tests invalid telemetry is dropped, and the rest flushed."""
+        self.create_flight()
+        deleted = User.objects.create_user('deleted', 'testemail@x.com',
+                                           'testpass')
+        invalid = self.create_telemetry(100)
+        invalid.user_id = deleted.pk
+        deleted.delete()
+
+        buf = self.create_buffer()
+        for ix in range(2):
+            buf.append(self.create_telemetry(ix))
+        buf.append(invalid)
+        for ix in range(2, 5):
+            buf.append(self.create_telemetry(ix))
+
+        self.assertFalse(buf.flush())
+        self.assertStored(5)
+        self.assertEqual(0, len(self.segments()))
+        stats = buf.stats()
+        self.assertEqual(0, stats['queue_depth'])
+        self.assertEqual(5, stats['flushed_samples'])
+        self.assertEqual(1, stats['dropped_samples'])
+        self.assertEqual(5, TelemetryRate.objects.get().gap_count)
+
+    def test_recover_drops_invalid(self):
+        """Tests invalid telemetry in a dead segment is dropped."""
+        deleted = User.objects.create_user('deleted', 'testemail@x.com',
+                                           'testpass')
+        invalid = self.create_telemetry(100)
+        invalid.user_id = deleted.pk
+        deleted.delete()
+
+        dead = self.create_buffer()
+        dead.append(self.create_telemetry(0))
+        dead.append(invalid)
+        os.close(dead._segment.fd)
+
+        self.create_buffer().recover()
+        self.assertStored(1)
+        self.assertEqual(0, len(self.segments()))
+
+    def test_shutdown_flushes(self):
+        """Tests shutdown flushes remaining telemetry."""
+        buf = telemetry_buffer.get_buffer()
+        buf.append(self.create_telemetry(0))
+        telemetry_buffer.shutdown()
+        self.assertStored(1)
@@ -0,0 +1,329 @@
+"""Cache of each team's latest telemetry and in-air status.
+
+The cache is updated as telemetry is stored, and invalidated as takeoff and
+landing events change, so reading the status of teams doesn't query
+telemetry or events. Teams missing from the cache are read from the database.
+
+Uses the 'telemetry' cache, which must be shared by all processes (e.g.
+memcached) for a process to see the writes of others. A cache local to each
+process is a stand-in for a single process or, with a short timeout, for
+status which may briefly lag. The timeout applies only to status, as versions
+are cached without one.
+
+A version of the status of all teams changes with each write, so clients can
+check whether status changed without reading it, and get which teams changed
+after a version. Versions count changes within an epoch, and a new epoch
+starts if the count is lost or the teams change, after which all status is
+resent.
+"""
+
+import logging
+import math
+import time
+import uuid
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Alias of the cache in settings.CACHES.
+CACHE_ALIAS = 'telemetry'
+# Cached in place of the latest telemetry of a team without any.
+NO_TELEMETRY = ()
+# Key of the current epoch of versions.
+EPOCH_KEY = 'status_epoch'
+# Change count of a team's status while the change is recorded.
+CHANGE_PENDING = float('inf')
+# Interval between checks for a change to the version.
+WAIT_INTERVAL_SEC = 0.1
+
+
+def _telemetry_key(user_id):
+    return 'latest_telemetry:%d' % user_id
+
+
+def _in_air_key(user_id):
+    return 'in_air:%d' % user_id
+
+
+def _count_key(epoch):
+    return 'status_count:%s' % epoch
+
+
+def _waiter_key(slot):
+    return 'status_waiter:%d' % slot
+
+
+def _changed_key(epoch, user_id):
+    return 'status_changed:%s:%d' % (epoch, user_id)
+
+
+def _to_cached(telemetry):
+    """Converts telemetry to a compact cached value."""
+    if telemetry is None:
+        return NO_TELEMETRY
+    return (telemetry.pk, telemetry.timestamp, telemetry.latitude,
+            telemetry.longitude, telemetry.altitude_msl, telemetry.uas_heading)
+
+
+def _from_cached(user_id, value):
+    """Converts a cached value to unsaved telemetry, or None."""
+    if value == NO_TELEMETRY:
+        return None
+    pk, timestamp, latitude, longitude, altitude_msl, uas_heading = value
+    return UasTelemetry(pk=pk,
+                        user_id=user_id,
+                        timestamp=timestamp,
+                        latitude=latitude,
+                        longitude=longitude,
+                        altitude_msl=altitude_msl,
+                        uas_heading=uas_heading)
+
+
+def _new_epoch():
+    """Starts a new epoch of versions, returning its (epoch, count)."""
+    cache = caches[CACHE_ALIAS]
+    epoch = uuid.uuid4().hex
+    cache.set(_count_key(epoch), 0, None)
+    cache.set(EPOCH_KEY, epoch, None)
+    return epoch, 0
+
+
+def _current():
+    """Gets the current (epoch, count), starting an epoch if either is lost."""
+    cache = caches[CACHE_ALIAS]
+    epoch = cache.get(EPOCH_KEY)
+    if epoch is not None:
+        count = cache.get(_count_key(epoch))
+        if count is not None:
+            return epoch, count
+    return _new_epoch()
+
+
+def version():
+    """Gets the version of the status of all teams.
+
+    Returns:
+        A string which changes whenever the status of a team changes.
+    """
+    return '%s:%d' % _current()
+
+
+def _changed(user_ids):
+    """Changes the version, recording the users whose status changed.
+
+    Must be called after the status is changed, so the new version isn't read
+    with old status.
+    """
+    cache = caches[CACHE_ALIAS]
+    epoch = cache.get(EPOCH_KEY)
+    if epoch is None:
+        _new_epoch()
+        return
+    keys = [_changed_key(epoch, user_id) for user_id in user_ids]
+    # Marked changed before the count changes, so readers of the new count
+    # see the change.
+    cache.set_many({key: CHANGE_PENDING for key in keys}, None)
+    try:
+        count = cache.incr(_count_key(epoch))
+    except ValueError:
+        # The count was lost, so all status will be resent.
+        _new_epoch()
+        return
+    cache.set_many({key: count for key in keys}, None)
+
+
+def changes(since, users):
+    """Gets the users whose status changed after a version.
+
+    Args:
+        since: A version from version().
+        users: The users to check.
+    Returns:
+        A (version, changed) tuple of the current version and a list of the
+        users whose status changed. changed is None if the status of all
+        users must be resent, as since isn't of the current epoch.
+    """
+    epoch, count = _current()
+    current = '%s:%d' % (epoch, count)
+    since_epoch, _, since_count = since.partition(':')
+    if since_epoch != epoch or not since_count.isdigit():
+        return current, None
+    since_count = int(since_count)
+
+    cache = caches[CACHE_ALIAS]
+    keys = {user.pk: _changed_key(epoch, user.pk) for user in users}
+    counts = cache.get_many(list(keys.values()))
+    changed = []
+    for user in users:
+        key = keys[user.pk]
+        if key not in counts:
+            # Not changed this epoch, or evicted. Only resent once, unless
+            # changed.
+            cache.add(key, 0, None)
+            changed.append(user)
+        elif counts[key] > since_count:
+            changed.append(user)
+    return current, changed
+
+
+def wait_for_change(since, timeout_sec, max_waiters):
+    """Blocks until the version differs from since, up to a timeout.
+
+    Waiting calls hold one of max_waiters slots in the cache, so the limit
+    applies to all processes sharing the cache. Slots expire after the
+    timeout, in case a process dies while waiting.
+
+    Args:
+        since: A version from version().
+        timeout_sec: Max time to block in seconds.
+        max_waiters: Max calls blocking at once.
+    Returns:
+        False if the version is unchanged and all slots are held, so the call
+        didn't block. True otherwise.
+    """
+    if timeout_sec <= 0 or version() != since:
+        return True
+    cache = caches[CACHE_ALIAS]
+    slot_timeout = math.ceil(timeout_sec) + 1
+    slot = next((s for s in range(max_waiters)
+                 if cache.add(_waiter_key(s), True, slot_timeout)), None)
+    if slot is None:
+        return False
+
+    try:
+        deadline = time.monotonic() + timeout_sec
+        while version() == since:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(WAIT_INTERVAL_SEC, remaining))
+    finally:
+        cache.delete(_waiter_key(slot))
+    return True
+
+
+def latest(users):
+    """Gets the latest telemetry and in-air status of the users.
+
+    Args:
+        users: The users to get the status of.
+    Returns:
+        A dict from user ID to a (telemetry, in_air) tuple, where telemetry is
+        the latest UasTelemetry or None if the user has none.
+    """
+    cache = caches[CACHE_ALIAS]
+    keys = []
+    for user in users:
+        keys.extend([_telemetry_key(user.pk), _in_air_key(user.pk)])
+    cached = cache.get_many(keys)
+
+    # Read the misses of all users together, with a query each.
+    telemetry_missed = [u for u in users if _telemetry_key(u.pk) not in cached]
+    if telemetry_missed:
+        last_telemetry = UasTelemetry.last_for_users(telemetry_missed)
+    in_air_missed = [u for u in users if _in_air_key(u.pk) not in cached]
+    if in_air_missed:
+        in_air_read = TakeoffOrLandingEvent.users_in_air(in_air_missed)
+
+    status = {}
+    missed = {}
+    for user in users:
+        telemetry_key = _telemetry_key(user.pk)
+        if telemetry_key in cached:
+            telemetry = _from_cached(user.pk, cached[telemetry_key])
+        else:
+            telemetry = last_telemetry.get(user.pk)
+            missed[telemetry_key] = _to_cached(telemetry)
+
+        in_air_key = _in_air_key(user.pk)
+        if in_air_key in cached:
+            in_air = cached[in_air_key]
+        else:
+            in_air = in_air_read[user.pk]
+            missed[in_air_key] = in_air
+
+        status[user.pk] = (telemetry, in_air)
+    if missed:
+        cache.set_many(missed)
+    return status
+
+
+def record_telemetry(user, telemetry):
+    """Updates the latest telemetry of the user with stored telemetry.
+
+    Args:
+        user: The user which uploaded the telemetry.
+        telemetry: The stored UasTelemetry.
+    """
+    if not telemetry:
+        return
+    newest = max(telemetry, key=lambda t: t.timestamp)
+    cache = caches[CACHE_ALIAS]
+    key = _telemetry_key(user.pk)
+    # If not cached the telemetry may not be the latest, so leave it to be
+    # read from the database. Concurrent writes may race, leaving older
+    # telemetry until the next write.
+    current = cache.get(key)
+    if current is not None and (current == NO_TELEMETRY
+                                or current[1] <= newest.timestamp):
+        cache.set(key, _to_cached(newest))
+    _changed([user.pk])
+
+
+def _delete(user_ids, keys):
+    """Deletes the keys of the users now, and once the transaction commits.
+
+    Deleting again after the commit removes values read from the database by
+    other processes before the commit.
+    """
+    cache = caches[CACHE_ALIAS]
+    cache.delete_many(keys)
+    _changed(user_ids)
+
+    def on_commit():
+        cache.delete_many(keys)
+        _changed(user_ids)
+
+    transaction.on_commit(on_commit)
+
+
+def invalidate(user_ids):
+    """Invalidates the status of the users, after bulk changes."""
+    keys = []
+    for user_id in user_ids:
+        keys.extend([_telemetry_key(user_id), _in_air_key(user_id)])
+    _delete(user_ids, keys)
+
+
+@receiver(post_save, sender=TakeoffOrLandingEvent)
+@receiver(post_delete, sender=TakeoffOrLandingEvent)
+def invalidate_in_air(sender, instance, **kwargs):
+    """Invalidates the in-air status of the user of a changed event."""
+    _delete([instance.user_id], [_in_air_key(instance.user_id)])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_teams(sender, instance, update_fields=None, **kwargs):
+    """Resends all status on changes to the teams themselves."""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        # Logins don't change status.
+        return
+    _new_epoch()
+    transaction.on_commit(_new_epoch)
+
+
+@receiver(post_save, sender=UasTelemetry)
+def update_on_telemetry(sender, instance, created, **kwargs):
+    """Updates for telemetry saved individually, rather than uploaded."""
+    if created:
+        record_telemetry(instance.user, [instance])
+    else:
+        invalidate([instance.user_id])
@@ -0,0 +1,178 @@
+"""Tests for the telemetry_cache module."""
+
+import datetime
+import time
+from auvsi_suas.models import telemetry_cache
+from auvsi_suas.models import test_utils
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase
+from django.utils import timezone
+from unittest import mock
+
+
+class TestTelemetryCache(TestCase):
+    """Tests the latest telemetry cache."""
+    def setUp(self):
+        caches[telemetry_cache.CACHE_ALIAS].clear()
+        self.superuser = User.objects.create_superuser('superuser',
+                                                       'email@example.com',
+                                                       'superpass')
+        self.user = User.objects.create_user('user', 'email@example.com',
+                                             'pass')
+        self.mission = test_utils.create_sample_mission(self.superuser)
+        self.now = timezone.now()
+
+    def create_telemetry(self, offset_sec, latitude=38):
+        return UasTelemetry(user=self.user,
+                            timestamp=self.now +
+                            datetime.timedelta(seconds=offset_sec),
+                            latitude=latitude,
+                            longitude=-76,
+                            altitude_msl=100,
+                            uas_heading=90)
+
+    def upload_telemetry(self, telemetry):
+        """Stores telemetry like an upload."""
+        UasTelemetry.objects.bulk_create(telemetry)
+        telemetry_cache.record_telemetry(self.user, telemetry)
+
+    def latest(self):
+        return telemetry_cache.latest([self.user])[self.user.pk]
+
+    def test_no_telemetry(self):
+        """Tests a team without telemetry is cached."""
+        self.assertEqual((None, False), self.latest())
+        with self.assertNumQueries(0):
+            self.assertEqual((None, False), self.latest())
+
+    def test_cached(self):
+        """Tests the status is read from the database once."""
+        self.create_telemetry(0).save()
+        with self.assertNumQueries(2):
+            telemetry, in_air = self.latest()
+        with self.assertNumQueries(0):
+            cached, cached_in_air = self.latest()
+        self.assertEqual(telemetry.pk, cached.pk)
+        self.assertEqual(telemetry.timestamp, cached.timestamp)
+        self.assertEqual(telemetry.latitude, cached.latitude)
+        self.assertEqual(in_air, cached_in_air)
+
+    def test_updated_on_write(self):
+        """Tests stored telemetry updates the cache."""
+        self.assertIsNone(self.latest()[0])
+        self.upload_telemetry(
+            [self.create_telemetry(1, 39),
+             self.create_telemetry(2, 40)])
+        with self.assertNumQueries(0):
+            self.assertEqual(40, self.latest()[0].latitude)
+
+        # Older telemetry doesn't replace newer.
+        self.upload_telemetry([self.create_telemetry(0, 41)])
+        self.assertEqual(40, self.latest()[0].latitude)
+
+        self.create_telemetry(3, 42).save()
+        self.assertEqual(42, self.latest()[0].latitude)
+
+    def test_in_air_invalidated(self):
+        """Tests events invalidate the in-air status."""
+        self.assertFalse(self.latest()[1])
+        event = TakeoffOrLandingEvent(user=self.user,
+                                      mission=self.mission,
+                                      uas_in_air=True)
+        event.save()
+        self.assertTrue(self.latest()[1])
+        event.delete()
+        self.assertFalse(self.latest()[1])
+
+    def test_invalidate(self):
+        """Tests bulk changes are read from the database."""
+        self.upload_telemetry([self.create_telemetry(0)])
+        self.assertIsNotNone(self.latest()[0])
+        UasTelemetry.objects.filter(user=self.user).delete()
+        telemetry_cache.invalidate([self.user.pk])
+        self.assertIsNone(self.latest()[0])
+
+    def test_version(self):
+        """Tests the version changes with status."""
+        version = telemetry_cache.version()
+        self.assertEqual(version, telemetry_cache.version())
+
+        self.upload_telemetry([self.create_telemetry(0)])
+        self.assertNotEqual(version, telemetry_cache.version())
+        version = telemetry_cache.version()
+
+        TakeoffOrLandingEvent(user=self.user,
+                              mission=self.mission,
+                              uas_in_air=True).save()
+        self.assertNotEqual(version, telemetry_cache.version())
+        version = telemetry_cache.version()
+
+        self.user.first_name = 'Team'
+        self.user.save()
+        self.assertNotEqual(version, telemetry_cache.version())
+        version = telemetry_cache.version()
+
+        # Evicted versions are replaced with new ones.
+        caches[telemetry_cache.CACHE_ALIAS].clear()
+        self.assertNotEqual(version, telemetry_cache.version())
+
+    def test_version_not_expired(self):
+        """Tests the version doesn't expire with the status timeout."""
+        self.upload_telemetry([self.create_telemetry(0)])
+        version = telemetry_cache.version()
+        with mock.patch.object(time, 'time', return_value=time.time() + 3600):
+            self.assertEqual((version, []),
+                             telemetry_cache.changes(version, [self.user]))
+
+    def test_changes(self):
+        """Tests the users changed after a version."""
+        other = User.objects.create_user('other', 'email@example.com', 'pass')
+        version, changed = telemetry_cache.changes('', [self.user, other])
+        self.assertIsNone(changed)
+
+        # Users not yet known unchanged are sent once.
+        self.assertEqual([self.user, other],
+                         telemetry_cache.changes(version,
+                                                 [self.user, other])[1])
+        self.assertEqual((version, []),
+                         telemetry_cache.changes(version, [self.user, other]))
+
+        self.upload_telemetry([self.create_telemetry(0)])
+        new_version, changed = telemetry_cache.changes(version,
+                                                       [self.user, other])
+        self.assertNotEqual(version, new_version)
+        self.assertEqual([self.user], changed)
+        self.assertEqual([],
+                         telemetry_cache.changes(new_version,
+                                                 [self.user, other])[1])
+
+        # Lost counts resend all status.
+        caches[telemetry_cache.CACHE_ALIAS].clear()
+        self.assertIsNone(
+            telemetry_cache.changes(new_version, [self.user, other])[1])
+
+    def test_wait_for_change(self):
+        version = telemetry_cache.version()
+        start = time.monotonic()
+        self.assertTrue(telemetry_cache.wait_for_change(version, 0.2, 1))
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+        self.upload_telemetry([self.create_telemetry(0)])
+        start = time.monotonic()
+        self.assertTrue(telemetry_cache.wait_for_change(version, 10, 1))
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_wait_for_change_max_waiters(self):
+        """Tests calls beyond max_waiters don't block."""
+        version = telemetry_cache.version()
+        self.assertFalse(telemetry_cache.wait_for_change(version, 10, 0))
+        # The slot is released after waiting.
+        self.assertTrue(telemetry_cache.wait_for_change(version, 0.01, 1))
+        self.assertTrue(telemetry_cache.wait_for_change(version, 0.01, 1))
+
+        # Changes are sent without waiting.
+        self.upload_telemetry([self.create_telemetry(0)])
+        self.assertTrue(telemetry_cache.wait_for_change(version, 10, 0))
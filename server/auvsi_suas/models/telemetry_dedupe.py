@@ -0,0 +1,131 @@
+"""Ingest-time dedupe of UAS telemetry.
+
+Drops telemetry which is already stored before it is inserted:
+
+* Exact duplicates: telemetry with the same values as the team's last
+  telemetry, which UasTelemetry.dedupe would filter at evaluation.
+* Replays: telemetry with the same sequence number and values as one of the
+  team's recent telemetry, such as a retried upload. Sequence numbers reused
+  with different values, like after a team's client restarts, are not replays.
+
+Each process caches the recent telemetry of each team, so the check doesn't
+read the database. The cache is seeded from the database the first time a team
+uploads to the process. Processes don't share caches, so a replay handled by a
+different process than the original may still be stored, and is filtered at
+evaluation if it is an exact duplicate.
+"""
+
+import collections
+import logging
+import threading
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+
+logger = logging.getLogger(__name__)
+
+# Number of recent telemetry per team checked for replays, which covers a
+# retried max size batch.
+DEDUPE_WINDOW = 1000
+
+# Protects _teams.
+_lock = threading.Lock()
+# Recent telemetry of each team by user ID.
+_teams = {}
+
+
+def _values(telemetry):
+    """Gets the values compared to detect duplicates."""
+    return (telemetry.latitude, telemetry.longitude, telemetry.altitude_msl,
+            telemetry.uas_heading)
+
+
+class _RecentTelemetry(object):
+    """The recent telemetry of a team."""
+    def __init__(self):
+        # Values of the last telemetry.
+        self.last = None
+        # Values of recent telemetry by sequence number, in insertion order.
+        self.sequences = collections.OrderedDict()
+
+    def is_duplicate(self, telemetry):
+        """Whether the telemetry has the same values as the last."""
+        return _values(telemetry) == self.last
+
+    def is_replay(self, telemetry):
+        """Whether the telemetry has the sequence and values of a recent one."""
+        return (telemetry.sequence is not None and self.sequences.get(
+            telemetry.sequence) == _values(telemetry))
+
+    def add(self, values, sequence):
+        """Adds the values and sequence number of the most recent telemetry."""
+        self.last = values
+        if sequence is None:
+            return
+        self.sequences[sequence] = values
+        self.sequences.move_to_end(sequence)
+        if len(self.sequences) > DEDUPE_WINDOW:
+            self.sequences.popitem(last=False)
+
+
+def _recent_from_db(user):
+    """Reads the recent telemetry of the team from the database."""
+    rows = UasTelemetry.objects.filter(
+        user=user).order_by('-timestamp').values_list(
+            'latitude', 'longitude', 'altitude_msl', 'uas_heading',
+            'sequence')[:DEDUPE_WINDOW]
+    recent = _RecentTelemetry()
+    for row in reversed(list(rows)):
+        recent.add(row[:4], row[4])
+    return recent
+
+
+def filter_new(user, telemetry):
+    """Filters telemetry which is a duplicate or replay.
+
+    Doesn't record the telemetry as stored, see record().
+
+    Args:
+        user: The user which uploaded the telemetry.
+        telemetry: Unsaved UasTelemetry, in time order.
+    Returns:
+        A list of the telemetry which should be stored, in the given order.
+    """
+    recent = _teams.get(user.pk)
+    if recent is None:
+        # Read outside the lock, other teams needn't wait for the database.
+        seeded = _recent_from_db(user)
+        with _lock:
+            recent = _teams.setdefault(user.pk, seeded)
+
+    new = []
+    with _lock:
+        # Telemetry earlier in the list, which may also be duplicated.
+        listed = _RecentTelemetry()
+        listed.last = recent.last
+        for t in telemetry:
+            if not (listed.is_duplicate(t) or recent.is_replay(t)
+                    or listed.is_replay(t)):
+                new.append(t)
+            listed.add(_values(t), t.sequence)
+    return new
+
+
+def record(user, telemetry):
+    """Records telemetry as stored for the team.
+
+    Args:
+        user: The user which uploaded the telemetry.
+        telemetry: The stored UasTelemetry, in time order.
+    """
+    with _lock:
+        recent = _teams.get(user.pk)
+        if recent is None:
+            # Seeded from the database by the next filter_new().
+            return
+        for t in telemetry:
+            recent.add(_values(t), t.sequence)
+
+
+def clear():
+    """Clears the cache, so it is reseeded from the database."""
+    with _lock:
+        _teams.clear()
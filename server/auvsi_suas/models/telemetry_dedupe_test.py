@@ -0,0 +1,108 @@
+"""Tests for the telemetry_dedupe module."""
+
+import datetime
+from auvsi_suas.models import telemetry_dedupe
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from unittest import mock
+
+
+class TestTelemetryDedupe(TestCase):
+    """Tests the ingest-time dedupe."""
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', 'testemail@x.com',
+                                             'testpass')
+        self.now = timezone.now()
+        telemetry_dedupe.clear()
+
+    def create_telemetry(self, lat, sequence=None, ix=0):
+        return UasTelemetry(user=self.user,
+                            timestamp=self.now +
+                            datetime.timedelta(seconds=ix),
+                            latitude=lat,
+                            longitude=-76,
+                            altitude_msl=100,
+                            uas_heading=90,
+                            sequence=sequence)
+
+    def store(self, telemetry):
+        """Stores new telemetry like an upload, returning the stored."""
+        new = telemetry_dedupe.filter_new(self.user, telemetry)
+        UasTelemetry.objects.bulk_create(new)
+        telemetry_dedupe.record(self.user, new)
+        return [t.latitude for t in new]
+
+    def test_duplicate(self):
+        """Tests consecutive duplicates are dropped."""
+        self.assertEqual([38, 39],
+                         self.store([
+                             self.create_telemetry(38),
+                             self.create_telemetry(38),
+                             self.create_telemetry(39),
+                         ]))
+        self.assertEqual([], self.store([self.create_telemetry(39)]))
+        # Not consecutive, so not a duplicate without a sequence number.
+        self.assertEqual([38], self.store([self.create_telemetry(38)]))
+
+    def test_replay(self):
+        """Tests telemetry with a recent sequence number and values is dropped."""
+        self.assertEqual([38, 39],
+                         self.store([
+                             self.create_telemetry(38, sequence=1),
+                             self.create_telemetry(39, sequence=2),
+                         ]))
+        self.assertEqual([40],
+                         self.store([
+                             self.create_telemetry(38, sequence=1),
+                             self.create_telemetry(39, sequence=2),
+                             self.create_telemetry(40, sequence=3),
+                         ]))
+        # A replay earlier in the same list.
+        self.assertEqual([41, 42],
+                         self.store([
+                             self.create_telemetry(41, sequence=4),
+                             self.create_telemetry(42, sequence=5),
+                             self.create_telemetry(41, sequence=4),
+                         ]))
+
+    def test_sequence_reused(self):
+        """Tests a reused sequence number with new values isn't a replay."""
+        self.assertEqual([38], self.store([self.create_telemetry(38, 1)]))
+        self.assertEqual([39], self.store([self.create_telemetry(39, 1)]))
+        self.assertEqual([], self.store([self.create_telemetry(39, 1)]))
+
+    def test_not_recorded_until_stored(self):
+        """Tests filtered telemetry may be retried until recorded."""
+        telemetry = [self.create_telemetry(38, sequence=1)]
+        self.assertEqual(
+            1, len(telemetry_dedupe.filter_new(self.user, telemetry)))
+        self.assertEqual(
+            1, len(telemetry_dedupe.filter_new(self.user, telemetry)))
+
+    def test_seeded_from_db(self):
+        """Tests the cache is read from the database once per team."""
+        self.store([
+            self.create_telemetry(38, sequence=1, ix=0),
+            self.create_telemetry(39, sequence=2, ix=1),
+        ])
+        telemetry_dedupe.clear()
+
+        with self.assertNumQueries(1):
+            self.assertEqual([], [
+                t.latitude for t in telemetry_dedupe.filter_new(
+                    self.user, [self.create_telemetry(38, sequence=1)])
+            ])
+        with self.assertNumQueries(0):
+            self.assertEqual([], [
+                t.latitude for t in telemetry_dedupe.filter_new(
+                    self.user, [self.create_telemetry(39)])
+            ])
+
+    @mock.patch.object(telemetry_dedupe, 'DEDUPE_WINDOW', 2)
+    def test_window(self):
+        """Tests replays older than the window are stored."""
+        self.store(
+            [self.create_telemetry(38 + ix, sequence=ix) for ix in range(3)])
+        self.assertEqual([38], self.store([self.create_telemetry(38, 0)]))
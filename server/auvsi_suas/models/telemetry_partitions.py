@@ -0,0 +1,264 @@
+"""Time range partitioning of the UAS telemetry table.
+
+When enabled, the UasTelemetry table is a Postgres partitioned table, range
+partitioned by timestamp into partitions of INTERVAL_DAYS each. Time range
+queries, such as AccessLogMixin.by_user, are pruned by the planner to the
+partitions within the range, and old partitions can be detached from the
+table rather than deleting their rows.
+
+Converting an existing table keeps its rows in a DEFAULT partition, which also
+receives telemetry outside of all created partitions. Creating a partition
+moves its rows out of the DEFAULT partition, so existing data can be
+partitioned after conversion.
+
+The partitioned table's primary key is (id, timestamp), as Postgres requires
+the partition key in unique constraints. IDs remain unique, as they are all
+allocated from the same sequence.
+"""
+
+import datetime
+import iso8601
+import logging
+import re
+from auvsi_suas.models import telemetry_cache
+from auvsi_suas.models.flight_track import FlightTrack
+from auvsi_suas.models.telemetry_rate import TelemetryRate
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Suffix of the DEFAULT partition's name, and of its renamed constraints.
+DEFAULT_PARTITION_SUFFIX = '_default'
+# Format of a partition's name suffix, from its start time.
+PARTITION_SUFFIX_FORMAT = '_p%Y%m%d'
+# Max length of a Postgres identifier.
+MAX_IDENTIFIER_LENGTH = 63
+# Partitions are aligned to UTC midnight.
+PARTITION_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# Matches the bounds of a range partition, from pg_get_expr.
+PARTITION_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def _table():
+    return UasTelemetry._meta.db_table
+
+
+def _qn(name):
+    return connection.ops.quote_name(name)
+
+
+def enabled():
+    """Whether partitioning is enabled and supported by the database."""
+    return (settings.TELEMETRY_PARTITIONING['ENABLED']
+            and connection.vendor == 'postgresql')
+
+
+def interval():
+    """Gets the time range of each partition."""
+    return datetime.timedelta(
+        days=settings.TELEMETRY_PARTITIONING['INTERVAL_DAYS'])
+
+
+def is_partitioned():
+    """Whether the telemetry table is a partitioned table."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT relkind FROM pg_class WHERE relname = %s '
+            'AND relnamespace = current_schema()::regnamespace', [_table()])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def _check_deferred_constraints(cursor):
+    """Checks pending deferred constraints, which would block ALTER TABLE."""
+    cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+def convert():
+    """Converts the telemetry table into a partitioned table.
+
+    The existing table becomes the DEFAULT partition of a new partitioned
+    table, with the same columns, indexes and foreign keys. Does nothing if
+    the table is already partitioned.
+    """
+    if is_partitioned():
+        return
+    table = _table()
+    default = table + DEFAULT_PARTITION_SUFFIX
+    partition_key = UasTelemetry._meta.get_field('timestamp').column
+    logger.info('Converting %s to a partitioned table.', table)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _check_deferred_constraints(cursor)
+        constraints = connection.introspection.get_constraints(cursor, table)
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)',
+                       [table, UasTelemetry._meta.pk.column])
+        sequence = cursor.fetchone()[0]
+
+        cursor.execute('ALTER TABLE %s RENAME TO %s' %
+                       (_qn(table), _qn(default)))
+        # Free the constraint names for the partitioned table. Foreign keys
+        # and the primary key are dropped, as the partitioned table's are
+        # cloned when attached.
+        for name, c in constraints.items():
+            renamed = (
+                name[:MAX_IDENTIFIER_LENGTH - len(DEFAULT_PARTITION_SUFFIX)] +
+                DEFAULT_PARTITION_SUFFIX)
+            if c['foreign_key'] or c['primary_key']:
+                cursor.execute('ALTER TABLE %s DROP CONSTRAINT %s' %
+                               (_qn(default), _qn(name)))
+            elif c['index']:
+                cursor.execute('ALTER INDEX %s RENAME TO %s' %
+                               (_qn(name), _qn(renamed)))
+
+        cursor.execute('CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS) '
+                       'PARTITION BY RANGE (%s)' %
+                       (_qn(table), _qn(default), _qn(partition_key)))
+        for name, c in constraints.items():
+            columns = ', '.join(_qn(col) for col in c['columns'])
+            if c['foreign_key']:
+                cursor.execute(
+                    'ALTER TABLE %s ADD CONSTRAINT %s FOREIGN KEY (%s) '
+                    'REFERENCES %s (%s) DEFERRABLE INITIALLY DEFERRED' %
+                    (_qn(table), _qn(name), columns, _qn(
+                        c['foreign_key'][0]), _qn(c['foreign_key'][1])))
+            elif c['primary_key']:
+                cursor.execute(
+                    'ALTER TABLE %s ADD CONSTRAINT %s PRIMARY KEY (%s, %s)' %
+                    (_qn(table), _qn(name), columns, _qn(partition_key)))
+            elif c['index']:
+                cursor.execute('CREATE INDEX %s ON %s (%s)' %
+                               (_qn(name), _qn(table), columns))
+        cursor.execute(
+            'ALTER SEQUENCE %s OWNED BY %s.%s' %
+            (sequence, _qn(table), _qn(UasTelemetry._meta.pk.column)))
+        cursor.execute('ALTER TABLE %s ATTACH PARTITION %s DEFAULT' %
+                       (_qn(table), _qn(default)))
+
+
+def partitions():
+    """Gets the range partitions of the telemetry table.
+
+    Returns:
+        A list of (name, start, end) tuples sorted by start, excluding the
+        DEFAULT partition.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) '
+            'FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid '
+            'JOIN pg_class p ON p.oid = i.inhparent '
+            'WHERE p.relname = %s '
+            'AND p.relnamespace = current_schema()::regnamespace', [_table()])
+        rows = cursor.fetchall()
+
+    found = []
+    for name, bound in rows:
+        match = PARTITION_BOUND_RE.search(bound)
+        if not match:
+            continue
+        start, end = [iso8601.parse_date(b) for b in match.groups()]
+        found.append((name, start, end))
+    return sorted(found, key=lambda p: p[1])
+
+
+def partition_start(timestamp):
+    """Gets the start of the partition containing the timestamp."""
+    return PARTITION_EPOCH + (
+        (timestamp - PARTITION_EPOCH) // interval()) * interval()
+
+
+def create_partition(start):
+    """Creates the partition starting at start, if it doesn't exist.
+
+    Telemetry within the partition is moved out of the DEFAULT partition.
+
+    Args:
+        start: The start of the partition, aligned by partition_start.
+    Returns:
+        The name of the created partition, or None if it exists.
+    """
+    table = _table()
+    name = table + start.strftime(PARTITION_SUFFIX_FORMAT)
+    end = start + interval()
+    if name in [p[0] for p in partitions()]:
+        return None
+    partition_key = _qn(UasTelemetry._meta.get_field('timestamp').column)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        _check_deferred_constraints(cursor)
+        cursor.execute('CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS)' %
+                       (_qn(name), _qn(table)))
+        cursor.execute(
+            'WITH moved AS (DELETE FROM %s WHERE %s >= %%s AND %s < %%s '
+            'RETURNING *) INSERT INTO %s SELECT * FROM moved' %
+            (_qn(table + DEFAULT_PARTITION_SUFFIX), partition_key,
+             partition_key, _qn(name)), [start, end])
+        moved = cursor.rowcount
+        # Bounds are literals, as DDL doesn't accept parameters.
+        cursor.execute(
+            "ALTER TABLE %s ATTACH PARTITION %s "
+            "FOR VALUES FROM ('%s') TO ('%s')" %
+            (_qn(table), _qn(name), start.isoformat(), end.isoformat()))
+    logger.info('Created telemetry partition %s, moving %d telemetry.', name,
+                moved)
+    return name
+
+
+def create_partitions(start, end):
+    """Creates the partitions covering [start, end).
+
+    Returns:
+        The names of the created partitions.
+    """
+    created = []
+    current = partition_start(start)
+    while current < end:
+        name = create_partition(current)
+        if name:
+            created.append(name)
+        current += interval()
+    return created
+
+
+def detach_partitions(before, drop=False):
+    """Detaches the partitions which end at or before the given time.
+
+    The detached partitions remain as standalone tables, so they can be
+    archived, unless drop is set. As when compacting telemetry, flight tracks
+    overlapping the detached telemetry are deleted rather than kept, as they
+    would be rematerialized from the remaining telemetry, and telemetry rates
+    and cached status are invalidated.
+
+    Args:
+        before: Partitions ending at or before this time are detached.
+        drop: Whether to drop the detached tables.
+    Returns:
+        The names of the detached partitions.
+    """
+    detached = []
+    users = User.objects.all()
+    for name, _, end in partitions():
+        if end > before:
+            continue
+        with transaction.atomic(), connection.cursor() as cursor:
+            FlightTrack.objects.filter(start__lt=end).delete()
+            TelemetryRate.invalidate(users, end=end)
+            _check_deferred_constraints(cursor)
+            cursor.execute('ALTER TABLE %s DETACH PARTITION %s' %
+                           (_qn(_table()), _qn(name)))
+            if drop:
+                cursor.execute('DROP TABLE %s' % _qn(name))
+        logger.info('Detached telemetry partition %s.', name)
+        detached.append(name)
+    if detached:
+        telemetry_cache.invalidate(users.values_list('pk', flat=True))
+    return detached
@@ -0,0 +1,173 @@
+"""Tests for the telemetry_partitions module."""
+
+import datetime
+from auvsi_suas.models import telemetry_cache
+from auvsi_suas.models import telemetry_partitions
+from auvsi_suas.models import test_utils
+from auvsi_suas.models.flight_track import FlightTrack
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.telemetry_rate import TelemetryRate
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+TABLE = UasTelemetry._meta.db_table
+
+
+class TestTelemetryPartitions(TestCase):
+    """Tests partitioning the telemetry table."""
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', 'testemail@x.com',
+                                             'testpass')
+        self.start = datetime.datetime(2020, 6, 1, tzinfo=timezone.utc)
+
+    def create_telemetry(self, offsets_hours):
+        UasTelemetry.objects.bulk_create([
+            UasTelemetry(user=self.user,
+                         timestamp=self.start +
+                         datetime.timedelta(hours=offset_hours),
+                         latitude=38,
+                         longitude=-76,
+                         altitude_msl=100,
+                         uas_heading=90) for offset_hours in offsets_hours
+        ])
+
+    def count(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM %s' %
+                           connection.ops.quote_name(table))
+            return cursor.fetchone()[0]
+
+    def test_convert(self):
+        """Tests converting keeps telemetry and accepts new telemetry."""
+        self.create_telemetry(range(10))
+        ids = [t.pk for t in UasTelemetry.by_user(self.user)]
+        self.assertFalse(telemetry_partitions.is_partitioned())
+
+        telemetry_partitions.convert()
+        self.assertTrue(telemetry_partitions.is_partitioned())
+        self.assertEqual(ids, [t.pk for t in UasTelemetry.by_user(self.user)])
+        self.assertEqual(10, self.count(TABLE + '_default'))
+
+        # Converting again does nothing.
+        telemetry_partitions.convert()
+
+        self.create_telemetry([10])
+        log = UasTelemetry(user=self.user,
+                           latitude=38,
+                           longitude=-76,
+                           altitude_msl=100,
+                           uas_heading=90)
+        log.save()
+        self.assertGreater(log.pk, max(ids))
+        self.assertEqual(12, UasTelemetry.by_user(self.user).count())
+
+    def test_create_partitions(self):
+        """Tests partitions are created and take their telemetry."""
+        self.create_telemetry(range(0, 48, 4))
+        telemetry_partitions.convert()
+
+        created = telemetry_partitions.create_partitions(
+            self.start + datetime.timedelta(hours=12),
+            self.start + datetime.timedelta(hours=36))
+        self.assertEqual([TABLE + '_p20200601', TABLE + '_p20200602'], created)
+        self.assertEqual(6, self.count(TABLE + '_p20200601'))
+        self.assertEqual(6, self.count(TABLE + '_p20200602'))
+        self.assertEqual(0, self.count(TABLE + '_default'))
+
+        partitions = telemetry_partitions.partitions()
+        self.assertEqual(
+            [(TABLE + '_p20200601', self.start,
+              self.start + datetime.timedelta(days=1)),
+             (TABLE + '_p20200602', self.start + datetime.timedelta(days=1),
+              self.start + datetime.timedelta(days=2))], partitions)
+
+        # Existing partitions are skipped.
+        self.assertEqual([],
+                         telemetry_partitions.create_partitions(
+                             self.start, self.start))
+
+        # New telemetry is routed to its partition.
+        self.create_telemetry([25])
+        self.assertEqual(7, self.count(TABLE + '_p20200602'))
+        self.assertEqual(13, UasTelemetry.by_user(self.user).count())
+
+    def test_pruning(self):
+        """Tests time range queries only scan the relevant partitions."""
+        telemetry_partitions.convert()
+        telemetry_partitions.create_partitions(
+            self.start, self.start + datetime.timedelta(days=3))
+
+        query = UasTelemetry.by_user(self.user,
+                                     self.start + datetime.timedelta(hours=30),
+                                     self.start + datetime.timedelta(hours=40))
+        with connection.cursor() as cursor:
+            sql, params = query.query.sql_with_params()
+            cursor.execute('EXPLAIN ' + sql, params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn(TABLE + '_p20200602', plan)
+        self.assertNotIn(TABLE + '_p20200601', plan)
+        self.assertNotIn(TABLE + '_p20200603', plan)
+        self.assertNotIn(TABLE + '_default', plan)
+
+    def test_detach_partitions(self):
+        """Tests detaching partitions removes their telemetry."""
+        self.create_telemetry(range(0, 48, 4))
+        telemetry_partitions.convert()
+        telemetry_partitions.create_partitions(
+            self.start, self.start + datetime.timedelta(days=2))
+
+        detached = telemetry_partitions.detach_partitions(self.start +
+                                                          datetime.timedelta(
+                                                              hours=36))
+        self.assertEqual([TABLE + '_p20200601'], detached)
+        self.assertEqual(6, UasTelemetry.by_user(self.user).count())
+        # Detached table is kept.
+        self.assertEqual(6, self.count(TABLE + '_p20200601'))
+
+        detached = telemetry_partitions.detach_partitions(
+            self.start + datetime.timedelta(days=2), drop=True)
+        self.assertEqual([TABLE + '_p20200602'], detached)
+        self.assertEqual(0, UasTelemetry.by_user(self.user).count())
+        self.assertEqual([], telemetry_partitions.partitions())
+
+    def test_detach_partitions_invalidates(self):
+        """Tests detaching invalidates state derived from the telemetry."""
+        superuser = User.objects.create_superuser('superuser',
+                                                  'email@example.com',
+                                                  'superpass')
+        mission = test_utils.create_sample_mission(superuser)
+        self.create_telemetry(range(0, 48, 4))
+        for offset_hours, uas_in_air in [(1, True), (9, False), (25, True),
+                                         (33, False)]:
+            TakeoffOrLandingEvent(user=self.user,
+                                  mission=mission,
+                                  timestamp=self.start +
+                                  datetime.timedelta(hours=offset_hours),
+                                  uas_in_air=uas_in_air).save()
+        TelemetryRate.objects.update(stale=False)
+        self.assertEqual(2, FlightTrack.objects.count())
+        self.assertIsNotNone(
+            telemetry_cache.latest([self.user])[self.user.pk][0])
+        telemetry_partitions.convert()
+        telemetry_partitions.create_partitions(
+            self.start, self.start + datetime.timedelta(days=2))
+
+        telemetry_partitions.detach_partitions(self.start +
+                                               datetime.timedelta(days=1))
+        # Tracks of the detached telemetry are deleted, not rematerialized
+        # from missing telemetry.
+        self.assertEqual([self.start + datetime.timedelta(hours=25)],
+                         [t.start for t in FlightTrack.objects.all()])
+        self.assertEqual(
+            [True, False],
+            [r.stale for r in TelemetryRate.objects.order_by('start')])
+
+        telemetry_partitions.detach_partitions(self.start +
+                                               datetime.timedelta(days=2),
+                                               drop=True)
+        self.assertEqual(0, FlightTrack.objects.count())
+        self.assertTrue(all(r.stale for r in TelemetryRate.objects.all()))
+        self.assertIsNone(telemetry_cache.latest([self.user])[self.user.pk][0])
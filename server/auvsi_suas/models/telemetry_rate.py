@@ -0,0 +1,241 @@
+"""Telemetry rate model."""
+
+import datetime
+import logging
+from auvsi_suas.models.mission_config import MissionConfig
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.conf import settings
+from django.contrib import admin
+from django.db import models
+from django.db.models import Case
+from django.db.models import DateTimeField
+from django.db.models import DurationField
+from django.db.models import F
+from django.db.models import Q
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+class TelemetryRate(models.Model):
+    """Running statistics of the gaps between a flight's telemetry.
+
+    Maintained as telemetry is stored and flights start and end, so rates
+    don't need to iterate the flight's telemetry. Gaps are measured like
+    AccessLogMixin.rates(), including from the start of the flight to the
+    first telemetry and from the last telemetry to the end.
+
+    Statistics can only be extended by telemetry after the last counted, so
+    they are marked stale if earlier telemetry is stored or telemetry is
+    removed. Stale and missing statistics fall back to iterating telemetry.
+    """
+
+    # The user which flew the flight.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE)
+    # The mission the flight was for.
+    mission = models.ForeignKey(MissionConfig, on_delete=models.CASCADE)
+    # Start of the flight, and the end if it has landed.
+    start = models.DateTimeField()
+    end = models.DateTimeField(null=True, blank=True)
+    # Timestamp of the last counted telemetry, or the start if none.
+    last_timestamp = models.DateTimeField()
+    # Number, total and max of the gaps counted.
+    gap_count = models.IntegerField(default=0)
+    gap_sum = models.DurationField(default=datetime.timedelta())
+    gap_max = models.DurationField(default=datetime.timedelta())
+    # Whether telemetry changed such that the statistics are wrong.
+    stale = models.BooleanField(default=False)
+
+    class Meta:
+        index_together = (('user', 'start'), )
+
+    def gap_avg(self):
+        """Gets the average gap, or None if none counted."""
+        if not self.gap_count:
+            return None
+        return self.gap_sum / self.gap_count
+
+    @classmethod
+    def record_telemetry(cls, user, telemetry):
+        """Counts stored telemetry in the user's flights with one query.
+
+        Args:
+            user: The user which uploaded the telemetry, or its ID.
+            telemetry: The stored UasTelemetry.
+        """
+        if not telemetry:
+            return
+        timestamps = sorted(t.timestamp for t in telemetry)
+        first, last = timestamps[0], timestamps[-1]
+        local_max = max([b - a for a, b in zip(timestamps, timestamps[1:])] +
+                        [datetime.timedelta()])
+
+        first_value = Value(first, output_field=DateTimeField())
+        last_value = Value(last, output_field=DateTimeField())
+        # Telemetry can only be counted if it follows the counted telemetry.
+        extends = Q(end__isnull=True, stale=False, last_timestamp__lte=first)
+
+        def if_extends(value, field):
+            return Case(When(extends, then=value),
+                        default=F(field),
+                        output_field=cls._meta.get_field(field))
+
+        cls.objects.filter(
+            user=user,
+            start__lte=last).filter(Q(end__isnull=True) | Q(
+                end__gt=first)).update(
+                    gap_count=if_extends(
+                        F('gap_count') + len(timestamps), 'gap_count'),
+                    gap_sum=if_extends(
+                        F('gap_sum') + (last_value - F('last_timestamp')),
+                        'gap_sum'),
+                    gap_max=if_extends(
+                        Greatest(F('gap_max'),
+                                 first_value - F('last_timestamp'),
+                                 Value(local_max,
+                                       output_field=DurationField()),
+                                 output_field=DurationField()), 'gap_max'),
+                    last_timestamp=if_extends(last_value, 'last_timestamp'),
+                    stale=Case(When(extends, then=Value(False)),
+                               default=Value(True),
+                               output_field=models.BooleanField()))
+
+    @classmethod
+    def invalidate(cls, users, start=None, end=None):
+        """Marks statistics of flights overlapping the time range stale.
+
+        Args:
+            users: The users, or a query of them, whose telemetry changed.
+            start: Optional. Inclusive start of the changed telemetry.
+            end: Optional. Inclusive end of the changed telemetry.
+        """
+        query = cls.objects.filter(user__in=users)
+        if start is not None:
+            query = query.filter(Q(end__isnull=True) | Q(end__gt=start))
+        if end is not None:
+            query = query.filter(start__lte=end)
+        query.update(stale=True)
+
+    @classmethod
+    def rates(cls, user, time_periods, time_period_logs=None):
+        """Gets the telemetry rates, like AccessLogMixin.rates().
+
+        Uses the statistics of periods which match a flight, and iterates the
+        telemetry of the others.
+
+        Args:
+            user: The user to get the telemetry rates for.
+            time_periods: A list of non-overlapping TimePeriod objects.
+            time_period_logs: Optional. A sequence of UasTelemetry sequences
+                or TelemetryTracks for each TimePeriod, used for periods
+                without statistics.
+        Returns:
+            A (max, avg) tuple of the time between telemetry in seconds.
+        """
+        if not time_periods:
+            return (None, None)
+        for time_period in time_periods:
+            if time_period.duration() is None:
+                return (None, None)
+
+        stats = {(r.start, r.end): r
+                 for r in cls.objects.filter(
+                     user=user,
+                     stale=False,
+                     end__isnull=False,
+                     start__in=[p.start for p in time_periods])}
+
+        gap_max, gap_sum, gap_count = 0.0, 0.0, 0
+        for ix, period in enumerate(time_periods):
+            rate = stats.get((period.start, period.end))
+            if rate is not None:
+                period_stats = (rate.gap_max.total_seconds(),
+                                rate.gap_sum.total_seconds(), rate.gap_count)
+            else:
+                logs = None
+                if time_period_logs:
+                    logs = [time_period_logs[ix]]
+                period_stats = UasTelemetry.gap_stats(user, [period], logs)
+            gap_max = max(gap_max, period_stats[0])
+            gap_sum += period_stats[1]
+            gap_count += period_stats[2]
+        return (gap_max, gap_sum / gap_count)
+
+
+@receiver(post_save, sender=TakeoffOrLandingEvent)
+def update_on_event(sender, instance, created, raw, **kwargs):
+    """Starts statistics on takeoff, and ends them on landing."""
+    rates = TelemetryRate.objects.filter(user_id=instance.user_id,
+                                         mission_id=instance.mission_id)
+    if not created or raw:
+        # The flights may have changed arbitrarily.
+        rates.delete()
+        return
+
+    if instance.uas_in_air:
+        # Telemetry already stored within the flight wasn't counted.
+        stale = UasTelemetry.objects.filter(
+            user_id=instance.user_id,
+            timestamp__gte=instance.timestamp).exists()
+        TelemetryRate.objects.create(user_id=instance.user_id,
+                                     mission_id=instance.mission_id,
+                                     start=instance.timestamp,
+                                     last_timestamp=instance.timestamp,
+                                     stale=stale)
+        return
+
+    # Count the gap from the last telemetry to the landing. Telemetry at or
+    # after the landing may have been counted.
+    end = Value(instance.timestamp, output_field=DateTimeField())
+    ends_after = Q(last_timestamp__lt=instance.timestamp) | Q(
+        last_timestamp=F('start'))
+    rates.filter(end__isnull=True, start__lte=instance.timestamp).update(
+        end=instance.timestamp,
+        gap_count=Case(When(ends_after, then=F('gap_count') + 1),
+                       default=F('gap_count')),
+        gap_sum=Case(When(ends_after,
+                          then=F('gap_sum') + (end - F('last_timestamp'))),
+                     default=F('gap_sum'),
+                     output_field=DurationField()),
+        gap_max=Case(When(ends_after,
+                          then=Greatest(F('gap_max'),
+                                        end - F('last_timestamp'),
+                                        output_field=DurationField())),
+                     default=F('gap_max'),
+                     output_field=DurationField()),
+        stale=Case(When(ends_after, then=F('stale')),
+                   default=Value(True),
+                   output_field=models.BooleanField()))
+
+
+@receiver(post_delete, sender=TakeoffOrLandingEvent)
+def delete_on_event(sender, instance, **kwargs):
+    """Deletes statistics of flights changed by deleting an event."""
+    TelemetryRate.objects.filter(user_id=instance.user_id,
+                                 mission_id=instance.mission_id).filter(
+                                     Q(start=instance.timestamp)
+                                     | Q(end=instance.timestamp)).delete()
+
+
+@receiver(post_save, sender=UasTelemetry)
+def update_on_telemetry(sender, instance, created, **kwargs):
+    """Counts telemetry saved individually, rather than uploaded."""
+    if created:
+        TelemetryRate.record_telemetry(instance.user, [instance])
+    else:
+        # The previous timestamp is unknown.
+        TelemetryRate.invalidate([instance.user_id])
+
+
+@admin.register(TelemetryRate)
+class TelemetryRateModelAdmin(admin.ModelAdmin):
+    show_full_result_count = False
+    list_display = ('pk', 'user', 'mission', 'start', 'end', 'gap_count',
+                    'gap_avg', 'gap_max', 'stale')
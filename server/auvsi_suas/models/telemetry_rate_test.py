@@ -0,0 +1,183 @@
+"""Tests for the telemetry_rate module."""
+
+import datetime
+from auvsi_suas.models import test_utils
+from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.telemetry_rate import TelemetryRate
+from auvsi_suas.models.uas_telemetry import TelemetryTrack
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+
+class TestTelemetryRate(TestCase):
+    """Tests the TelemetryRate model."""
+    def setUp(self):
+        self.superuser = User.objects.create_superuser('superuser',
+                                                       'email@example.com',
+                                                       'superpass')
+        self.user = User.objects.create_user('user', 'email@example.com',
+                                             'pass')
+        self.mission = test_utils.create_sample_mission(self.superuser)
+        self.start = datetime.datetime(2020, 6, 1, tzinfo=timezone.utc)
+
+    def create_telemetry(self, offsets_sec):
+        return [
+            UasTelemetry(user=self.user,
+                         timestamp=self.start +
+                         datetime.timedelta(seconds=offset_sec),
+                         latitude=38 + offset_sec * 1e-5,
+                         longitude=-76,
+                         altitude_msl=100,
+                         uas_heading=90) for offset_sec in offsets_sec
+        ]
+
+    def upload_telemetry(self, offsets_sec):
+        """Stores telemetry like an upload."""
+        telemetry = self.create_telemetry(offsets_sec)
+        UasTelemetry.objects.bulk_create(telemetry)
+        TelemetryRate.record_telemetry(self.user, telemetry)
+
+    def create_event(self, offset_sec, uas_in_air):
+        TakeoffOrLandingEvent(user=self.user,
+                              mission=self.mission,
+                              timestamp=self.start +
+                              datetime.timedelta(seconds=offset_sec),
+                              uas_in_air=uas_in_air).save()
+
+    def assertRatesMatch(self):
+        """Asserts rates match those from iterating telemetry."""
+        flights = TakeoffOrLandingEvent.flights(self.mission, self.user)
+        expected = UasTelemetry.rates(self.user, flights)
+        rates = TelemetryRate.rates(self.user, flights)
+        self.assertAlmostEqual(expected[0], rates[0])
+        self.assertAlmostEqual(expected[1], rates[1])
+        return rates
+
+    def test_flight(self):
+        """Tests statistics of uploaded telemetry within a flight."""
+        self.upload_telemetry([0, 1])
+        self.create_event(2, True)
+        self.upload_telemetry([3, 4])
+        self.upload_telemetry([4.5])
+        self.upload_telemetry([8, 9])
+        self.create_event(10, False)
+        self.upload_telemetry([11])
+
+        rate = TelemetryRate.objects.get()
+        self.assertFalse(rate.stale)
+        self.assertEqual(6, rate.gap_count)
+        self.assertEqual(datetime.timedelta(seconds=8), rate.gap_sum)
+        self.assertEqual(datetime.timedelta(seconds=3.5), rate.gap_max)
+
+        flights = TakeoffOrLandingEvent.flights(self.mission, self.user)
+        # Doesn't iterate telemetry.
+        with self.assertNumQueries(1):
+            rates = TelemetryRate.rates(self.user, flights)
+        self.assertEqual((3.5, 8 / 6), rates)
+        self.assertRatesMatch()
+
+    def test_saved_telemetry(self):
+        """Tests telemetry saved individually is counted."""
+        self.create_event(0, True)
+        for t in self.create_telemetry([1, 2, 5]):
+            t.save()
+        self.create_event(6, False)
+        self.assertFalse(TelemetryRate.objects.get().stale)
+        self.assertEqual((3, 1.5), self.assertRatesMatch())
+
+    def test_no_telemetry(self):
+        self.create_event(0, True)
+        self.create_event(5, False)
+        self.assertFalse(TelemetryRate.objects.get().stale)
+        self.assertEqual((5, 5), self.assertRatesMatch())
+
+    def test_multiple_flights(self):
+        """Tests flights are combined."""
+        self.create_event(0, True)
+        self.upload_telemetry([1, 2])
+        self.create_event(3, False)
+        self.create_event(10, True)
+        self.upload_telemetry([12, 14, 16])
+        self.create_event(18, False)
+        self.assertEqual(2, TelemetryRate.objects.filter(stale=False).count())
+        self.assertEqual((2, 11 / 7), self.assertRatesMatch())
+
+    def test_tracks(self):
+        """Tests rates from telemetry tracks of flights without statistics."""
+        self.create_event(0, True)
+        self.upload_telemetry([1, 2])
+        self.create_event(3, False)
+        self.create_event(10, True)
+        self.upload_telemetry([12, 14, 16])
+        self.create_event(18, False)
+        TelemetryRate.objects.all().delete()
+
+        flights = TakeoffOrLandingEvent.flights(self.mission, self.user)
+        tracks = [
+            TelemetryTrack.from_logs(logs)
+            for logs in UasTelemetry.by_time_period(self.user, flights)
+        ]
+        with self.assertNumQueries(1):
+            rates = TelemetryRate.rates(self.user,
+                                        flights,
+                                        time_period_logs=tracks)
+        self.assertEqual(UasTelemetry.rates(self.user, flights), rates)
+
+    def test_out_of_order(self):
+        """Tests telemetry before counted telemetry makes it stale."""
+        self.create_event(0, True)
+        self.upload_telemetry([1, 3])
+        self.upload_telemetry([2])
+        self.upload_telemetry([4])
+        self.create_event(5, False)
+        self.assertTrue(TelemetryRate.objects.get().stale)
+        self.assertRatesMatch()
+
+    def test_after_landing(self):
+        """Tests telemetry within a landed flight makes it stale."""
+        self.create_event(0, True)
+        self.upload_telemetry([1, 2])
+        self.create_event(5, False)
+        self.upload_telemetry([3])
+        self.assertTrue(TelemetryRate.objects.get().stale)
+        self.assertRatesMatch()
+
+    def test_landing_before_counted(self):
+        """Tests landing before counted telemetry makes it stale."""
+        self.create_event(0, True)
+        self.upload_telemetry([1, 2, 6])
+        self.create_event(5, False)
+        self.assertTrue(TelemetryRate.objects.get().stale)
+        self.assertRatesMatch()
+
+    def test_takeoff_after_telemetry(self):
+        """Tests a takeoff before stored telemetry is stale."""
+        self.upload_telemetry([1, 2])
+        self.create_event(0, True)
+        self.upload_telemetry([3])
+        self.create_event(5, False)
+        self.assertTrue(TelemetryRate.objects.get().stale)
+        self.assertRatesMatch()
+
+    def test_invalidate(self):
+        self.create_event(0, True)
+        self.upload_telemetry([1, 2])
+        self.create_event(5, False)
+        TelemetryRate.invalidate([self.user],
+                                 end=self.start -
+                                 datetime.timedelta(seconds=1))
+        self.assertFalse(TelemetryRate.objects.get().stale)
+        TelemetryRate.invalidate([self.user],
+                                 self.start + datetime.timedelta(seconds=5))
+        self.assertFalse(TelemetryRate.objects.get().stale)
+        TelemetryRate.invalidate([self.user])
+        self.assertTrue(TelemetryRate.objects.get().stale)
+
+    def test_event_deleted(self):
+        """Tests statistics are deleted with their events."""
+        self.create_event(0, True)
+        self.create_event(5, False)
+        TakeoffOrLandingEvent.objects.filter(uas_in_air=False).delete()
+        self.assertEqual(0, TelemetryRate.objects.count())
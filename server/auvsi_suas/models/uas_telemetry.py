@@ -1,13 +1,17 @@
 """UAS Telemetry model."""
 
+import array
 import datetime
-import itertools
 import logging
+import numpy as np
+from auvsi_suas.models import distance
+from auvsi_suas.models.access_log import ACCESS_LOG_CHUNK_SIZE
+from auvsi_suas.models.access_log import ACCESS_LOG_EPOCH
+from auvsi_suas.models.access_log import ACCESS_LOG_TIME_UNIT
 from auvsi_suas.models.access_log import AccessLogMixin
 from auvsi_suas.models.aerial_position import AerialPositionMixin
 from auvsi_suas.models.gps_position import GpsPosition
 from auvsi_suas.proto import interop_admin_api_pb2
-from collections import defaultdict
 from django.contrib import admin
 from django.core import validators
 from django.db import models
@@ -21,6 +25,10 @@ TELEMETRY_INTERPOLATION_STEP = datetime.timedelta(seconds=0.1)
 # The max time gap between two telemetry to interpolate between.
 TELEMETRY_INTERPOLATION_MAX_GAP = datetime.timedelta(seconds=5.0)
 
+# Timestamps of telemetry tracks are integer microseconds since the epoch.
+TELEMETRY_EPOCH = ACCESS_LOG_EPOCH
+TELEMETRY_TIME_UNIT = ACCESS_LOG_TIME_UNIT
+
 # The time window (in seconds) in which a plane cannot be counted as going out
 # of bounds multiple times. This prevents noisy input data from recording
 # significant more violations than a human observer.
@@ -28,6 +36,106 @@ TELEMETRY_INTERPOLATION_MAX_GAP = datetime.timedelta(seconds=5.0)
 SATISFIED_WAYPOINT_DIST_MAX_FT = 100
 
 
+class TelemetryTrack(object):
+    """Telemetry as a NumPy structured array, with a record per telemetry.
+
+    A record takes 40 bytes, rather than a model instance per telemetry.
+    Columns are read by the names of the UasTelemetry fields, and selecting
+    with [] gets the track of the selected telemetry.
+    """
+    __slots__ = ('records', )
+
+    # Fields of each record, in order. Timestamps are integer
+    # TELEMETRY_TIME_UNIT since TELEMETRY_EPOCH.
+    FIELDS = ('timestamp', 'latitude', 'longitude', 'altitude_msl',
+              'uas_heading')
+    DTYPE = np.dtype([('timestamp', np.int64)] + [(field, np.float64)
+                                                  for field in FIELDS[1:]])
+
+    def __init__(self, records=None):
+        """Creates a track.
+
+        Args:
+            records: Optional. A structured array of DTYPE, as from
+                AccessLogMixin.array_by_user(). Defaults to no telemetry.
+        """
+        if records is None:
+            records = np.zeros(0, dtype=self.DTYPE)
+        self.records = records
+
+    @classmethod
+    def from_columns(cls, timestamps_us, latitude, longitude, altitude_msl,
+                     uas_heading):
+        """Creates a track from a sequence per field."""
+        records = np.empty(len(timestamps_us), dtype=cls.DTYPE)
+        for field, column in zip(
+                cls.FIELDS,
+            (timestamps_us, latitude, longitude, altitude_msl, uas_heading)):
+            records[field] = column
+        return cls(records)
+
+    @classmethod
+    def from_logs(cls, uas_telemetry_logs):
+        """Creates a track of UasTelemetry, in the same order."""
+        return cls(
+            np.array([((log.timestamp - TELEMETRY_EPOCH) //
+                       TELEMETRY_TIME_UNIT, log.latitude, log.longitude,
+                       log.altitude_msl, log.uas_heading)
+                      for log in uas_telemetry_logs],
+                     dtype=cls.DTYPE))
+
+    @classmethod
+    def concatenate(cls, tracks):
+        """Concatenates a sequence of tracks."""
+        if not tracks:
+            return cls()
+        return cls(np.concatenate([track.records for track in tracks]))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, selected):
+        """Selects telemetry with a slice, or a boolean or index array."""
+        return TelemetryTrack(self.records[selected])
+
+    @property
+    def timestamps_us(self):
+        return self.records['timestamp']
+
+    @property
+    def latitude(self):
+        return self.records['latitude']
+
+    @property
+    def longitude(self):
+        return self.records['longitude']
+
+    @property
+    def altitude_msl(self):
+        return self.records['altitude_msl']
+
+    @property
+    def uas_heading(self):
+        return self.records['uas_heading']
+
+    def gaps_sec(self, start, end):
+        """Gets the seconds between the start, each telemetry and the end.
+
+        Args:
+            start: The start of the period of the telemetry.
+            end: The end of the period of the telemetry.
+        Returns:
+            A float64 array of the gaps, one more than the telemetry.
+        """
+        timestamps_us = np.concatenate([
+            [(start - TELEMETRY_EPOCH) // TELEMETRY_TIME_UNIT],
+            self.timestamps_us,
+            [(end - TELEMETRY_EPOCH) // TELEMETRY_TIME_UNIT],
+        ])
+        return np.diff(timestamps_us) / (datetime.timedelta(seconds=1) /
+                                         TELEMETRY_TIME_UNIT)
+
+
 class UasTelemetry(AccessLogMixin, AerialPositionMixin):
     """UAS telemetry reported by teams."""
 
@@ -36,6 +144,8 @@ class UasTelemetry(AccessLogMixin, AerialPositionMixin):
         validators.MinValueValidator(0),
         validators.MaxValueValidator(360),
     ])
+    # The sequence number assigned by the team, if given.
+    sequence = models.BigIntegerField(null=True, blank=True)
 
     def duplicate(self, other):
         """Determines whether this UasTelemetry is equivalent to another.
@@ -69,6 +179,44 @@ class UasTelemetry(AccessLogMixin, AerialPositionMixin):
         # database queries, we select these values from the database up front.
         return super(UasTelemetry, cls).by_user(*args, **kwargs)
 
+    @classmethod
+    def track_by_user(cls,
+                      user,
+                      start_time=None,
+                      end_time=None,
+                      chunk_size=ACCESS_LOG_CHUNK_SIZE):
+        """Reads the time-sorted telemetry of the user into a TelemetryTrack.
+
+        Args:
+            user: The user to get the telemetry for.
+            start_time: Optional. Inclusive start time.
+            end_time: Optional. Exclusive end time.
+            chunk_size: Optional. The number of rows fetched at a time.
+        Returns:
+            The TelemetryTrack of the telemetry.
+        """
+        return TelemetryTrack(
+            cls.array_by_user(user, TelemetryTrack.FIELDS, start_time,
+                              end_time, chunk_size))
+
+    @classmethod
+    def gap_stats(cls, user, time_periods, time_period_logs=None):
+        """Gets statistics of the time between telemetry.
+
+        Like AccessLogMixin.gap_stats(), but time_period_logs may instead be
+        a TelemetryTrack per period.
+        """
+        if not time_period_logs or not all(
+                isinstance(logs, TelemetryTrack) for logs in time_period_logs):
+            return super(UasTelemetry, cls).gap_stats(user, time_periods,
+                                                      time_period_logs)
+        gaps = np.concatenate([
+            track.gaps_sec(period.start, period.end)
+            for period, track in zip(time_periods, time_period_logs)
+        ]).tolist()
+        # Summed in order, as by AccessLogMixin.gap_stats().
+        return (max([0.0] + gaps), sum(gaps, 0.0), len(gaps))
+
     @classmethod
     def dedupe(cls, logs):
         """Dedupes a set of UAS telemetry logs.
@@ -80,10 +228,26 @@ class UasTelemetry(AccessLogMixin, AerialPositionMixin):
         telemetry data is not allowed per the rules, so it is filtered.
 
         Args:
-            logs: A sorted list of UasTelemetry logs.
+            logs: A sorted list of UasTelemetry logs, or a TelemetryTrack.
         Returns:
-            A sequence containing the non-duplicate logs in the original list.
+            A sequence containing the non-duplicate logs in the original list,
+            or a TelemetryTrack of them if given a track.
         """
+        if isinstance(logs, TelemetryTrack):
+            # Duplicates equal the kept telemetry before them, so each can be
+            # compared to the telemetry just before it.
+            changed = np.ones(len(logs), dtype=bool)
+            changed[1:] = np.any([
+                logs.records[field][1:] != logs.records[field][:-1]
+                for field in TelemetryTrack.FIELDS[1:]
+            ],
+                                 axis=0)
+            return logs[changed]
+        return cls._dedupe_logs(logs)
+
+    @classmethod
+    def _dedupe_logs(cls, logs):
+        """Dedupes a sequence of UasTelemetry, as a generator."""
         # Check that logs were provided.
         if not logs:
             return logs
@@ -101,10 +265,15 @@ class UasTelemetry(AccessLogMixin, AerialPositionMixin):
         """Filters bad telemetry from the list.
 
         Args:
-            logs: A sorted list of UasTelemetry logs.
+            logs: A sorted list of UasTelemetry logs, or a TelemetryTrack.
         Returns:
-            A list containing the non-bad logs.
+            A list containing the non-bad logs, or a TelemetryTrack of them if
+            given a track.
         """
+        if isinstance(logs, TelemetryTrack):
+            return logs[np.maximum(np.abs(logs.latitude), np.abs(
+                logs.longitude)) > BAD_TELEMETRY_THRESHOLD_DEGREES]
+
         def _is_good(log):
             # Positions near (0,0) are likely GPS/autopilot noise.
             return max(abs(log.latitude), abs(
@@ -112,6 +281,62 @@ class UasTelemetry(AccessLogMixin, AerialPositionMixin):
 
         return filter(lambda log: _is_good(log), logs)
 
+    @classmethod
+    def _interpolation_steps(cls, timestamps_us, step, max_gap):
+        """Gets the steps interpolated between telemetry.
+
+        Args:
+            timestamps_us: The sorted timestamps of the telemetry.
+            step: The discrete interpolation step.
+            max_gap: The max time between telemetry to interpolate.
+        Returns:
+            A (source, offset) tuple of arrays with an element per telemetry
+            and step, in order. source is the index of the telemetry the step
+            follows, and offset the number of steps after it, 0 for the
+            telemetry itself.
+        """
+        step_us = step // TELEMETRY_TIME_UNIT
+        max_gap_us = max_gap // TELEMETRY_TIME_UNIT
+        dt = np.diff(timestamps_us)
+        steps = np.zeros(len(timestamps_us), dtype=np.int64)
+        steps[:-1] = np.where((dt > 0) & (dt <= max_gap_us),
+                              (dt - 1) // step_us, 0)
+        source = np.repeat(np.arange(len(steps)), steps + 1)
+        offset = np.arange(len(source)) - np.repeat(
+            np.cumsum(steps + 1) - (steps + 1), steps + 1)
+        return source, offset
+
+    @classmethod
+    def _interpolate_track(cls, track, step, max_gap):
+        """Interpolates a TelemetryTrack, like interpolate()."""
+        step_us = step // TELEMETRY_TIME_UNIT
+        timestamps_us = track.timestamps_us
+        dt = np.diff(timestamps_us)
+        source, offset = cls._interpolation_steps(timestamps_us, step, max_gap)
+        interpolated = offset > 0
+        prev = source[interpolated]
+        offset_us = offset[interpolated] * step_us
+        n_w = (offset_us / 1e6) / (dt[prev] / 1e6)
+        w = ((dt[prev] - offset_us) / 1e6) / (dt[prev] / 1e6)
+
+        def column(values, interpolate):
+            result = values[source]
+            result[interpolated] = interpolate(values[prev], values[prev + 1])
+            return result
+
+        def weighted_avg(v, n_v):
+            return w * v + n_w * n_v
+
+        def heading(v, n_v):
+            return (v + n_w * ((n_v - v + 180) % 360 - 180)) % 360
+
+        return TelemetryTrack.from_columns(
+            timestamps_us[source] + offset * step_us,
+            column(track.latitude, weighted_avg),
+            column(track.longitude, weighted_avg),
+            column(track.altitude_msl, weighted_avg),
+            column(track.uas_heading, heading))
+
     @classmethod
     def interpolate(cls,
                     uas_telemetry_logs,
@@ -119,44 +344,169 @@ class UasTelemetry(AccessLogMixin, AerialPositionMixin):
                     max_gap=TELEMETRY_INTERPOLATION_MAX_GAP):
         """Interpolates the ordered set of telemetry.
 
+        Telemetry is interpolated every step after each telemetry, until the
+        next, unless they're more than max_gap apart. Headings are
+        interpolated the shorter way around. Evaluation should interpolate a
+        TelemetryTrack, which doesn't create a model instance per step.
+
         Args:
-            uas_telemetry_logs: The telemetry to interpolate.
+            uas_telemetry_logs: The telemetry to interpolate, or a
+                TelemetryTrack.
             step: The discrete interpolation step in seconds.
             max_gap: The max time between telemetry to interpolate.
         Returns:
-            An iterable set of telemetry.
+            An iterable set of telemetry, or a TelemetryTrack of the
+            telemetry each followed by the telemetry interpolated after it if
+            given a track.
         """
-        for ix, log in enumerate(uas_telemetry_logs):
-            yield log
+        if isinstance(uas_telemetry_logs, TelemetryTrack):
+            return cls._interpolate_track(uas_telemetry_logs, step, max_gap)
+        return cls._interpolate_logs(uas_telemetry_logs, step, max_gap)
 
-            if ix + 1 >= len(uas_telemetry_logs):
+    @classmethod
+    def _interpolate_logs(cls, uas_telemetry_logs, step, max_gap):
+        """Interpolates a sequence of UasTelemetry, as a generator."""
+        uas_telemetry_logs = list(uas_telemetry_logs)
+        track = TelemetryTrack.from_logs(uas_telemetry_logs)
+        source, offset = cls._interpolation_steps(track.timestamps_us, step,
+                                                  max_gap)
+        interpolated = cls._interpolate_track(track, step, max_gap)
+        offsets = offset.tolist()
+        for ix, log_ix in enumerate(source.tolist()):
+            log = uas_telemetry_logs[log_ix]
+            if not offsets[ix]:
+                yield log
                 continue
-            next_log = uas_telemetry_logs[ix + 1]
+            yield UasTelemetry(
+                user=log.user,
+                timestamp=log.timestamp + offsets[ix] * step,
+                latitude=interpolated.latitude[ix].item(),
+                longitude=interpolated.longitude[ix].item(),
+                altitude_msl=interpolated.altitude_msl[ix].item(),
+                uas_heading=interpolated.uas_heading[ix].item())
+
+    @classmethod
+    def waypoint_hits(cls, waypoints, track):
+        """Finds the telemetry scoring for each waypoint.
+
+        Distances from all telemetry to all waypoints are computed together
+        as an array, rather than per telemetry and waypoint.
 
-            dt = next_log.timestamp - log.timestamp
-            if dt > max_gap or dt <= datetime.timedelta(seconds=0):
+        Args:
+            waypoints: A list of waypoints to check against.
+            track: The interpolated TelemetryTrack to evaluate.
+        Returns:
+            A (best, hits) tuple. best is a dict from waypoint index to the
+            closest distance in feet of any telemetry. hits is a list of
+            (waypoint index, distance, score) tuples, one per telemetry and
+            waypoint with a positive score, in order of telemetry then
+            waypoint.
+        """
+        positions = np.column_stack(
+            [track.latitude, track.longitude, track.altitude_msl])
+        if not len(waypoints) or not len(positions):
+            return {}, []
+        waypoint_positions = np.array(
+            [(w.latitude, w.longitude, w.altitude_msl) for w in waypoints],
+            dtype=np.float64)
+
+        # Distance from each telemetry (row) to each waypoint (column).
+        dists = distance.distance_to_array(*positions.T[:, :, np.newaxis],
+                                           *waypoint_positions.T)
+        best = dict(enumerate(dists.min(axis=0).tolist()))
+        scores = np.maximum(0, (SATISFIED_WAYPOINT_DIST_MAX_FT - dists) /
+                            SATISFIED_WAYPOINT_DIST_MAX_FT)
+        # Row-major order is telemetry then waypoint.
+        hit = np.nonzero(scores > 0)
+        hits = list(
+            zip(hit[1].tolist(), dists[hit].tolist(), scores[hit].tolist()))
+        return best, hits
+
+    @classmethod
+    def best_waypoint_sequence(cls, num_waypoints, hits):
+        """Finds the highest scoring sequence of hits satisfying waypoints.
+
+        Waypoints must be satisfied in order, each by a hit after the hit of
+        the previous waypoint.
+
+        Args:
+            num_waypoints: The number of waypoints.
+            hits: An iterable of (waypoint index, distance, score) tuples in
+                time order, as from waypoint_hits().
+        Returns:
+            A dict from waypoint index to the (score, distance) of the hit
+            satisfying it, for waypoints satisfied by the sequence.
+        """
+        # Reduce consecutive hits of a waypoint to the highest scoring, as
+        # others wouldn't be part of the best sequence.
+        hit_waypoints = array.array('q')
+        hit_dists = array.array('d')
+        hit_scores = array.array('d')
+        for iw, dist, score in hits:
+            if hit_waypoints and hit_waypoints[-1] == iw:
+                if score > hit_scores[-1]:
+                    hit_dists[-1] = dist
+                    hit_scores[-1] = score
                 continue
+            hit_waypoints.append(iw)
+            hit_dists.append(dist)
+            hit_scores.append(score)
+        num_hits = len(hit_waypoints)
+        if not num_waypoints or not num_hits:
+            return {}
+        hit_waypoints = np.frombuffer(hit_waypoints, dtype=np.int64)
+        hit_scores = np.frombuffer(hit_scores, dtype=np.float64)
 
-            t = log.timestamp + step
-            while t < next_log.timestamp:
-                n_w = (t - log.timestamp).total_seconds() / dt.total_seconds()
-                w = (next_log.timestamp -
-                     t).total_seconds() / dt.total_seconds()
-                weighted_avg = lambda v, n_v: w * v + n_w * n_v
-
-                telem = UasTelemetry()
-                telem.user = log.user
-                telem.timestamp = t
-                telem.latitude = weighted_avg(log.latitude, next_log.latitude)
-                telem.longitude = weighted_avg(log.longitude,
-                                               next_log.longitude)
-                telem.altitude_msl = weighted_avg(log.altitude_msl,
-                                                  next_log.altitude_msl)
-                telem.uas_heading = weighted_avg(log.uas_heading,
-                                                 next_log.uas_heading)
-                yield telem
-
-                t += step
+        # Find highest scoring sequence via dynamic programming.
+        # Implement recurrence relation:
+        #   S(iw, ih) = s[iw, ih] + max_{k=[0,ih]} S(iw-1, k)
+        # where the max is only added if it increases the score. Rows are
+        # computed from the prefix maxima of the previous row, and back
+        # holds the first hit k attaining the max, or -1 if not added.
+        back = np.full((num_waypoints, num_hits), -1, dtype=np.int32)
+        indices = np.arange(num_hits)
+        highest_total = None
+        highest_pos = None
+        for iw in range(num_waypoints):
+            scores = np.where(hit_waypoints == iw, hit_scores, 0.0)
+            if iw == 0:
+                totals = scores
+            else:
+                prefix_max = np.maximum.accumulate(prev_totals)
+                # Hits setting a new prefix max, and the first attaining it.
+                is_new_max = np.empty(num_hits, dtype=bool)
+                is_new_max[0] = True
+                is_new_max[1:] = prev_totals[1:] > prefix_max[:-1]
+                prefix_argmax = np.maximum.accumulate(
+                    np.where(is_new_max, indices, 0))
+                totals = prefix_max + scores
+                added = totals > scores
+                back[iw] = np.where(added, prefix_argmax, -1)
+                # Adding a score may round a lesser, earlier max to the same
+                # total, in which case the earlier max is first to attain it.
+                for ih in np.nonzero(added & (scores > 0))[0]:
+                    k = back[iw, ih]
+                    while (k > 0
+                           and prev_totals[prefix_argmax[k - 1]] + scores[ih]
+                           == totals[ih]):
+                        k = prefix_argmax[k - 1]
+                    back[iw, ih] = k
+            # Track highest score seen, the first if tied.
+            ih = int(np.argmax(totals))
+            if highest_total is None or totals[ih] > highest_total:
+                highest_total = totals[ih]
+                highest_pos = (iw, ih)
+            prev_totals = totals
+
+        # Traceback sequence to get scores and distance for score.
+        sequence = {}
+        iw, ih = highest_pos
+        while ih >= 0:
+            if hit_waypoints[ih] == iw:
+                sequence[iw] = (hit_scores[ih].item(), hit_dists[ih])
+            ih = back[iw, ih]
+            iw -= 1
+        return sequence
 
     @classmethod
     def satisfied_waypoints(cls, home_pos, waypoints, uas_telemetry_logs):
@@ -176,69 +526,33 @@ class UasTelemetry(AccessLogMixin, AerialPositionMixin):
         Returns:
             A list of auvsi_suas.proto.WaypointEvaluation.
         """
+        return cls.satisfied_waypoints_track(
+            waypoints,
+            cls.interpolate(TelemetryTrack.from_logs(uas_telemetry_logs)))
+
+    @classmethod
+    def satisfied_waypoints_track(cls, waypoints, track):
+        """Determines whether the UAS satisfied the waypoints.
+
+        Equivalent to satisfied_waypoints(), for telemetry already
+        interpolated.
+
+        Args:
+            waypoints: A list of waypoints to check against.
+            track: The interpolated TelemetryTrack to evaluate.
+        Returns:
+            A list of auvsi_suas.proto.WaypointEvaluation.
+        """
         # Reduce telemetry from telemetry to waypoint hits.
         # This will make future processing more efficient via data reduction.
         # While iterating, compute the best distance seen for feedback.
-        best = {}
-        hits = []
-        for log in cls.interpolate(uas_telemetry_logs):
-            for iw, waypoint in enumerate(waypoints):
-                dist = log.distance_to(waypoint)
-                best[iw] = min(best.get(iw, dist), dist)
-                score = max(
-                    0,
-                    float(SATISFIED_WAYPOINT_DIST_MAX_FT - dist) /
-                    SATISFIED_WAYPOINT_DIST_MAX_FT)
-                if score > 0:
-                    hits.append((iw, dist, score))
-        # Remove redundant hits which wouldn't be part of best sequence.
-        # This will make future processing more efficient via data reduction.
-        hits = [
-            max(g, key=lambda x: x[2])
-            for _, g in itertools.groupby(hits, lambda x: x[0])
-        ]
-
-        # Find highest scoring sequence via dynamic programming.
-        # Implement recurrence relation:
-        #   S(iw, ih) = s[iw, ih] + max_{k=[0,ih)} S(iw-1, k)
-        dp = defaultdict(lambda: defaultdict(lambda: (0, None, None)))
-        highest_total = None
-        highest_total_pos = (None, None)
-        for iw in range(len(waypoints)):
-            for ih, (hiw, hdist, hscore) in enumerate(hits):
-                # Compute score for assigning current hit to current waypoint.
-                score = hscore if iw == hiw else 0.0
-                # Compute best total score, which includes this match score and
-                # best of all which could come before it.
-                prev_iw = iw - 1
-                total_score = score
-                total_score_back = (None, None)
-                if prev_iw >= 0:
-                    for prev_ih in range(ih + 1):
-                        (prev_total_score, _) = dp[prev_iw][prev_ih]
-                        new_total_score = prev_total_score + score
-                        if new_total_score > total_score:
-                            total_score = new_total_score
-                            total_score_back = (prev_iw, prev_ih)
-                dp[iw][ih] = (total_score, total_score_back)
-                # Track highest score seen.
-                if highest_total is None or total_score > highest_total:
-                    highest_total = total_score
-                    highest_total_pos = (iw, ih)
-        # Traceback sequence to get scores and distance for score.
-        scores = defaultdict(lambda: (0, None))
-        cur_pos = highest_total_pos
-        while cur_pos != (None, None):
-            cur_iw, cur_ih = cur_pos
-            hiw, hdist, hscore = hits[cur_ih]
-            if cur_iw == hiw:
-                scores[cur_iw] = (hscore, hdist)
-            _, cur_pos = dp[cur_iw][cur_ih]
+        best, hits = cls.waypoint_hits(waypoints, track)
+        scores = cls.best_waypoint_sequence(len(waypoints), hits)
 
         # Convert to evaluation.
         waypoint_evals = []
         for iw, waypoint in enumerate(waypoints):
-            score, dist = scores[iw]
+            score, dist = scores.get(iw, (0, None))
             waypoint_eval = interop_admin_api_pb2.WaypointEvaluation()
             waypoint_eval.id = iw
             waypoint_eval.score_ratio = score
@@ -1,12 +1,19 @@
 """Tests for the uas_telemetry module."""
 
 import datetime
+import itertools
+import numpy as np
 from auvsi_suas.models.aerial_position import AerialPosition
 from auvsi_suas.models.gps_position import GpsPosition
 from auvsi_suas.models.mission_config import MissionConfig
+from auvsi_suas.models.uas_telemetry import SATISFIED_WAYPOINT_DIST_MAX_FT
+from auvsi_suas.models.uas_telemetry import TELEMETRY_EPOCH
+from auvsi_suas.models.uas_telemetry import TELEMETRY_TIME_UNIT
+from auvsi_suas.models.uas_telemetry import TelemetryTrack
 from auvsi_suas.models.uas_telemetry import UasTelemetry
 from auvsi_suas.models.waypoint import Waypoint
 from auvsi_suas.proto.interop_admin_api_pb2 import WaypointEvaluation
+from collections import defaultdict
 from django.contrib.auth.models import User
 from django.test import TestCase
 from django.utils import timezone
@@ -255,6 +262,63 @@ class TestUasTelemetryFilter(TestUasTelemetryBase):
         expect = [self.log1]
         self.assertSequenceEqual(list(UasTelemetry.filter_bad(orig)), expect)
 
+    def assertTracksEqual(self, expected, actual):
+        self.assertIsInstance(actual, TelemetryTrack)
+        self.assertEqual(expected.records.tolist(), actual.records.tolist())
+
+    def test_tracks(self):
+        """Tests tracks are deduped and filtered like logs."""
+        for orig in [
+            [],
+            [self.log1, self.log2, self.log3, self.log4],
+            [self.log1, self.log1, self.log2, self.log2, self.log2],
+            [self.log1, self.log5, self.log5, self.log1, self.log3],
+        ]:
+            track = TelemetryTrack.from_logs(orig)
+            self.assertTracksEqual(
+                TelemetryTrack.from_logs(list(UasTelemetry.dedupe(orig))),
+                UasTelemetry.dedupe(track))
+            self.assertTracksEqual(
+                TelemetryTrack.from_logs(list(UasTelemetry.filter_bad(orig))),
+                UasTelemetry.filter_bad(track))
+
+    def test_track_by_user(self):
+        logs = [self.log1, self.log2, self.log3, self.log4, self.log5]
+        for ix, log in enumerate(logs):
+            log.timestamp = self.now + datetime.timedelta(seconds=ix)
+            log.save()
+        self.assertTracksEqual(
+            TelemetryTrack.from_logs(logs),
+            UasTelemetry.track_by_user(self.user, chunk_size=2))
+        self.assertTracksEqual(
+            TelemetryTrack.from_logs(logs[1:3]),
+            UasTelemetry.track_by_user(
+                self.user, self.now + datetime.timedelta(seconds=1),
+                self.now + datetime.timedelta(seconds=3)))
+
+    def test_track(self):
+        """Tests the columns and selection of a track."""
+        track = TelemetryTrack.from_logs([self.log1, self.log2, self.log3])
+        self.assertEqual(3, len(track))
+        self.assertEqual([10, 20, 30], track.latitude.tolist())
+        self.assertEqual([90, 90, 90], track.uas_heading.tolist())
+        self.assertEqual([20], track[1:2].latitude.tolist())
+        self.assertTracksEqual(
+            track,
+            TelemetryTrack.from_columns(track.timestamps_us, track.latitude,
+                                        track.longitude, track.altitude_msl,
+                                        track.uas_heading))
+
+    def test_concatenate(self):
+        self.assertTracksEqual(TelemetryTrack.from_logs([]),
+                               TelemetryTrack.concatenate([]))
+        self.assertTracksEqual(
+            TelemetryTrack.from_logs([self.log1, self.log2, self.log3]),
+            TelemetryTrack.concatenate([
+                TelemetryTrack.from_logs([self.log1]),
+                TelemetryTrack.from_logs([self.log2, self.log3])
+            ]))
+
 
 class TestUasTelemetryInterpolate(TestUasTelemetryBase):
     """Tests the UasTelemetry interpolate()."""
@@ -319,7 +383,179 @@ class TestUasTelemetryInterpolate(TestUasTelemetryBase):
                 ])))
 
 
+class TestUasTelemetryInterpolateTrack(TestUasTelemetryBase):
+    """Tests the UasTelemetry interpolate() of a TelemetryTrack."""
+    def create_logs(self, entries):
+        """Creates unsaved telemetry from (t, lat, lon, alt, heading)."""
+        return [
+            UasTelemetry(user=self.user,
+                         timestamp=self.now + datetime.timedelta(seconds=t),
+                         latitude=lat,
+                         longitude=lon,
+                         altitude_msl=alt,
+                         uas_heading=heading)
+            for t, lat, lon, alt, heading in entries
+        ]
+
+    def test_empty(self):
+        track = UasTelemetry.interpolate(TelemetryTrack())
+        self.assertEqual(0, len(track))
+
+    def test_matches_scalar(self):
+        """Tests positions match interpolating each step separately."""
+        rand = np.random.RandomState(0)
+        # Irregular gaps, including repeated times and gaps over the max.
+        times = np.cumsum(rand.choice([0, 0.05, 0.1, 0.25, 1.33, 7], 100))
+        logs = self.create_logs([(t, 38 + rand.uniform(0, 0.01),
+                                  -76 + rand.uniform(0, 0.01),
+                                  rand.uniform(0, 500), 0) for t in times])
+
+        expect = []
+        step = datetime.timedelta(seconds=0.1)
+        for log, next_log in zip(logs, logs[1:] + [None]):
+            expect.append(
+                (log.timestamp, log.latitude, log.longitude, log.altitude_msl))
+            if next_log is None:
+                continue
+            dt = next_log.timestamp - log.timestamp
+            if dt > datetime.timedelta(seconds=5) or not dt:
+                continue
+            t = log.timestamp + step
+            while t < next_log.timestamp:
+                n_w = (t - log.timestamp) / dt
+                w = (next_log.timestamp - t) / dt
+                expect.append((t, ) + tuple(
+                    w * getattr(log, f) + n_w * getattr(next_log, f)
+                    for f in ['latitude', 'longitude', 'altitude_msl']))
+                t += step
+
+        track = UasTelemetry.interpolate(TelemetryTrack.from_logs(logs))
+        self.assertEqual(len(expect), len(track.timestamps_us))
+        for ix, (timestamp, lat, lon, alt) in enumerate(expect):
+            self.assertEqual(
+                (timestamp - TELEMETRY_EPOCH) // TELEMETRY_TIME_UNIT,
+                track.timestamps_us[ix])
+            self.assertAlmostEqual(lat, track.latitude[ix], places=9)
+            self.assertAlmostEqual(lon, track.longitude[ix], places=9)
+            self.assertAlmostEqual(alt, track.altitude_msl[ix], places=6)
+
+    def test_heading_wraps(self):
+        """Tests headings are interpolated the shorter way around."""
+        track = UasTelemetry.interpolate(
+            TelemetryTrack.from_logs(
+                self.create_logs([
+                    (0.0, 38, -76, 100, 350),
+                    (0.4, 38, -76, 100, 10),
+                    (0.8, 38, -76, 100, 330),
+                ])))
+        self.assertEqual(9, len(track.uas_heading))
+        for expect, got in zip([350, 355, 0, 5, 10, 0, 350, 340, 330],
+                               track.uas_heading):
+            self.assertAlmostEqual(expect, got, places=6)
+
+
+def reference_waypoint_sequence(num_waypoints, hits):
+    """Finds the best sequence with the quadratic dynamic program."""
+    hits = [
+        max(g, key=lambda x: x[2])
+        for _, g in itertools.groupby(hits, lambda x: x[0])
+    ]
+    dp = defaultdict(lambda: defaultdict(lambda: (0, None, None)))
+    highest_total = None
+    highest_total_pos = (None, None)
+    for iw in range(num_waypoints):
+        for ih, (hiw, hdist, hscore) in enumerate(hits):
+            score = hscore if iw == hiw else 0.0
+            prev_iw = iw - 1
+            total_score = score
+            total_score_back = (None, None)
+            if prev_iw >= 0:
+                for prev_ih in range(ih + 1):
+                    (prev_total_score, _) = dp[prev_iw][prev_ih]
+                    new_total_score = prev_total_score + score
+                    if new_total_score > total_score:
+                        total_score = new_total_score
+                        total_score_back = (prev_iw, prev_ih)
+            dp[iw][ih] = (total_score, total_score_back)
+            if highest_total is None or total_score > highest_total:
+                highest_total = total_score
+                highest_total_pos = (iw, ih)
+    scores = {}
+    cur_pos = highest_total_pos
+    while cur_pos != (None, None):
+        cur_iw, cur_ih = cur_pos
+        hiw, hdist, hscore = hits[cur_ih]
+        if cur_iw == hiw:
+            scores[cur_iw] = (hscore, hdist)
+        _, cur_pos = dp[cur_iw][cur_ih]
+    return scores
+
+
 class TestUasTelemetryWaypoints(TestUasTelemetryBase):
+    def test_best_waypoint_sequence(self):
+        """Tests the sequence matches the quadratic dynamic program."""
+        rand = np.random.RandomState(0)
+        self.assertEqual({}, UasTelemetry.best_waypoint_sequence(3, []))
+        self.assertEqual({},
+                         UasTelemetry.best_waypoint_sequence(0, [(0, 1, 1)]))
+        for _ in range(200):
+            num_waypoints = rand.randint(1, 6)
+            # Few distinct scores, so totals tie.
+            hits = [(int(rand.randint(num_waypoints)), float(ix),
+                     float(rand.choice([0.1, 0.2, 0.3, 0.5, 1 / 3])))
+                    for ix in range(rand.randint(1, 40))]
+            self.assertEqual(
+                reference_waypoint_sequence(num_waypoints, hits),
+                UasTelemetry.best_waypoint_sequence(num_waypoints, iter(hits)))
+
+    def test_waypoint_hits(self):
+        """Tests hits match computing each distance separately."""
+        rand = np.random.RandomState(0)
+        waypoints = self.waypoints_from_data([
+            (38.145, -76.428, 100),
+            (38.146, -76.426, 200),
+            (38.144, -76.427, 150),
+        ])
+        # A random walk across the waypoints, with gaps to interpolate.
+        logs = []
+        for i in range(200):
+            logs.append(
+                UasTelemetry(user=self.user,
+                             timestamp=self.now +
+                             datetime.timedelta(seconds=i * 0.5),
+                             latitude=38.144 + rand.uniform(0, 0.002),
+                             longitude=-76.428 + rand.uniform(0, 0.002),
+                             altitude_msl=rand.uniform(50, 250),
+                             uas_heading=0))
+
+        best = {}
+        hits = []
+        for log in UasTelemetry.interpolate(logs):
+            for iw, waypoint in enumerate(waypoints):
+                dist = log.distance_to(waypoint)
+                best[iw] = min(best.get(iw, dist), dist)
+                score = max(0, (SATISFIED_WAYPOINT_DIST_MAX_FT - dist) /
+                            SATISFIED_WAYPOINT_DIST_MAX_FT)
+                if score > 0:
+                    hits.append((iw, dist, score))
+
+        track = UasTelemetry.interpolate(TelemetryTrack.from_logs(logs))
+        got_best, got_hits = UasTelemetry.waypoint_hits(waypoints, track)
+        self.assertGreater(len(hits), 0)
+        self.assertEqual(best.keys(), got_best.keys())
+        for iw in best:
+            self.assertAlmostEqual(best[iw], got_best[iw], places=6)
+        self.assertEqual([h[0] for h in hits], [h[0] for h in got_hits])
+        for hit, got_hit in zip(hits, got_hits):
+            self.assertAlmostEqual(hit[1], got_hit[1], places=6)
+            self.assertAlmostEqual(hit[2], got_hit[2], places=6)
+
+        self.assertEqual(
+            ({}, []),
+            UasTelemetry.waypoint_hits(waypoints,
+                                       TelemetryTrack.from_logs([])))
+        self.assertEqual(({}, []), UasTelemetry.waypoint_hits([], track))
+
     def test_satisfied_waypoints(self):
         """Tests the evaluation of waypoints method."""
         # Create mission config
@@ -21,6 +21,17 @@ class AuvsiSuasTestRunner(runner.DiscoverRunner):
         self.media_root = settings.MEDIA_ROOT
         settings.MEDIA_ROOT = tempfile.mkdtemp()
 
+        # Scratch journal for the telemetry buffer.
+        self.telemetry_buffer = settings.TELEMETRY_BUFFER
+        settings.TELEMETRY_BUFFER = dict(self.telemetry_buffer)
+        settings.TELEMETRY_BUFFER['JOURNAL_DIR'] = tempfile.mkdtemp()
+
+        # Tests run evaluation jobs synchronously, rather than in a worker
+        # holding its own database connection.
+        self.mission_evaluation = settings.MISSION_EVALUATION
+        settings.MISSION_EVALUATION = dict(self.mission_evaluation)
+        settings.MISSION_EVALUATION['JOB_WORKER'] = False
+
         # We don't have Apache during testing, we need to have Django send
         # files directly.
         self.sendfile_backend = settings.SENDFILE_BACKEND
@@ -31,8 +42,11 @@ class AuvsiSuasTestRunner(runner.DiscoverRunner):
 
     def teardown_test_environment(self):
         shutil.rmtree(settings.MEDIA_ROOT)
+        shutil.rmtree(settings.TELEMETRY_BUFFER['JOURNAL_DIR'])
 
         settings.MEDIA_ROOT = self.media_root
+        settings.TELEMETRY_BUFFER = self.telemetry_buffer
+        settings.MISSION_EVALUATION = self.mission_evaluation
         settings.SENDFILE_BACKEND = self.sendfile_backend
 
         logging.disable(logging.NOTSET)
@@ -0,0 +1,80 @@
+"""Evaluation jobs view."""
+
+import logging
+from auvsi_suas.models.evaluation_job import EvaluationJob
+from auvsi_suas.models.mission_config import MissionConfig
+from auvsi_suas.proto import interop_admin_api_pb2
+from auvsi_suas.views.decorators import require_superuser
+from auvsi_suas.views.protobuf import proto_response
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.http import HttpResponseBadRequest
+from django.http import HttpResponseNotFound
+from django.utils.decorators import method_decorator
+from django.views.generic import View
+
+logger = logging.getLogger(__name__)
+
+
+class MissionsIdEvaluationJobs(View):
+    """Submits an evaluation of the mission's teams as a background job."""
+    @method_decorator(require_superuser)
+    def dispatch(self, *args, **kwargs):
+        return super(MissionsIdEvaluationJobs, self).dispatch(*args, **kwargs)
+
+    def post(self, request, pk):
+        try:
+            mission = MissionConfig.objects.get(pk=pk)
+        except MissionConfig.DoesNotExist:
+            return HttpResponseBadRequest('Mission not found.')
+
+        # Get the optional team to eval.
+        team = None
+        if 'team' in request.GET:
+            try:
+                team = User.objects.get(pk=int(request.GET['team']))
+            except ValueError:
+                return HttpResponseBadRequest('Team not an ID.')
+            except User.DoesNotExist:
+                return HttpResponseNotFound('Team not found.')
+
+        job = EvaluationJob.submit(mission, team)
+        return proto_response(request, job.proto())
+
+
+class EvaluationJobsId(View):
+    """Gets the status and progress of an evaluation job."""
+    @method_decorator(require_superuser)
+    def dispatch(self, *args, **kwargs):
+        return super(EvaluationJobsId, self).dispatch(*args, **kwargs)
+
+    def get(self, request, pk):
+        job = EvaluationJob.objects.defer('result').filter(pk=pk).first()
+        if job is None:
+            return HttpResponseNotFound('Evaluation job %s not found' % pk)
+        return proto_response(request, job.proto())
+
+
+class EvaluationJobsIdResult(View):
+    """Downloads the zip file of a succeeded evaluation job.
+
+    Zip file contains a master CSV and JSON file with all evaluation data.
+    It also contains per-team JSON files for individual team feedback.
+    """
+    @method_decorator(require_superuser)
+    def dispatch(self, *args, **kwargs):
+        return super(EvaluationJobsIdResult, self).dispatch(*args, **kwargs)
+
+    def get(self, request, pk):
+        job = EvaluationJob.objects.filter(pk=pk).values_list(
+            'status', 'result').first()
+        if job is None:
+            return HttpResponseNotFound('Evaluation job %s not found' % pk)
+        status, result = job
+        if status != interop_admin_api_pb2.EvaluationJob.SUCCEEDED:
+            return HttpResponseNotFound('Evaluation job %s has no result' % pk)
+
+        response = HttpResponse(bytes(result), content_type='application/zip')
+        response['Content-Disposition'] = (
+            'attachment; filename="evaluation-%s.zip"' % pk)
+        return response
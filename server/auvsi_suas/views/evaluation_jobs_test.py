@@ -0,0 +1,125 @@
+"""Tests for the evaluation_jobs module."""
+
+import functools
+import io
+import json
+import zipfile
+from auvsi_suas.models import test_utils
+from auvsi_suas.models.evaluation_job import EvaluationJob
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+submit_url = functools.partial(reverse,
+                               'auvsi_suas:missions_id_evaluation_jobs')
+job_url = functools.partial(reverse, 'auvsi_suas:evaluation_jobs_id')
+result_url = functools.partial(reverse, 'auvsi_suas:evaluation_jobs_id_result')
+
+
+class TestEvaluationJobs(TestCase):
+    """Tests submitting evaluation jobs and downloading their results."""
+    def setUp(self):
+        self.user0 = User.objects.create_user('user0', 'email@example.com',
+                                              'testpass')
+        self.superuser = User.objects.create_superuser('testuser2',
+                                                       'testemail@x.com',
+                                                       'testpass')
+        self.mission = test_utils.create_sample_mission(self.superuser)
+        test_utils.simulate_team_mission(self, self.mission, self.superuser,
+                                         self.user0)
+
+    def test_not_superuser(self):
+        """Tests jobs can only be used by superusers."""
+        for user in [None, self.user0]:
+            if user:
+                self.client.force_login(user)
+            response = self.client.post(submit_url(args=[self.mission.pk]))
+            self.assertEqual(403, response.status_code)
+            response = self.client.get(job_url(args=[1]))
+            self.assertEqual(403, response.status_code)
+            response = self.client.get(result_url(args=[1]))
+            self.assertEqual(403, response.status_code)
+
+    def test_invalid(self):
+        """Tests invalid missions, teams and jobs."""
+        self.client.force_login(self.superuser)
+        response = self.client.post(submit_url(args=[1000]))
+        self.assertEqual(400, response.status_code)
+        response = self.client.post(
+            submit_url(args=[self.mission.pk]) + '?team=a')
+        self.assertEqual(400, response.status_code)
+        response = self.client.post(
+            submit_url(args=[self.mission.pk]) + '?team=1000')
+        self.assertEqual(404, response.status_code)
+        response = self.client.get(job_url(args=[1000]))
+        self.assertEqual(404, response.status_code)
+        response = self.client.get(result_url(args=[1000]))
+        self.assertEqual(404, response.status_code)
+
+    def submit(self, query=''):
+        """Submits a job, returning its JSON."""
+        response = self.client.post(submit_url(args=[self.mission.pk]) + query)
+        self.assertEqual(200, response.status_code)
+        return json.loads(response.content)
+
+    def get_job(self, pk):
+        response = self.client.get(job_url(args=[pk]))
+        self.assertEqual(200, response.status_code)
+        return json.loads(response.content)
+
+    def read_result(self, pk, name):
+        """Reads a file from the job's result zip file."""
+        response = self.client.get(result_url(args=[pk]))
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/zip', response['Content-Type'])
+        with zipfile.ZipFile(io.BytesIO(response.content), 'r') as zip_file:
+            return zip_file.read(name).decode('utf-8')
+
+    def test_evaluate_teams(self):
+        """Tests a job is submitted, run, polled and downloaded."""
+        self.client.force_login(self.superuser)
+        job = self.submit()
+        self.assertEqual('QUEUED', job['status'])
+        self.assertNotIn('team', job)
+        # Identical requests are coalesced.
+        self.assertEqual(job['id'], self.submit()['id'])
+        response = self.client.get(result_url(args=[job['id']]))
+        self.assertEqual(404, response.status_code)
+
+        EvaluationJob.run_next()
+        job = self.get_job(job['id'])
+        self.assertEqual('SUCCEEDED', job['status'])
+        self.assertEqual(1, job['teamsEvaluated'])
+        self.assertEqual(1, job['teamsTotal'])
+        self.assertIn('finishedTimestamp', job)
+
+        data = json.loads(
+            self.read_result(job['id'], '/evaluate_teams/all.json'))
+        teams = data['teams']
+        self.assertEqual(1, len(teams))
+        self.assertEqual('user0', teams[0]['team']['username'])
+        self.assertIn('waypoints', teams[0]['feedback'])
+
+        html_data = self.read_result(job['id'], '/evaluate_teams/all.html')
+        self.assertIn('user0', html_data)
+
+        csv_data = self.read_result(job['id'], '/evaluate_teams/all.csv')
+        self.assertEqual(len(csv_data.split('\n')), 3)
+        self.assertIn('team', csv_data)
+        self.assertIn('waypoints', csv_data)
+        self.assertIn('user0', csv_data)
+
+    def test_evaluate_specific_team(self):
+        """Tests a job evaluating a specific team."""
+        self.client.force_login(self.superuser)
+        all_teams = self.submit()
+        job = self.submit('?team=%d' % self.user0.pk)
+        self.assertNotEqual(all_teams['id'], job['id'])
+        self.assertEqual(self.user0.pk, job['team'])
+
+        EvaluationJob.run_next()
+        EvaluationJob.run_next()
+        data = json.loads(
+            self.read_result(job['id'], '/evaluate_teams/all.json'))
+        self.assertEqual(['user0'],
+                         [t['team']['username'] for t in data['teams']])
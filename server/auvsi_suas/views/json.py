@@ -10,6 +10,6 @@ class ProtoJsonEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, message.Message):
             # Object is protobuf. Convert to python json representation.
-            return json.loads(json_format.MessageToJson(obj))
+            return json_format.MessageToDict(obj)
         else:
             return super().default(obj)
@@ -1,19 +1,18 @@
 """Missions view."""
 
-import copy
-import csv
-import io
-import json
 import logging
 import math
 import numpy as np
 import pyproj
-import zipfile
 from auvsi_suas.models import distance
-from auvsi_suas.models import mission_evaluation
+from auvsi_suas.models import telemetry_cache
 from auvsi_suas.models import units
+from auvsi_suas.models.evaluation_job import pretty_json
+from auvsi_suas.models.flight_track import FlightTrack
 from auvsi_suas.models.mission_config import MissionConfig
 from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
+from auvsi_suas.models.uas_telemetry import TELEMETRY_EPOCH
+from auvsi_suas.models.uas_telemetry import TELEMETRY_TIME_UNIT
 from auvsi_suas.models.uas_telemetry import UasTelemetry
 from auvsi_suas.patches.simplekml_patch import AltitudeMode
 from auvsi_suas.patches.simplekml_patch import Color
@@ -22,17 +21,15 @@ from auvsi_suas.patches.simplekml_patch import RefreshMode
 from auvsi_suas.proto import interop_api_pb2
 from auvsi_suas.views.decorators import require_login
 from auvsi_suas.views.decorators import require_superuser
-from auvsi_suas.views.json import ProtoJsonEncoder
+from auvsi_suas.views.protobuf import proto_list_response
+from auvsi_suas.views.protobuf import proto_response
 from datetime import timedelta
 from django.contrib.auth.models import User
 from django.contrib.sessions.models import Session
 from django.core.exceptions import ObjectDoesNotExist
 from django.http import HttpResponse
-from django.http import HttpResponseBadRequest
 from django.http import HttpResponseForbidden
 from django.http import HttpResponseNotFound
-from django.http import HttpResponseServerError
-from django.template.loader import get_template
 from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView
@@ -119,12 +116,11 @@ class Missions(View):
 
     def get(self, request):
         missions = MissionConfig.objects.select_related().all()
-        out = []
+        out = interop_api_pb2.MissionList()
         for mission in missions:
-            out.append(mission_proto(mission))
+            out.missions.add().CopyFrom(mission_proto(mission))
 
-        return HttpResponse(json.dumps(out, cls=ProtoJsonEncoder),
-                            content_type="application/json")
+        return proto_list_response(request, out, 'missions')
 
 
 class MissionsId(View):
@@ -139,8 +135,7 @@ class MissionsId(View):
         except MissionConfig.DoesNotExist:
             return HttpResponseNotFound('Mission %s not found.' % pk)
 
-        return HttpResponse(json_format.MessageToJson(mission_proto(mission)),
-                            content_type="application/json")
+        return proto_response(request, mission_proto(mission))
 
 
 def fly_zone_kml(fly_zone, kml):
@@ -304,14 +299,14 @@ def mission_kml(mission, kml, kml_doc):
     return kml_folder
 
 
-def uas_telemetry_kml(user, flight_logs, kml, kml_doc):
+def uas_telemetry_kml(user, flight_tracks, kml, kml_doc):
     """
     Appends kml nodes describing the given user's flight as described
-    by the log array given.
+    by the telemetry arrays given.
 
     Args:
         user: A Django User to get username from
-        flight_logs: A sequence of UasTelemetry logs per flight period.
+        flight_tracks: A sequence of TelemetryTrack per flight period.
         kml: A simpleKML Container to which the flight data will be added
         kml_doc: The simpleKML Document to which schemas will be added
     Returns:
@@ -320,27 +315,26 @@ def uas_telemetry_kml(user, flight_logs, kml, kml_doc):
     # Lazily create folder iff there is data.
     kml_folder = None
 
-    for i, logs in enumerate(flight_logs):
+    for i, track in enumerate(flight_tracks):
         name = '%s Flight %d' % (user.username, i + 1)
 
-        logs = UasTelemetry.dedupe(UasTelemetry.filter_bad(logs))
+        track = UasTelemetry.dedupe(UasTelemetry.filter_bad(track))
 
-        coords = []
-        angles = []
-        when = []
-        for entry in logs:
-            # Spatial Coordinates
-            coord = (entry.longitude, entry.latitude,
-                     units.feet_to_meters(entry.altitude_msl))
-            coords.append(coord)
+        # Spatial Coordinates
+        coords = list(
+            zip(track.longitude.tolist(), track.latitude.tolist(),
+                units.feet_to_meters(track.altitude_msl).tolist()))
 
-            # Time Elements
-            time = entry.timestamp.strftime(KML_DATETIME_FORMAT)
-            when.append(time)
+        # Time Elements
+        when = [
+            (TELEMETRY_EPOCH +
+             timestamp_us * TELEMETRY_TIME_UNIT).strftime(KML_DATETIME_FORMAT)
+            for timestamp_us in track.timestamps_us.tolist()
+        ]
 
-            # Degrees heading, tilt, and roll
-            angle = (entry.uas_heading, 0.0, 0.0)
-            angles.append(angle)
+        # Degrees heading, tilt, and roll
+        angles = [(heading, 0.0, 0.0)
+                  for heading in track.uas_heading.tolist()]
 
         # Ignore tracks with no data.
         if not coords or not angles or not when:
@@ -368,10 +362,10 @@ def uas_telemetry_kml(user, flight_logs, kml, kml_doc):
 
 def uas_telemetry_live_kml(kml, timespan):
     users = User.objects.order_by('username').all()
+    status = telemetry_cache.latest(users)
     for user in users:
-        try:
-            log = UasTelemetry.by_user(user).latest('timestamp')
-        except UasTelemetry.DoesNotExist:
+        log, _ = status[user.pk]
+        if log is None:
             continue
 
         if log.timestamp < timezone.now() - timespan:
@@ -405,11 +399,12 @@ class ExportKml(View):
                 flights = TakeoffOrLandingEvent.flights(mission, user)
                 if not flights:
                     continue
-                uas_telemetry_kml(user=user,
-                                  flight_logs=UasTelemetry.by_time_period(
-                                      user, flights),
-                                  kml=kml_flights,
-                                  kml_doc=kml.document)
+                uas_telemetry_kml(
+                    user=user,
+                    flight_tracks=FlightTrack.tracks_by_time_period(
+                        mission, user, flights),
+                    kml=kml_flights,
+                    kml_doc=kml.document)
 
         response = HttpResponse(kml.kml())
         response['Content-Type'] = 'application/vnd.google-earth.kml+xml'
@@ -488,111 +483,6 @@ class LiveKmlUpdate(View):
         return response
 
 
-def pretty_json(json_str):
-    """Generates a pretty-print json from any json."""
-    return json.dumps(json.loads(json_str), indent=4)
-
-
-class Evaluate(View):
-    """Evaluates the teams and returns a zip file with CSV & JSON data.
-
-    Zip file contains a master CSV and JSON file with all evaluation data.
-    It also contains per-team JSON files for individual team feedback.
-    """
-
-    feedback_template = get_template('feedback.html')
-
-    @method_decorator(require_superuser)
-    def dispatch(self, *args, **kwargs):
-        return super(Evaluate, self).dispatch(*args, **kwargs)
-
-    def csv_from_json(self, json_list):
-        """Generates a CSV string from a list of rows as JSON strings."""
-        csv_list = []
-        for json_row in json_list:
-            csv_dict = {}
-            work_queue = [([], json.loads(json_row))]
-            while len(work_queue) > 0:
-                (cur_prefixes, cur_val) = work_queue.pop()
-                if isinstance(cur_val, dict):
-                    for (key, val) in cur_val.items():
-                        new_prefixes = copy.copy(cur_prefixes)
-                        new_prefixes.append(str(key))
-                        work_queue.append((new_prefixes, val))
-                elif isinstance(cur_val, list):
-                    for ix, val in enumerate(cur_val):
-                        new_prefixes = copy.copy(cur_prefixes)
-                        new_prefixes.append(str(ix))
-                        work_queue.append((new_prefixes, val))
-                else:
-                    column_key = '.'.join(cur_prefixes)
-                    csv_dict[column_key] = cur_val
-            csv_list.append(csv_dict)
-
-        col_headers = set()
-        for csv_dict in csv_list:
-            col_headers.update(csv_dict.keys())
-        col_headers = sorted(col_headers)
-
-        csv_io = io.StringIO()
-        writer = csv.DictWriter(csv_io, fieldnames=col_headers)
-        writer.writeheader()
-        for csv_dict in csv_list:
-            writer.writerow(csv_dict)
-        csv_output = csv_io.getvalue()
-        csv_io.close()
-
-        return csv_output
-
-    def get(self, request, pk):
-        try:
-            mission = MissionConfig.objects.select_related().get(pk=pk)
-        except MissionConfig.DoesNotExist:
-            return HttpResponseBadRequest('Mission not found.')
-
-        # Get the optional team to eval.
-        users = None
-        if 'team' in request.GET:
-            try:
-                team = int(request.GET['team'])
-                users = [User.objects.get(pk=team)]
-            except TypeError:
-                return HttpResponseBadRequest('Team not an ID.')
-            except User.DoesNotExist:
-                return HttpResponseNotFound('Team not found.')
-
-        # Get the eval data for the teams.
-        mission_eval = mission_evaluation.evaluate_teams(mission, users)
-        if not mission_eval:
-            return HttpResponseServerError(
-                'Could not get user evaluation data.')
-
-        # Form Zip file.
-        zip_io = io.BytesIO()
-        with zipfile.ZipFile(zip_io, 'w') as zip_file:
-            zip_file.writestr(
-                '/evaluate_teams/all.json',
-                pretty_json(json_format.MessageToJson(mission_eval)))
-            team_jsons = []
-            for team_eval in mission_eval.teams:
-                team_json = pretty_json(json_format.MessageToJson(team_eval))
-                zip_file.writestr(
-                    '/evaluate_teams/teams/%s.json' % team_eval.team.username,
-                    team_json)
-                team_jsons.append(team_json)
-
-            zip_file.writestr(
-                '/evaluate_teams/all.html',
-                self.feedback_template.render({'feedbacks': team_jsons}))
-
-            zip_file.writestr('/evaluate_teams/all.csv',
-                              self.csv_from_json(team_jsons))
-        zip_output = zip_io.getvalue()
-        zip_io.close()
-
-        return HttpResponse(zip_output, content_type='application/zip')
-
-
 class MissionDetails(TemplateView):
     """Renders the mission details as a printable webpage."""
 
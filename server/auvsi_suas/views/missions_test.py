@@ -1,16 +1,16 @@
 """Tests for the missions module."""
 
 import functools
-import io
 import json
-import zipfile
 from auvsi_suas.models import test_utils
 from auvsi_suas.models.gps_position import GpsPosition
 from auvsi_suas.models.mission_config import MissionConfig
+from auvsi_suas.proto import interop_api_pb2
 from django.contrib.auth.models import User
 from django.test import TestCase
 from django.test.client import Client
 from django.urls import reverse
+from google.protobuf import json_format
 from xml.etree import ElementTree
 
 missions_url = reverse('auvsi_suas:missions')
@@ -18,7 +18,6 @@ missions_id_url = functools.partial(reverse, 'auvsi_suas:missions_id')
 export_url = reverse('auvsi_suas:export_kml')
 live_url = reverse('auvsi_suas:live_kml')
 update_url = update_url = reverse('auvsi_suas:update_kml')
-evaluate_url = functools.partial(reverse, 'auvsi_suas:evaluate')
 details_url = functools.partial(reverse, 'auvsi_suas:details')
 
 
@@ -52,7 +51,6 @@ class TestMissionsViewInvalidLogin(TestMissionsViewCommon):
             missions_id_url(args=[1]),
             export_url,
             live_url,
-            evaluate_url(args=[1]),
             details_url(args=[1]),
         ]
         for url in urls:
@@ -65,7 +63,6 @@ class TestMissionsViewInvalidLogin(TestMissionsViewCommon):
             missions_url,
             export_url,
             live_url,
-            evaluate_url(args=[1]),
             details_url(args=[1]),
         ]
         for url in urls:
@@ -166,6 +163,17 @@ class TestMissionsViewSampleMission(TestMissionsViewCommon):
         data = json.loads(response.content)
         self.assert_data(data)
 
+    def test_get_protobuf(self):
+        """Binary proto response matches the JSON response."""
+        self.Login()
+        response = self.client.get(missions_id_url(args=[self.mission.pk]),
+                                   HTTP_ACCEPT='application/x-protobuf')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/x-protobuf', response['Content-Type'])
+        mission = interop_api_pb2.Mission()
+        mission.ParseFromString(response.content)
+        self.assert_data(json_format.MessageToDict(mission))
+
 
 class TestGenerateKMLCommon(TestMissionsViewCommon):
     """Tests the generateKML view."""
@@ -331,88 +339,6 @@ class TestGenerateLiveKMLWithSimulation(TestMissionsViewCommon):
         self.assertEqual(200, response.status_code)
 
 
-class TestEvaluateTeams(TestMissionsViewCommon):
-    """Tests the evaluate_teams view."""
-    def setUp(self):
-        super(TestEvaluateTeams, self).setUp()
-        self.mission = test_utils.create_sample_mission(self.superuser)
-        test_utils.simulate_team_mission(self, self.mission, self.superuser,
-                                         self.user0)
-
-    def test_evaluate_teams_nonadmin(self):
-        """Tests that you can only access data as admin."""
-        self.Login()
-        response = self.client.get(evaluate_url(args=[self.mission.pk]))
-        self.assertEqual(403, response.status_code)
-
-    def test_invalid_mission(self):
-        """Tests that an invalid mission ID results in error."""
-        self.Login()
-        response = self.client.get(evaluate_url(args=[1000]))
-        self.assertGreaterEqual(response.status_code, 400)
-
-    def load_json(self, response):
-        """Gets the json data out of the response's zip archive."""
-        zip_io = io.BytesIO(response.content)
-        with zipfile.ZipFile(zip_io, 'r') as zip_file:
-            return json.loads(zip_file.read('/evaluate_teams/all.json'))
-
-    def load_html(self, response):
-        """Gets the HTML data out of the response's zip archive."""
-        zip_io = io.BytesIO(response.content)
-        with zipfile.ZipFile(zip_io, 'r') as zip_file:
-            return zip_file.read('/evaluate_teams/all.html').decode('utf-8')
-
-    def load_csv(self, response):
-        """Gets the CSV data out of the response's zip archive."""
-        zip_io = io.BytesIO(response.content)
-        with zipfile.ZipFile(zip_io, 'r') as zip_file:
-            return zip_file.read('/evaluate_teams/all.csv').decode('utf-8')
-
-    def test_evaluate_teams(self):
-        """Tests the eval Json method."""
-        self.LoginSuperuser()
-        response = self.client.get(evaluate_url(args=[self.mission.pk]))
-        self.assertEqual(response.status_code, 200)
-        data = self.load_json(response)
-        self.assertIn('teams', data)
-        teams = data['teams']
-        self.assertEqual(len(teams), 1)
-        self.assertEqual('user0', teams[0]['team']['username'])
-        self.assertIn('waypoints', teams[0]['feedback'])
-
-    def test_evaluate_teams_specific_team(self):
-        """Tests the eval Json method on a specific team."""
-        self.LoginSuperuser()
-        response = self.client.get(evaluate_url(args=[self.mission.pk]),
-                                   {'team': self.user0.pk})
-        self.assertEqual(response.status_code, 200)
-        data = self.load_json(response)
-        self.assertIn('teams', data)
-        teams = data['teams']
-        self.assertEqual(len(teams), 1)
-        self.assertEqual('user0', teams[0]['team']['username'])
-
-    def test_evaluate_teams_html(self):
-        """Tests the HTML method."""
-        self.LoginSuperuser()
-        response = self.client.get(evaluate_url(args=[self.mission.pk]))
-        self.assertEqual(response.status_code, 200)
-        html_data = self.load_html(response)
-        self.assertIn('user0', html_data)
-
-    def test_evaluate_teams_csv(self):
-        """Tests the CSV method."""
-        self.LoginSuperuser()
-        response = self.client.get(evaluate_url(args=[self.mission.pk]))
-        self.assertEqual(response.status_code, 200)
-        csv_data = self.load_csv(response)
-        self.assertEqual(len(csv_data.split('\n')), 3)
-        self.assertIn('team', csv_data)
-        self.assertIn('waypoints', csv_data)
-        self.assertIn('user0', csv_data)
-
-
 class TestMissionDetailsView(TestMissionsViewCommon):
     """Tests the mission details template view."""
     def setUp(self, *args, **kwargs):
@@ -1,7 +1,6 @@
 """Odlcs view."""
 from PIL import Image
 import io
-import json
 import logging
 import os
 import os.path
@@ -13,7 +12,9 @@ from auvsi_suas.proto import interop_admin_api_pb2
 from auvsi_suas.proto import interop_api_pb2
 from auvsi_suas.views.decorators import require_login
 from auvsi_suas.views.decorators import require_superuser
-from auvsi_suas.views.json import ProtoJsonEncoder
+from auvsi_suas.views.protobuf import parse_request
+from auvsi_suas.views.protobuf import proto_list_response
+from auvsi_suas.views.protobuf import proto_response
 from django.contrib.auth.models import User
 from django.core.files.images import ImageFile
 from django.http import HttpResponse
@@ -22,7 +23,6 @@ from django.http import HttpResponseForbidden
 from django.http import HttpResponseNotFound
 from django.utils.decorators import method_decorator
 from django.views.generic import View
-from google.protobuf import json_format
 from sendfile import sendfile
 
 logger = logging.getLogger(__name__)
@@ -165,14 +165,14 @@ class Odlcs(View):
         # Limit serving to 100 odlcs to prevent slowdown and isolation problems.
         odlcs = odlcs.all()[:100]
 
-        odlc_protos = [odlc_to_proto(o) for o in odlcs]
-        return HttpResponse(json.dumps(odlc_protos, cls=ProtoJsonEncoder),
-                            content_type="application/json")
+        odlc_protos = interop_api_pb2.OdlcList()
+        odlc_protos.odlcs.extend([odlc_to_proto(o) for o in odlcs])
+        return proto_list_response(request, odlc_protos, 'odlcs')
 
     def post(self, request):
         odlc_proto = interop_api_pb2.Odlc()
         try:
-            json_format.Parse(request.body, odlc_proto)
+            parse_request(request, odlc_proto)
         except Exception as e:
             return HttpResponseBadRequest(
                 'Failed to parse request. Error: %s' % str(e))
@@ -199,8 +199,7 @@ class Odlcs(View):
         update_odlc_from_proto(odlc, odlc_proto)
         odlc.save()
 
-        return HttpResponse(json_format.MessageToJson(odlc_to_proto(odlc)),
-                            content_type="application/json")
+        return proto_response(request, odlc_to_proto(odlc))
 
 
 def find_odlc(request, pk):
@@ -239,8 +238,7 @@ class OdlcsId(View):
         except ValueError as e:
             return HttpResponseForbidden(str(e))
 
-        return HttpResponse(json_format.MessageToJson(odlc_to_proto(odlc)),
-                            content_type="application/json")
+        return proto_response(request, odlc_to_proto(odlc))
 
     def put(self, request, pk):
         try:
@@ -252,7 +250,7 @@ class OdlcsId(View):
 
         odlc_proto = interop_api_pb2.Odlc()
         try:
-            json_format.Parse(request.body, odlc_proto)
+            parse_request(request, odlc_proto)
         except Exception as e:
             return HttpResponseBadRequest(
                 'Failed to parse request. Error: %s' % str(e))
@@ -270,8 +268,7 @@ class OdlcsId(View):
         odlc.update_last_modified()
         odlc.save()
 
-        return HttpResponse(json_format.MessageToJson(odlc_to_proto(odlc)),
-                            content_type="application/json")
+        return proto_response(request, odlc_to_proto(odlc))
 
     def delete(self, request, pk):
         try:
@@ -431,17 +428,17 @@ class OdlcsAdminReview(View):
         odlcs.sort(key=lambda t: t.last_modified_time)
 
         # Convert to review protos.
-        odlc_review_protos = [odlc_to_review_proto(odlc) for odlc in odlcs]
+        odlc_review_protos = interop_admin_api_pb2.OdlcReviewList()
+        odlc_review_protos.reviews.extend(
+            [odlc_to_review_proto(odlc) for odlc in odlcs])
 
-        return HttpResponse(json.dumps(odlc_review_protos,
-                                       cls=ProtoJsonEncoder),
-                            content_type="application/json")
+        return proto_list_response(request, odlc_review_protos, 'reviews')
 
     def put(self, request, pk):
         """Updates the review status of a odlc."""
         review_proto = interop_admin_api_pb2.OdlcReview()
         try:
-            json_format.Parse(request.body, review_proto)
+            parse_request(request, review_proto)
         except Exception:
             return HttpResponseBadRequest('Failed to parse review proto.')
 
@@ -455,6 +452,4 @@ class OdlcsAdminReview(View):
         update_odlc_from_review_proto(odlc, review_proto)
         odlc.save()
 
-        return HttpResponse(json_format.MessageToJson(
-            odlc_to_review_proto(odlc)),
-                            content_type="application/json")
+        return proto_response(request, odlc_to_review_proto(odlc))
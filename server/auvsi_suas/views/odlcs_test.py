@@ -8,6 +8,7 @@ from auvsi_suas.models.gps_position import GpsPosition
 from auvsi_suas.models.mission_config import MissionConfig
 from auvsi_suas.models.odlc import Odlc
 from auvsi_suas.models.waypoint import Waypoint
+from auvsi_suas.proto import interop_admin_api_pb2
 from auvsi_suas.proto import interop_api_pb2
 from django.conf import settings
 from django.contrib.auth.models import User
@@ -269,6 +270,35 @@ class TestPostOdlc(TestOdlcsCommon):
         self.assertNotIn('description', created)
         self.assertEqual(False, created['autonomous'])
 
+    def test_minimal_protobuf(self):
+        """Send odlc minimal fields as a binary proto."""
+        odlc = interop_api_pb2.Odlc()
+        odlc.mission = self.mission.pk
+        odlc.type = interop_api_pb2.Odlc.STANDARD
+
+        response = self.client.post(odlcs_url,
+                                    data=odlc.SerializeToString(),
+                                    content_type='application/x-protobuf',
+                                    HTTP_ACCEPT='application/x-protobuf')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/x-protobuf', response['Content-Type'])
+
+        created = interop_api_pb2.Odlc()
+        created.ParseFromString(response.content)
+        self.assertTrue(created.HasField('id'))
+        self.assertEqual(self.mission.pk, created.mission)
+        self.assertEqual(interop_api_pb2.Odlc.STANDARD, created.type)
+        self.assertFalse(created.HasField('latitude'))
+        self.assertFalse(created.autonomous)
+
+        # Binary list contains the created ODLC.
+        response = self.client.get(odlcs_url,
+                                   HTTP_ACCEPT='application/x-protobuf')
+        self.assertEqual(200, response.status_code)
+        odlcs = interop_api_pb2.OdlcList()
+        odlcs.ParseFromString(response.content)
+        self.assertEqual([created], list(odlcs.odlcs))
+
     def test_missing_type(self):
         """Odlc type required."""
         odlc = {
@@ -984,6 +1014,15 @@ class TestOdlcsAdminReview(TestOdlcsCommon):
         self.assertEqual(200, response.status_code)
         self.assertEqual([], json.loads(response.content))
 
+    def test_get_none_protobuf(self):
+        """Test binary GET when there are no odlcs."""
+        response = self.client.get(odlcs_review_url,
+                                   HTTP_ACCEPT='application/x-protobuf')
+        self.assertEqual(200, response.status_code)
+        reviews = interop_admin_api_pb2.OdlcReviewList()
+        reviews.ParseFromString(response.content)
+        self.assertEqual(0, len(reviews.reviews))
+
     def test_get_without_thumbnail(self):
         """Test GET when there are odlcs without thumbnail."""
         odlc = Odlc(mission=self.mission,
@@ -0,0 +1,109 @@
+"""Utilities for protobuf content negotiation.
+
+Requests and responses default to JSON formatted protos. Clients may instead
+send binary protos by setting the Content-Type header, and ask for binary
+protos by setting the Accept header, to application/x-protobuf.
+"""
+
+import json
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from google.protobuf import json_format
+
+JSON_CONTENT_TYPE = 'application/json'
+PROTOBUF_CONTENT_TYPE = 'application/x-protobuf'
+
+
+def _accept_quality(accept, content_type):
+    """Gets the quality the Accept header gives the content type.
+
+    Args:
+        accept: The Accept header value.
+        content_type: The content type to find the quality for.
+    Returns:
+        The quality in [0, 1], or None if the content type is not listed.
+    """
+    quality = None
+    for media_range in accept.split(','):
+        params = media_range.split(';')
+        if params[0].strip().lower() != content_type:
+            continue
+        quality = 1.0
+        for param in params[1:]:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+    return quality
+
+
+def accepts_protobuf(request):
+    """Whether the request asked for a binary proto response.
+
+    Binary protos are only sent if explicitly listed in the Accept header, and
+    not given a lower quality than JSON.
+    """
+    accept = request.META.get('HTTP_ACCEPT', '')
+    protobuf_quality = _accept_quality(accept, PROTOBUF_CONTENT_TYPE)
+    if not protobuf_quality:
+        return False
+    json_quality = _accept_quality(accept, JSON_CONTENT_TYPE)
+    return json_quality is None or protobuf_quality >= json_quality
+
+
+def parse_request(request, proto):
+    """Parses the request body into the proto.
+
+    Args:
+        request: The request with a JSON or binary proto body.
+        proto: The proto to parse into.
+    Raises:
+        Exception: The body is not a valid proto of the given type.
+    """
+    if request.content_type == PROTOBUF_CONTENT_TYPE:
+        proto.ParseFromString(request.body)
+    else:
+        json_format.Parse(request.body, proto)
+
+
+def _response(content, content_type):
+    """Creates a response which varies on the Accept header."""
+    response = HttpResponse(content, content_type=content_type)
+    patch_vary_headers(response, ('Accept', ))
+    return response
+
+
+def proto_response(request, proto):
+    """Creates a response containing the proto in the requested format.
+
+    Args:
+        request: The request being responded to.
+        proto: The proto to respond with.
+    Returns:
+        The HttpResponse.
+    """
+    if accepts_protobuf(request):
+        return _response(proto.SerializeToString(), PROTOBUF_CONTENT_TYPE)
+    return _response(json_format.MessageToJson(proto), JSON_CONTENT_TYPE)
+
+
+def proto_list_response(request, list_proto, field):
+    """Creates a response containing a list of protos in the requested format.
+
+    JSON responses are a JSON list of the protos, and binary responses are the
+    list proto which wraps them.
+
+    Args:
+        request: The request being responded to.
+        list_proto: The proto wrapping the list.
+        field: The name of the repeated field containing the list.
+    Returns:
+        The HttpResponse.
+    """
+    if accepts_protobuf(request):
+        return _response(list_proto.SerializeToString(), PROTOBUF_CONTENT_TYPE)
+    content = json.dumps(
+        [json_format.MessageToDict(p) for p in getattr(list_proto, field)])
+    return _response(content, JSON_CONTENT_TYPE)
@@ -0,0 +1,63 @@
+"""Tests for the protobuf module."""
+
+from auvsi_suas.proto import interop_api_pb2
+from auvsi_suas.views.protobuf import accepts_protobuf
+from auvsi_suas.views.protobuf import parse_request
+from django.test import RequestFactory
+from django.test import TestCase
+
+
+class TestAcceptsProtobuf(TestCase):
+    """Tests the accepts_protobuf function."""
+    def assertAccepts(self, expected, accept=None):
+        factory = RequestFactory()
+        if accept is None:
+            request = factory.get('/')
+        else:
+            request = factory.get('/', HTTP_ACCEPT=accept)
+        self.assertEqual(expected, accepts_protobuf(request), accept)
+
+    def test_accepts(self):
+        """Tests binary protos are only used when explicitly preferred."""
+        self.assertAccepts(False)
+        self.assertAccepts(False, '*/*')
+        self.assertAccepts(False, 'application/json')
+        self.assertAccepts(True, 'application/x-protobuf')
+        self.assertAccepts(True, 'application/x-protobuf, application/json')
+        self.assertAccepts(True, 'application/json, application/x-protobuf')
+        self.assertAccepts(True,
+                           'application/x-protobuf, application/json;q=0.5')
+        self.assertAccepts(False,
+                           'application/x-protobuf;q=0.5, application/json')
+        self.assertAccepts(False, 'application/x-protobuf;q=0')
+        self.assertAccepts(False, 'application/x-protobuf;q=bad')
+
+
+class TestParseRequest(TestCase):
+    """Tests the parse_request function."""
+    def setUp(self):
+        self.telem = interop_api_pb2.Telemetry()
+        self.telem.latitude = 38
+        self.telem.longitude = -76
+        self.telem.altitude = 100
+        self.telem.heading = 90
+
+    def test_json(self):
+        """Tests JSON requests are parsed."""
+        request = RequestFactory().post(
+            '/',
+            data='{"latitude": 38, "longitude": -76, "altitude": 100, '
+            '"heading": 90}',
+            content_type='application/json')
+        telem = interop_api_pb2.Telemetry()
+        parse_request(request, telem)
+        self.assertEqual(self.telem, telem)
+
+    def test_protobuf(self):
+        """Tests binary requests are parsed."""
+        request = RequestFactory().post('/',
+                                        data=self.telem.SerializeToString(),
+                                        content_type='application/x-protobuf')
+        telem = interop_api_pb2.Telemetry()
+        parse_request(request, telem)
+        self.assertEqual(self.telem, telem)
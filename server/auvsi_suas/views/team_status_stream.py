@@ -0,0 +1,194 @@
+"""Server-Sent Events stream of team status.
+
+Logged in users may open GET /events/teams to have team status pushed as it
+changes, rather than polling for it. Each event's data is a JSON formatted
+TeamStatusDelta proto, and its ID is the delta's cursor. The first event has
+the status of all teams.
+
+Each process watches team status once for all of its streams, and sends each
+change to all streams as the same encoded event, so streams only cost the
+write of the event.
+"""
+
+import asyncio
+import collections
+import json
+import logging
+from auvsi_suas.models import telemetry_cache
+from auvsi_suas.proto import interop_api_pb2
+from auvsi_suas.views.teams import status_changes
+from channels.db import database_sync_to_async
+from google.protobuf import json_format
+
+logger = logging.getLogger(__name__)
+
+# Interval between checks for changes to team status.
+STREAM_POLL_INTERVAL_SEC = 0.1
+# Interval between comments sent to keep idle streams open.
+STREAM_KEEPALIVE_SEC = 15
+# Number of events waiting to be sent to a stream, after which a slow stream
+# is sent all status instead.
+STREAM_QUEUE_SIZE = 100
+
+
+def _event(delta):
+    """Encodes the TeamStatusDelta as an event."""
+    data = json.dumps(json_format.MessageToDict(delta))
+    return ('id: %s\ndata: %s\n\n' % (delta.cursor, data)).encode()
+
+
+def _changes(cursor):
+    """Gets the changes to team status after the cursor, or None if none."""
+    if cursor and telemetry_cache.version() == cursor:
+        return None
+    return status_changes(cursor)
+
+
+class _Broadcast(object):
+    """Watches team status for the streams of the process."""
+    def __init__(self):
+        # Queues of events for each stream.
+        self.queues = set()
+        # Cursor and status of each team by ID, as last sent to streams.
+        self.cursor = ''
+        self.teams = collections.OrderedDict()
+        self.task = None
+
+    def subscribe(self):
+        """Adds a stream, returning the queue of its events."""
+        queue = asyncio.Queue(STREAM_QUEUE_SIZE)
+        if self.cursor:
+            queue.put_nowait(self.snapshot())
+        self.queues.add(queue)
+        # Watches again if stopped, or if left in another event loop.
+        if (self.task is None or self.task.done()
+                or self.task.get_loop() is not asyncio.get_event_loop()):
+            self.task = asyncio.ensure_future(self.watch())
+        return queue
+
+    def unsubscribe(self, queue):
+        """Removes the stream with the queue."""
+        self.queues.discard(queue)
+
+    def snapshot(self):
+        """Gets an event with the status of all teams."""
+        delta = interop_api_pb2.TeamStatusDelta()
+        delta.cursor = self.cursor
+        delta.full = True
+        delta.teams.extend(self.teams.values())
+        return _event(delta)
+
+    def publish(self, delta):
+        """Applies the changes, and sends them to all streams."""
+        if delta.full:
+            self.teams.clear()
+        for team in delta.teams:
+            self.teams[team.team.id] = team
+        self.cursor = delta.cursor
+
+        event = _event(delta)
+        for queue in self.queues:
+            if queue.full():
+                # Replace the events the stream hasn't caught up with.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self.snapshot())
+            else:
+                queue.put_nowait(event)
+
+    async def watch(self):
+        """Publishes changes to team status while there are streams."""
+        while self.queues:
+            try:
+                delta = await database_sync_to_async(_changes)(self.cursor)
+            except Exception:
+                logger.exception('Failed to get changes to team status.')
+                delta = None
+            if delta is None:
+                await asyncio.sleep(STREAM_POLL_INTERVAL_SEC)
+                continue
+            self.publish(delta)
+        # Status isn't watched without streams, so must be read again.
+        self.cursor = ''
+        self.teams.clear()
+
+
+_broadcast = _Broadcast()
+
+
+async def _send_response(send, status, content_type, body):
+    """Sends a complete response."""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type)],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def open_streams():
+    """Gets the number of open streams in the process."""
+    return len(_broadcast.queues)
+
+
+class TeamStatusStream(object):
+    """ASGI application streaming team status to a logged in user."""
+    async def __call__(self, scope, receive, send):
+        if not scope['user'].is_authenticated:
+            await _send_response(send, 403, b'text/plain', b'Login required.')
+            return
+
+        await send({
+            'type':
+            'http.response.start',
+            'status':
+            200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                # Don't buffer events in nginx.
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        # Headers are sent with the first body.
+        await send({
+            'type': 'http.response.body',
+            'body': b'',
+            'more_body': True,
+        })
+        queue = _broadcast.subscribe()
+        stream = asyncio.ensure_future(self.stream(queue, send))
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    break
+        finally:
+            stream.cancel()
+            _broadcast.unsubscribe(queue)
+
+    async def stream(self, queue, send):
+        """Sends the events in the queue."""
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(),
+                                               STREAM_KEEPALIVE_SEC)
+            except asyncio.TimeoutError:
+                event = b': keep-alive\n\n'
+            await send({
+                'type': 'http.response.body',
+                'body': event,
+                'more_body': True,
+            })
+
+
+class TeamStatusStreamMetrics(object):
+    """ASGI application which gets metrics of the streams in the process."""
+    async def __call__(self, scope, receive, send):
+        if not scope['user'].is_superuser:
+            await _send_response(send, 403, b'text/plain',
+                                 b'Only superusers allowed.')
+            return
+        metrics = {'open_streams': open_streams()}
+        await _send_response(send, 200, b'application/json',
+                             json.dumps(metrics).encode())
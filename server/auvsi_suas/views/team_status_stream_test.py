@@ -0,0 +1,130 @@
+"""Tests for the team_status_stream module."""
+
+import json
+from asgiref.sync import async_to_sync
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from auvsi_suas.views import team_status_stream
+from channels.db import database_sync_to_async
+from channels.testing import ApplicationCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test import TransactionTestCase
+from server.asgi import application
+
+stream_url = '/events/teams'
+metrics_url = '/events/metrics'
+
+
+class TestTeamStatusStream(TransactionTestCase):
+    """Tests streaming team status as Server-Sent Events.
+
+    The stream uses the database from other threads, so changes must be
+    committed.
+    """
+    def setUp(self):
+        self.superuser = User.objects.create_superuser('superuser',
+                                                       'email@example.com',
+                                                       'superpass')
+        self.user = User.objects.create_user('testuser', 'testemail@x.com',
+                                             'testpass')
+        self.cookies = {
+            user: self.cookie(user)
+            for user in [self.superuser, self.user]
+        }
+
+    def cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        return '%s=%s' % (settings.SESSION_COOKIE_NAME,
+                          client.cookies[settings.SESSION_COOKIE_NAME].value)
+
+    async def request(self, path, user=None):
+        headers = []
+        if user:
+            headers.append((b'cookie', self.cookies[user].encode()))
+        communicator = ApplicationCommunicator(
+            application, {
+                'type': 'http',
+                'http_version': '1.1',
+                'method': 'GET',
+                'path': path,
+                'raw_path': path.encode(),
+                'query_string': b'',
+                'headers': headers,
+            })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output()
+        return communicator, start
+
+    async def receive_event(self, communicator):
+        """Receives the next event's data, skipping other writes."""
+        while True:
+            message = await communicator.receive_output(timeout=5)
+            for line in message['body'].decode().splitlines():
+                if line.startswith('data: '):
+                    return json.loads(line[len('data: '):])
+
+    def test_not_authenticated(self):
+        async def run():
+            communicator, start = await self.request(stream_url)
+            self.assertEqual(403, start['status'])
+
+        async_to_sync(run)()
+
+    def test_stream(self):
+        """Tests status is sent, then changes as they happen."""
+        async def run():
+            communicator, start = await self.request(stream_url, self.user)
+            self.assertEqual(200, start['status'])
+            self.assertIn((b'content-type', b'text/event-stream'),
+                          start['headers'])
+
+            data = await self.receive_event(communicator)
+            self.assertTrue(data['full'])
+            self.assertEqual(['testuser'],
+                             [t['team']['username'] for t in data['teams']])
+            self.assertNotIn('telemetry', data['teams'][0])
+            self.assertEqual(1, team_status_stream.open_streams())
+
+            await database_sync_to_async(
+                lambda: UasTelemetry(user=self.user,
+                                     latitude=38,
+                                     longitude=-76,
+                                     altitude_msl=100,
+                                     uas_heading=90).save())()
+            while True:
+                data = await self.receive_event(communicator)
+                if data.get('teams') and 'telemetry' in data['teams'][0]:
+                    break
+            self.assertEqual(38, data['teams'][0]['telemetry']['latitude'])
+
+            await communicator.send_input({'type': 'http.disconnect'})
+            await communicator.wait()
+            self.assertEqual(0, team_status_stream.open_streams())
+            # Watching stops without streams.
+            await team_status_stream._broadcast.task
+
+        async_to_sync(run)()
+
+    def test_http_served(self):
+        """Tests other requests are still handled by the views."""
+        async def run():
+            communicator, start = await self.request('/api/teams')
+            self.assertEqual(403, start['status'])
+
+        async_to_sync(run)()
+
+    def test_metrics(self):
+        """Tests metrics are only available to superusers."""
+        async def run():
+            communicator, start = await self.request(metrics_url, self.user)
+            self.assertEqual(403, start['status'])
+
+            communicator, start = await self.request(metrics_url,
+                                                     self.superuser)
+            self.assertEqual(200, start['status'])
+            body = await communicator.receive_output()
+            self.assertEqual({'open_streams': 0}, json.loads(body['body']))
+
+        async_to_sync(run)()
@@ -1,40 +1,66 @@
 """Teams view."""
 
-import json
 import logging
-from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
-from auvsi_suas.models.uas_telemetry import UasTelemetry
+from auvsi_suas.models import telemetry_cache
 from auvsi_suas.proto import interop_api_pb2
 from auvsi_suas.views.decorators import require_login
-from auvsi_suas.views.json import ProtoJsonEncoder
+from auvsi_suas.views.protobuf import accepts_protobuf
+from auvsi_suas.views.protobuf import proto_list_response
+from auvsi_suas.views.protobuf import proto_response
 from django.contrib.auth.models import User
-from django.http import HttpResponse
 from django.http import HttpResponseBadRequest
+from django.http import HttpResponseNotModified
 from django.utils import timezone
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from django.views.generic import View
-from google.protobuf import json_format
 
 logger = logging.getLogger(__name__)
 
+# Max time a request for changes to team status waits for them. Each waiting
+# request occupies a server process.
+MAX_WAIT_SEC = 10
+# Max requests waiting for changes at once, across processes sharing the
+# telemetry cache, so waiting requests leave processes for others.
+MAX_WAITERS = 8
 
-def team_proto(user):
-    """Generate TeamStatus proto for team."""
+
+def status_etag(request, *args, **kwargs):
+    """Gets the ETag of team status, without reading the database.
+
+    Status is encoded differently for each format, so they have different
+    ETags. Requests for changes wait for them instead.
+    """
+    if 'since' in request.GET:
+        return None
+    return '%s-%s' % (telemetry_cache.version(),
+                      'proto' if accepts_protobuf(request) else 'json')
+
+
+def team_proto(user, telemetry, in_air):
+    """Generate TeamStatus proto for team.
+
+    Args:
+        user: The team's user.
+        telemetry: The team's latest UasTelemetry, or None.
+        in_air: Whether the team is in the air.
+    """
     team_status_proto = interop_api_pb2.TeamStatus()
     team_status_proto.team.id = user.pk
     team_status_proto.team.username = user.username
     team_status_proto.team.name = user.first_name
     team_status_proto.team.university = user.last_name
-    team_status_proto.in_air = TakeoffOrLandingEvent.user_in_air(user)
+    team_status_proto.in_air = in_air
 
-    telemetry = UasTelemetry.last_for_user(user)
     if telemetry is not None:
         telemetry_proto = team_status_proto.telemetry
         telemetry_proto.latitude = telemetry.latitude
         telemetry_proto.longitude = telemetry.longitude
         telemetry_proto.altitude = telemetry.altitude_msl
         telemetry_proto.heading = telemetry.uas_heading
-        team_status_proto.telemetry_id = telemetry.pk
+        # Buffered telemetry isn't yet inserted.
+        if telemetry.pk is not None:
+            team_status_proto.telemetry_id = telemetry.pk
         team_status_proto.telemetry_age_sec = (
             timezone.now() - telemetry.timestamp).total_seconds()
         team_status_proto.telemetry_timestamp = telemetry.timestamp.isoformat()
@@ -42,23 +68,70 @@ def team_proto(user):
     return team_status_proto
 
 
+def team_users():
+    """Gets the users of teams."""
+    # Only standard users are exported
+    return [u for u in User.objects.all() if not u.is_superuser]
+
+
+def status_changes(since):
+    """Gets the status of teams changed after the cursor.
+
+    Args:
+        since: The cursor of earlier status, or empty for all status.
+    Returns:
+        A TeamStatusDelta proto.
+    """
+    users = team_users()
+    cursor, changed = telemetry_cache.changes(since, users)
+    delta = interop_api_pb2.TeamStatusDelta()
+    delta.cursor = cursor
+    if changed is None:
+        delta.full = True
+        changed = users
+
+    status = telemetry_cache.latest(changed)
+    for user in changed:
+        delta.teams.add().CopyFrom(team_proto(user, *status[user.pk]))
+    return delta
+
+
 class Teams(View):
     """Gets a list of all teams."""
     @method_decorator(require_login)
     def dispatch(self, *args, **kwargs):
         return super(Teams, self).dispatch(*args, **kwargs)
 
+    @method_decorator(condition(etag_func=status_etag))
     def get(self, request):
-        users = User.objects.all()
-        teams = []
+        if 'since' in request.GET:
+            return self.get_changes(request, request.GET['since'])
+
+        users = team_users()
+        status = telemetry_cache.latest(users)
+        teams = interop_api_pb2.TeamStatusList()
 
         for user in users:
-            # Only standard users are exported
-            if not user.is_superuser:
-                teams.append(team_proto(user))
+            teams.teams.add().CopyFrom(team_proto(user, *status[user.pk]))
 
-        return HttpResponse(json.dumps(teams, cls=ProtoJsonEncoder),
-                            content_type="application/json")
+        return proto_list_response(request, teams, 'teams')
+
+    def get_changes(self, request, since):
+        """Gets the status of teams changed after the cursor.
+
+        Waits up to the timeout parameter, in seconds, for a change. If
+        MAX_WAITERS requests are already waiting, responds Not Modified
+        without waiting if there are no changes, and the client polls again.
+        """
+        try:
+            timeout_sec = float(request.GET.get('timeout', MAX_WAIT_SEC))
+        except ValueError:
+            return HttpResponseBadRequest('Invalid timeout.')
+        timeout_sec = max(0, min(timeout_sec, MAX_WAIT_SEC))
+        if not telemetry_cache.wait_for_change(since, timeout_sec,
+                                               MAX_WAITERS):
+            return HttpResponseNotModified()
+        return proto_response(request, status_changes(since))
 
 
 class Team(View):
@@ -67,11 +140,12 @@ class Team(View):
     def dispatch(self, *args, **kwargs):
         return super(Team, self).dispatch(*args, **kwargs)
 
+    @method_decorator(condition(etag_func=status_etag))
     def get(self, request, username):
         try:
             user = User.objects.get(username=username)
         except User.DoesNotExist:
             return HttpResponseBadRequest('Unknown team %s' % username)
 
-        return HttpResponse(json_format.MessageToJson(team_proto(user)),
-                            content_type="application/json")
+        status = telemetry_cache.latest([user])
+        return proto_response(request, team_proto(user, *status[user.pk]))
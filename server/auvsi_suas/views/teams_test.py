@@ -3,13 +3,18 @@
 import dateutil.parser
 import functools
 import json
+from unittest import mock
+from auvsi_suas.models import telemetry_cache
 from auvsi_suas.models.aerial_position import AerialPosition
 from auvsi_suas.models.gps_position import GpsPosition
 from auvsi_suas.models.mission_config import MissionConfig
 from auvsi_suas.models.takeoff_or_landing_event import TakeoffOrLandingEvent
 from auvsi_suas.models.uas_telemetry import UasTelemetry
 from auvsi_suas.models.waypoint import Waypoint
+from auvsi_suas.proto import interop_api_pb2
+from auvsi_suas.views import teams
 from django.contrib.auth.models import User
+from django.core.cache import caches
 from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
@@ -121,6 +126,143 @@ class TestTeamsView(TestCase):
         response = self.client.post(teams_url)
         self.assertEqual(405, response.status_code)
 
+    def test_num_queries(self):
+        """Status of all teams is read with a constant number of queries."""
+        self.create_data()
+        for ix in range(5):
+            user = User.objects.create_user('team%d' % ix, 'email@example.com',
+                                            'testpass')
+            TakeoffOrLandingEvent(user=user,
+                                  mission=self.mission,
+                                  uas_in_air=True).save()
+            UasTelemetry(user=user,
+                         latitude=38,
+                         longitude=-76,
+                         altitude_msl=0,
+                         uas_heading=90).save()
+        caches[telemetry_cache.CACHE_ALIAS].clear()
+
+        # Session, login user, teams, telemetry and events.
+        with self.assertNumQueries(5):
+            response = self.client.get(teams_url)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(7, len(json.loads(response.content)))
+
+        # Status is then cached.
+        with self.assertNumQueries(3):
+            self.client.get(teams_url)
+
+    def test_etag(self):
+        """Unchanged status is not modified."""
+        self.create_data()
+        response = self.client.get(teams_url)
+        self.assertEqual(200, response.status_code)
+        etag = response['ETag']
+
+        # Only the session and login user are read.
+        with self.assertNumQueries(2):
+            response = self.client.get(teams_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+
+        # Each format has its own ETag.
+        response = self.client.get(teams_url,
+                                   HTTP_ACCEPT='application/x-protobuf',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+
+        UasTelemetry(user=self.user1,
+                     latitude=38,
+                     longitude=-76,
+                     altitude_msl=0,
+                     uas_heading=90).save()
+        response = self.client.get(teams_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+        etag = response['ETag']
+
+        TakeoffOrLandingEvent(user=self.user1,
+                              mission=self.mission,
+                              uas_in_air=False).save()
+        response = self.client.get(teams_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        etag = response['ETag']
+
+        User.objects.create_user('user3', 'email@example.com', 'testpass')
+        response = self.client.get(teams_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+
+    def get_changes(self, since):
+        response = self.client.get(teams_url, {'since': since, 'timeout': 0})
+        self.assertEqual(200, response.status_code)
+        return json.loads(response.content)
+
+    def test_changes(self):
+        """Only changed team status is sent after a cursor."""
+        self.create_data()
+
+        data = self.get_changes('')
+        self.assertTrue(data['full'])
+        self.assertEqual(['user1', 'user2'],
+                         sorted(t['team']['username'] for t in data['teams']))
+        cursor = data['cursor']
+
+        # The first check of a cursor sends status not yet known unchanged.
+        cursor = self.get_changes(cursor)['cursor']
+        data = self.get_changes(cursor)
+        self.assertEqual(cursor, data['cursor'])
+        self.assertNotIn('full', data)
+        self.assertNotIn('teams', data)
+
+        UasTelemetry(user=self.user1,
+                     latitude=38,
+                     longitude=-76,
+                     altitude_msl=0,
+                     uas_heading=90).save()
+        data = self.get_changes(cursor)
+        self.assertNotEqual(cursor, data['cursor'])
+        self.assertNotIn('full', data)
+        self.assertEqual(['user1'],
+                         [t['team']['username'] for t in data['teams']])
+        self.assertEqual(38, data['teams'][0]['telemetry']['latitude'])
+        cursor = data['cursor']
+
+        # Changes to teams resend all status.
+        User.objects.create_user('user3', 'email@example.com', 'testpass')
+        data = self.get_changes(cursor)
+        self.assertTrue(data['full'])
+        self.assertEqual(3, len(data['teams']))
+
+    def test_changes_protobuf(self):
+        """Changes may be sent as a binary proto."""
+        self.create_data()
+        response = self.client.get(teams_url, {
+            'since': '',
+            'timeout': 0
+        },
+                                   HTTP_ACCEPT='application/x-protobuf')
+        self.assertEqual(200, response.status_code)
+        delta = interop_api_pb2.TeamStatusDelta()
+        delta.ParseFromString(response.content)
+        self.assertTrue(delta.full)
+        self.assertEqual(2, len(delta.teams))
+
+    def test_changes_max_waiters(self):
+        """Requests beyond the max waiters aren't modified."""
+        self.create_data()
+        cursor = self.get_changes('')['cursor']
+        cursor = self.get_changes(cursor)['cursor']
+
+        with mock.patch.object(teams, 'MAX_WAITERS', 0):
+            response = self.client.get(teams_url, {
+                'since': cursor,
+                'timeout': 10
+            })
+        self.assertEqual(304, response.status_code)
+
+    def test_changes_invalid_timeout(self):
+        response = self.client.get(teams_url, {'since': '', 'timeout': 'a'})
+        self.assertEqual(400, response.status_code)
+
     def test_correct_json(self):
         """Response JSON is properly formatted."""
         self.create_data()
@@ -173,6 +315,28 @@ class TestTeamsView(TestCase):
         self.assertEqual(user2['telemetryTimestamp'],
                          u'2016-10-01T00:00:00+00:00')
 
+    def test_correct_protobuf(self):
+        """Binary proto response matches the JSON response."""
+        self.create_data()
+
+        response = self.client.get(teams_url,
+                                   HTTP_ACCEPT='application/x-protobuf')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/x-protobuf', response['Content-Type'])
+        self.assertIn('Accept', response['Vary'])
+
+        teams = interop_api_pb2.TeamStatusList()
+        teams.ParseFromString(response.content)
+        self.assertEqual(2, len(teams.teams))
+
+        names = [t.team.username for t in teams.teams]
+        user2 = teams.teams[names.index('user2')]
+        self.assertFalse(user2.in_air)
+        self.assertEqual(38.6462, user2.telemetry.latitude)
+        self.assertEqual(self.telem.pk, user2.telemetry_id)
+        self.assertEqual('2016-10-01T00:00:00+00:00',
+                         user2.telemetry_timestamp)
+
 
 class TestTeamViewLoggedOut(TestCase):
     def test_not_authenticated(self):
@@ -212,6 +376,28 @@ class TestTeamView(TestCase):
         self.assertEqual(False, data['inAir'])
         self.assertNotIn('telemetry', data)
 
+    def test_etag(self):
+        """Unchanged status is not modified."""
+        url = team_url(args=[self.user1.username])
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(304, response.status_code)
+
+    def test_correct_user_protobuf(self):
+        """User requested is correct as a binary proto."""
+        response = self.client.get(team_url(args=[self.user1.username]),
+                                   HTTP_ACCEPT='application/x-protobuf')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/x-protobuf', response['Content-Type'])
+
+        team = interop_api_pb2.TeamStatus()
+        team.ParseFromString(response.content)
+        self.assertEqual('user1', team.team.username)
+        self.assertFalse(team.in_air)
+        self.assertFalse(team.HasField('telemetry'))
+
     def test_post(self):
         """POST not allowed"""
         response = self.client.post(team_url(args=[self.user1.username]))
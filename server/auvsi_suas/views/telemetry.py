@@ -1,18 +1,148 @@
 """Telemetry view."""
 
+import datetime
+import iso8601
 import logging
+from auvsi_suas.models import telemetry_buffer
+from auvsi_suas.models import telemetry_cache
+from auvsi_suas.models import telemetry_dedupe
 from auvsi_suas.models.aerial_position import AerialPosition
+from auvsi_suas.models.telemetry_rate import TelemetryRate
 from auvsi_suas.models.uas_telemetry import UasTelemetry
 from auvsi_suas.proto import interop_api_pb2
 from auvsi_suas.views.decorators import require_login
+from auvsi_suas.views.decorators import require_superuser
+from auvsi_suas.views.protobuf import parse_request
 from django.http import HttpResponse
 from django.http import HttpResponseBadRequest
+from django.http import JsonResponse
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.generic import View
-from google.protobuf import json_format
 
 logger = logging.getLogger(__name__)
 
+# Max number of telemetry in a single batch upload.
+TELEMETRY_BATCH_MAX_SIZE = 1000
+# Max age of batch telemetry, relative to when the batch is received.
+TELEMETRY_BATCH_MAX_AGE = datetime.timedelta(seconds=60)
+# Max amount batch telemetry can be in the future, to allow for clock skew.
+TELEMETRY_BATCH_MAX_FUTURE = datetime.timedelta(seconds=1)
+
+
+def validate_telemetry_proto(telemetry_proto):
+    """Validates telemetry proto, raising ValueError if invalid."""
+    if (not telemetry_proto.HasField('latitude')
+            or not telemetry_proto.HasField('longitude')
+            or not telemetry_proto.HasField('altitude')
+            or not telemetry_proto.HasField('heading')):
+        raise ValueError('Request missing fields.')
+
+    # Check the values make sense.
+    if telemetry_proto.latitude < -90 or telemetry_proto.latitude > 90:
+        raise ValueError('Latitude out of range [-90, 90]: %f' %
+                         telemetry_proto.latitude)
+    if telemetry_proto.longitude < -180 or telemetry_proto.longitude > 180:
+        raise ValueError('Longitude out of range [-180, 180]: %f' %
+                         telemetry_proto.longitude)
+    if telemetry_proto.altitude < -1500 or telemetry_proto.altitude > 330000:
+        raise ValueError('Altitude out of range [-1500, 330000]: %f' %
+                         telemetry_proto.altitude)
+    if telemetry_proto.heading < 0 or telemetry_proto.heading > 360:
+        raise ValueError('Heading out of range [0, 360]: %f' %
+                         telemetry_proto.heading)
+
+
+def telemetry_from_proto(user, telemetry_proto, timestamp=None):
+    """Converts a validated telemetry proto into an unsaved UasTelemetry."""
+    sequence = None
+    if telemetry_proto.HasField('sequence'):
+        sequence = telemetry_proto.sequence
+    return UasTelemetry(user=user,
+                        timestamp=timestamp,
+                        latitude=telemetry_proto.latitude,
+                        longitude=telemetry_proto.longitude,
+                        altitude_msl=telemetry_proto.altitude,
+                        uas_heading=telemetry_proto.heading,
+                        sequence=sequence)
+
+
+def store_telemetry(user, telemetry):
+    """Stores uploaded telemetry, dropping duplicates and replays.
+
+    Telemetry is inserted with a single query, or buffered to be stored in a
+    batch if the buffer is enabled and not full. The telemetry is counted in
+    the rates of the team's flights once inserted, and updates the team's
+    latest telemetry.
+
+    Args:
+        user: The user which uploaded the telemetry.
+        telemetry: Unsaved UasTelemetry, in time order.
+    Returns:
+        The number of telemetry stored.
+    """
+    telemetry = telemetry_dedupe.filter_new(user, telemetry)
+    if not telemetry:
+        return 0
+    if not (telemetry_buffer.enabled()
+            and telemetry_buffer.get_buffer().extend(telemetry)):
+        UasTelemetry.objects.bulk_create(telemetry)
+        # Buffered telemetry is counted in rates once flushed.
+        TelemetryRate.record_telemetry(user, telemetry)
+    telemetry_dedupe.record(user, telemetry)
+    telemetry_cache.record_telemetry(user, telemetry)
+    return len(telemetry)
+
+
+def telemetry_from_batch_proto(user, batch_proto, now=None):
+    """Converts a telemetry batch proto into a list of unsaved UasTelemetry.
+
+    Args:
+        user: The user which uploaded the batch.
+        batch_proto: The TelemetryBatch proto to convert.
+        now: Optional. The time the batch was received, default now.
+    Returns:
+        A list of UasTelemetry, in the order given by the batch.
+    Raises:
+        ValueError: The batch or any of its telemetry is invalid.
+    """
+    if now is None:
+        now = timezone.now()
+
+    if not batch_proto.telemetry:
+        raise ValueError('Batch contains no telemetry.')
+    if len(batch_proto.telemetry) > TELEMETRY_BATCH_MAX_SIZE:
+        raise ValueError('Batch contains more than %d telemetry.' %
+                         TELEMETRY_BATCH_MAX_SIZE)
+
+    telemetry = []
+    prev_timestamp = None
+    for ix, telemetry_proto in enumerate(batch_proto.telemetry):
+        try:
+            validate_telemetry_proto(telemetry_proto)
+            if not telemetry_proto.HasField('timestamp'):
+                raise ValueError('Request missing timestamp.')
+            try:
+                timestamp = iso8601.parse_date(telemetry_proto.timestamp)
+            except iso8601.ParseError as e:
+                raise ValueError('Invalid timestamp: %s' % str(e))
+            if timestamp > now + TELEMETRY_BATCH_MAX_FUTURE:
+                raise ValueError('Timestamp is in the future: %s' %
+                                 telemetry_proto.timestamp)
+            if timestamp < now - TELEMETRY_BATCH_MAX_AGE:
+                raise ValueError('Timestamp older than %d seconds: %s' %
+                                 (TELEMETRY_BATCH_MAX_AGE.total_seconds(),
+                                  telemetry_proto.timestamp))
+            if prev_timestamp is not None and timestamp < prev_timestamp:
+                raise ValueError('Timestamp out of order: %s' %
+                                 telemetry_proto.timestamp)
+        except ValueError as e:
+            raise ValueError('Telemetry %d: %s' % (ix, str(e)))
+        prev_timestamp = timestamp
+        telemetry.append(
+            telemetry_from_proto(user, telemetry_proto, timestamp=timestamp))
+    return telemetry
+
 
 class Telemetry(View):
     """GET/POST telemetry."""
@@ -21,40 +151,56 @@ class Telemetry(View):
         """Posts the UAS position with a POST request."""
         telemetry_proto = interop_api_pb2.Telemetry()
         try:
-            json_format.Parse(request.body, telemetry_proto)
+            parse_request(request, telemetry_proto)
         except Exception as e:
             return HttpResponseBadRequest(
                 'Failed to parse request. Error: %s' % str(e))
 
-        if (not telemetry_proto.HasField('latitude')
-                or not telemetry_proto.HasField('longitude')
-                or not telemetry_proto.HasField('altitude')
-                or not telemetry_proto.HasField('heading')):
-            return HttpResponseBadRequest('Request missing fields.')
+        try:
+            validate_telemetry_proto(telemetry_proto)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
 
-        # Check the values make sense.
-        if telemetry_proto.latitude < -90 or telemetry_proto.latitude > 90:
-            return HttpResponseBadRequest(
-                'Latitude out of range [-90, 90]: %f' %
-                telemetry_proto.latitude)
-        if telemetry_proto.longitude < -180 or telemetry_proto.longitude > 180:
-            return HttpResponseBadRequest(
-                'Longitude out of range [-180, 180]: %f' %
-                telemetry_proto.longitude)
-        if telemetry_proto.altitude < -1500 or telemetry_proto.altitude > 330000:
-            return HttpResponseBadRequest(
-                'Altitude out of range [-1500, 330000]: %f' %
-                telemetry_proto.altitude)
-        if telemetry_proto.heading < 0 or telemetry_proto.heading > 360:
-            return HttpResponseBadRequest('Heading out of range [0, 360]: %f' %
-                                          telemetry_proto.heading)
-
-        # Store telemetry.
-        telemetry = UasTelemetry(user=request.user,
-                                 latitude=telemetry_proto.latitude,
-                                 longitude=telemetry_proto.longitude,
-                                 altitude_msl=telemetry_proto.altitude,
-                                 uas_heading=telemetry_proto.heading)
-        telemetry.save()
+        store_telemetry(request.user,
+                        [telemetry_from_proto(request.user, telemetry_proto)])
 
         return HttpResponse('UAS Telemetry Successfully Posted.')
+
+
+class TelemetryBatch(View):
+    """POST a batch of telemetry."""
+    @method_decorator(require_login)
+    def post(self, request):
+        """Posts a batch of UAS positions with a single POST request.
+
+        The batch is validated as a whole, and is either stored entirely or
+        rejected entirely.
+        """
+        batch_proto = interop_api_pb2.TelemetryBatch()
+        try:
+            parse_request(request, batch_proto)
+        except Exception as e:
+            return HttpResponseBadRequest(
+                'Failed to parse request. Error: %s' % str(e))
+
+        try:
+            telemetry = telemetry_from_batch_proto(request.user, batch_proto)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+
+        store_telemetry(request.user, telemetry)
+
+        return HttpResponse('UAS Telemetry Batch Successfully Posted.')
+
+
+class TelemetryBufferMetrics(View):
+    """GET metrics of the telemetry buffer."""
+    @method_decorator(require_superuser)
+    def get(self, request):
+        """Gets the metrics of the buffer in the process handling the request.
+        """
+        if not telemetry_buffer.enabled():
+            return JsonResponse({'enabled': False})
+        metrics = telemetry_buffer.get_buffer().stats()
+        metrics['enabled'] = True
+        return JsonResponse(metrics)
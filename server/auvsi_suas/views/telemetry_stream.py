@@ -0,0 +1,129 @@
+"""Telemetry WebSocket stream.
+
+Teams may stream telemetry over a single long-lived WebSocket, rather than
+making a request per telemetry. Each WebSocket message is a Telemetry proto,
+either binary or JSON formatted. Telemetry are stored in micro-batches, and
+are acknowledged with TelemetryStreamAck messages in the same format as the
+telemetry being acknowledged.
+
+Like POST /api/telemetry, telemetry are timestamped when received, and
+duplicates and replays are acknowledged without being stored.
+"""
+
+import asyncio
+import logging
+from auvsi_suas.proto import interop_api_pb2
+from auvsi_suas.views.telemetry import store_telemetry
+from auvsi_suas.views.telemetry import telemetry_from_proto
+from auvsi_suas.views.telemetry import validate_telemetry_proto
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.db import DatabaseError
+from django.utils import timezone
+from google.protobuf import json_format
+
+logger = logging.getLogger(__name__)
+
+# Max time received telemetry waits before being stored.
+STREAM_FLUSH_INTERVAL_SEC = 0.05
+# Number of received telemetry which triggers storing them.
+STREAM_FLUSH_SIZE = 100
+# Close code when telemetry couldn't be stored (RFC 6455 internal error).
+STREAM_CLOSE_INTERNAL_ERROR = 1011
+
+
+class TelemetryStreamConsumer(AsyncWebsocketConsumer):
+    """Stores telemetry streamed over a WebSocket by a logged in user."""
+    async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            # Closing before accepting rejects the handshake.
+            await self.close()
+            return
+
+        # Number of messages received, which numbers the telemetry.
+        self.received = 0
+        # Telemetry waiting to be stored, and the number of the last.
+        self.pending = []
+        self.pending_through = 0
+        # Whether to acknowledge with binary protos.
+        self.binary = False
+        self.flush_lock = asyncio.Lock()
+        self.flush_task = None
+        await self.accept()
+
+    async def disconnect(self, code):
+        if not hasattr(self, 'pending'):
+            return
+        if self.flush_task:
+            self.flush_task.cancel()
+        # Store telemetry received before the disconnect.
+        await self.flush(send_ack=False)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        self.received += 1
+        self.binary = bytes_data is not None
+
+        telemetry_proto = interop_api_pb2.Telemetry()
+        try:
+            if self.binary:
+                telemetry_proto.ParseFromString(bytes_data)
+            else:
+                json_format.Parse(text_data, telemetry_proto)
+            validate_telemetry_proto(telemetry_proto)
+        except Exception as e:
+            ack = interop_api_pb2.TelemetryStreamAck()
+            ack.rejected = self.received
+            ack.error = str(e)
+            await self.send_ack(ack)
+            return
+
+        self.pending.append(
+            telemetry_from_proto(self.user,
+                                 telemetry_proto,
+                                 timestamp=timezone.now()))
+        self.pending_through = self.received
+        if len(self.pending) >= STREAM_FLUSH_SIZE:
+            await self.flush()
+        elif self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.flush_later())
+
+    async def flush_later(self):
+        """Stores pending telemetry after the flush interval."""
+        await asyncio.sleep(STREAM_FLUSH_INTERVAL_SEC)
+        self.flush_task = None
+        await self.flush()
+
+    async def flush(self, send_ack=True):
+        """Stores pending telemetry and acknowledges them.
+
+        Args:
+            send_ack: Whether to acknowledge, false if disconnected.
+        """
+        async with self.flush_lock:
+            telemetry, self.pending = self.pending, []
+            stored_through = self.pending_through
+            if not telemetry:
+                return
+            try:
+                await database_sync_to_async(store_telemetry)(self.user,
+                                                              telemetry)
+            except DatabaseError:
+                # Unacknowledged telemetry are lost, which the client detects
+                # from the close.
+                logger.exception('Failed to store streamed telemetry.')
+                if send_ack:
+                    await self.close(code=STREAM_CLOSE_INTERNAL_ERROR)
+                return
+
+            if send_ack:
+                ack = interop_api_pb2.TelemetryStreamAck()
+                ack.stored_through = stored_through
+                await self.send_ack(ack)
+
+    async def send_ack(self, ack):
+        """Sends the acknowledgement in the format of received telemetry."""
+        if self.binary:
+            await self.send(bytes_data=ack.SerializeToString())
+        else:
+            await self.send(text_data=json_format.MessageToJson(ack))
@@ -0,0 +1,153 @@
+"""Tests for the telemetry_stream module."""
+
+from asgiref.sync import async_to_sync
+from auvsi_suas.models.uas_telemetry import UasTelemetry
+from auvsi_suas.proto import interop_api_pb2
+from auvsi_suas.views import telemetry_stream
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import Client
+from django.test import TransactionTestCase
+from google.protobuf import json_format
+from server.asgi import application
+from unittest import mock
+
+stream_url = '/ws/telemetry'
+
+
+class TestTelemetryStream(TransactionTestCase):
+    """Tests streaming telemetry over a WebSocket.
+
+    The consumer uses the database from other threads, so changes must be
+    committed.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', 'testemail@x.com',
+                                             'testpass')
+        client = Client()
+        client.force_login(self.user)
+        self.cookie = '%s=%s' % (settings.SESSION_COOKIE_NAME, client.cookies[
+            settings.SESSION_COOKIE_NAME].value)
+
+    def create_telemetry(self, ix=0):
+        telemetry = interop_api_pb2.Telemetry()
+        telemetry.latitude = 38 + ix * 1e-6
+        telemetry.longitude = -76
+        telemetry.altitude = 100
+        telemetry.heading = 90
+        return telemetry
+
+    def communicator(self, cookie=True):
+        headers = []
+        if cookie:
+            headers.append((b'cookie', self.cookie.encode()))
+        return WebsocketCommunicator(application, stream_url, headers)
+
+    async def connect(self):
+        communicator = self.communicator()
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def receive_ack(self, communicator, binary=False):
+        ack = interop_api_pb2.TelemetryStreamAck()
+        if binary:
+            ack.ParseFromString(await communicator.receive_from())
+        else:
+            json_format.Parse(await communicator.receive_from(), ack)
+        return ack
+
+    def test_not_authenticated(self):
+        async def run():
+            communicator = self.communicator(cookie=False)
+            connected, _ = await communicator.connect()
+            self.assertFalse(connected)
+
+        async_to_sync(run)()
+
+    def test_json(self):
+        """Tests JSON telemetry is stored and acknowledged."""
+        async def run():
+            communicator = await self.connect()
+            for ix in range(3):
+                await communicator.send_to(text_data=json_format.MessageToJson(
+                    self.create_telemetry(ix)))
+            ack = await self.receive_ack(communicator)
+            self.assertEqual(3, ack.stored_through)
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+        logs = UasTelemetry.by_user(self.user)
+        self.assertEqual(3, len(logs))
+        self.assertAlmostEqual(38 + 2e-6, logs[2].latitude)
+
+    def test_binary(self):
+        """Tests binary telemetry is stored and acknowledged in binary."""
+        async def run():
+            communicator = await self.connect()
+            await communicator.send_to(
+                bytes_data=self.create_telemetry().SerializeToString())
+            ack = await self.receive_ack(communicator, binary=True)
+            self.assertEqual(1, ack.stored_through)
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+        self.assertEqual(1, UasTelemetry.by_user(self.user).count())
+
+    def test_rejected(self):
+        """Tests invalid telemetry is rejected without closing the stream."""
+        async def run():
+            communicator = await self.connect()
+            bad = self.create_telemetry()
+            bad.latitude = 91
+            for telemetry in [self.create_telemetry(), bad]:
+                await communicator.send_to(
+                    text_data=json_format.MessageToJson(telemetry))
+            await communicator.send_to(text_data='not json')
+            await communicator.send_to(
+                text_data=json_format.MessageToJson(self.create_telemetry(1)))
+
+            ack = await self.receive_ack(communicator)
+            self.assertEqual(2, ack.rejected)
+            self.assertIn('Latitude', ack.error)
+            ack = await self.receive_ack(communicator)
+            self.assertEqual(3, ack.rejected)
+            ack = await self.receive_ack(communicator)
+            self.assertEqual(4, ack.stored_through)
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+        self.assertEqual(2, UasTelemetry.by_user(self.user).count())
+
+    @mock.patch.object(telemetry_stream, 'STREAM_FLUSH_SIZE', 10)
+    def test_flush_size(self):
+        """Tests telemetry is stored in batches of the flush size."""
+        async def run():
+            communicator = await self.connect()
+            for ix in range(25):
+                await communicator.send_to(
+                    bytes_data=self.create_telemetry(ix).SerializeToString())
+            acks = []
+            for _ in range(3):
+                acks.append((await
+                             self.receive_ack(communicator,
+                                              binary=True)).stored_through)
+            self.assertEqual([10, 20, 25], acks)
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+        self.assertEqual(25, UasTelemetry.by_user(self.user).count())
+
+    @mock.patch.object(telemetry_stream, 'STREAM_FLUSH_INTERVAL_SEC', 60)
+    def test_disconnect_stores(self):
+        """Tests pending telemetry is stored on disconnect."""
+        async def run():
+            communicator = await self.connect()
+            await communicator.send_to(
+                bytes_data=self.create_telemetry().SerializeToString())
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+
+        async_to_sync(run)()
+        self.assertEqual(1, UasTelemetry.by_user(self.user).count())
@@ -1,14 +1,25 @@
 """Tests for the telemetry module."""
 
+import datetime
+import json
+import shutil
+import tempfile
 import time
+from auvsi_suas.models import telemetry_buffer
 from auvsi_suas.models.uas_telemetry import UasTelemetry
 from auvsi_suas.proto.interop_api_pb2 import Telemetry
+from auvsi_suas.proto.interop_api_pb2 import TelemetryBatch
 from django.contrib.auth.models import User
 from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 from google.protobuf import json_format
 
 telemetry_url = reverse('auvsi_suas:telemetry')
+telemetry_batch_url = reverse('auvsi_suas:telemetry_batch')
+telemetry_buffer_url = reverse('auvsi_suas:telemetry_buffer')
 
 
 class TestTelemetryViewLoggedOut(TestCase):
@@ -16,6 +27,8 @@ class TestTelemetryViewLoggedOut(TestCase):
         """Tests requests that have not yet been authenticated."""
         response = self.client.post(telemetry_url)
         self.assertEqual(403, response.status_code)
+        response = self.client.post(telemetry_batch_url)
+        self.assertEqual(403, response.status_code)
 
 
 class TestTelemetryPost(TestCase):
@@ -87,6 +100,31 @@ class TestTelemetryPost(TestCase):
         self.assertEqual(obj.altitude_msl, 30)
         self.assertEqual(obj.uas_heading, 40)
 
+    def test_upload_protobuf(self):
+        """Tests upload of a binary proto."""
+        telem = Telemetry()
+        telem.latitude = 10
+        telem.longitude = 20
+        telem.altitude = 30
+        telem.heading = 40
+        response = self.client.post(telemetry_url,
+                                    data=telem.SerializeToString(),
+                                    content_type='application/x-protobuf')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len(UasTelemetry.by_user(self.user)))
+
+        response = self.client.post(telemetry_url,
+                                    data=b'\xff\xff',
+                                    content_type='application/x-protobuf')
+        self.assertEqual(400, response.status_code)
+
+    def test_duplicate(self):
+        """Tests a duplicate upload succeeds without being stored."""
+        for _ in range(2):
+            response = self.telemetry_request(lat=10, lon=20, alt=30, head=40)
+            self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len(UasTelemetry.by_user(self.user)))
+
     def test_loadtest(self):
         """Tests the max load the view can handle."""
         total_ops = 100
@@ -97,3 +135,182 @@ class TestTelemetryPost(TestCase):
         end_t = time.perf_counter()
         op_rate = total_ops / (end_t - start_t)
         self.assertGreaterEqual(op_rate, 20)
+
+
+class TestTelemetryBatchPost(TestCase):
+    """Tests the TelemetryBatch view POST."""
+    def setUp(self):
+        """Sets up the client, server info URL, and user."""
+        self.user = User.objects.create_user('testuser', 'testemail@x.com',
+                                             'testpass')
+        self.user.save()
+        self.client.force_login(self.user)
+        self.now = timezone.now()
+
+    def batch_request(self, entries):
+        """Posts a batch of (age_sec, lat, lon, alt, head) telemetry."""
+        proto = TelemetryBatch()
+        for (age_sec, lat, lon, alt, head) in entries:
+            telem = proto.telemetry.add()
+            telem.latitude = lat
+            telem.longitude = lon
+            telem.altitude = alt
+            telem.heading = head
+            if age_sec is not None:
+                telem.timestamp = (
+                    self.now -
+                    datetime.timedelta(seconds=age_sec)).isoformat()
+
+        return self.client.post(telemetry_batch_url,
+                                data=json_format.MessageToJson(proto),
+                                content_type='application/json')
+
+    def test_invalid_request(self):
+        """Tests invalid requests are rejected without storing anything."""
+        response = self.client.post(telemetry_batch_url)
+        self.assertEqual(400, response.status_code)
+
+        TEST_DATA = [
+            [],  # Empty batch.
+            [(None, 10, 20, 30, 40)],  # Missing timestamp.
+            [(1, 10, 20, 30, 40), (0, 100, 20, 30, 40)],  # Bad latitude.
+            [(1, 10, 20, 30, 40), (0, 10, 20, 30, 370)],  # Bad heading.
+            [(0, 10, 20, 30, 40), (1, 10, 20, 30, 40)],  # Out of order.
+            [(-10, 10, 20, 30, 40)],  # In the future.
+            [(600, 10, 20, 30, 40)],  # Too old.
+            [(0, 10, 20, 30, 40)] * 1001,  # Too many.
+        ]  # yapf: disable
+        for entries in TEST_DATA:
+            self.assertEqual(400, self.batch_request(entries).status_code)
+        self.assertEqual(0, UasTelemetry.objects.count())
+
+    def test_upload_and_store(self):
+        """Tests correct upload and storage of the batch."""
+        response = self.batch_request([
+            (2, 10, 20, 30, 40),
+            (1, 11, 21, 31, 41),
+            (0, 12, 22, 32, 42),
+        ])
+        self.assertEqual(200, response.status_code, response.content)
+
+        logs = UasTelemetry.by_user(self.user)
+        self.assertEqual(3, len(logs))
+        for ix, log in enumerate(logs):
+            self.assertEqual(self.user, log.user)
+            self.assertEqual(self.now - datetime.timedelta(seconds=2 - ix),
+                             log.timestamp)
+            self.assertEqual(10 + ix, log.latitude)
+            self.assertEqual(20 + ix, log.longitude)
+            self.assertEqual(30 + ix, log.altitude_msl)
+            self.assertEqual(40 + ix, log.uas_heading)
+
+    def test_single_insert(self):
+        """Tests the batch is stored with a constant number of queries."""
+        # The first upload reads the team's recent telemetry.
+        self.assertEqual(200,
+                         self.batch_request([(1, 1, 2, 3, 4)]).status_code)
+
+        entries = [(0, 10 + ix * 1e-6, 20, 30, 40) for ix in range(500)]
+        # Session, user, the insert and the update of flight rates.
+        with self.assertNumQueries(4):
+            response = self.batch_request(entries)
+        self.assertEqual(200, response.status_code, response.content)
+        self.assertEqual(501, UasTelemetry.objects.count())
+
+    def test_dedupe(self):
+        """Tests duplicate and replayed telemetry isn't stored."""
+        proto = TelemetryBatch()
+        for ix, lat in enumerate([10, 10, 11, 12]):
+            telem = proto.telemetry.add()
+            telem.latitude = lat
+            telem.longitude = 20
+            telem.altitude = 30
+            telem.heading = 40
+            telem.timestamp = self.now.isoformat()
+            telem.sequence = ix
+        for _ in range(2):
+            response = self.client.post(telemetry_batch_url,
+                                        data=json_format.MessageToJson(proto),
+                                        content_type='application/json')
+            self.assertEqual(200, response.status_code, response.content)
+
+        logs = UasTelemetry.by_user(self.user)
+        self.assertEqual([10, 11, 12], [l.latitude for l in logs])
+        self.assertEqual([0, 2, 3], [l.sequence for l in logs])
+
+
+class TestTelemetryPostBuffered(TransactionTestCase):
+    """Tests the Telemetry view POST with the write-behind buffer."""
+    def setUp(self):
+        self.user = User.objects.create_user('testuser', 'testemail@x.com',
+                                             'testpass')
+        self.superuser = User.objects.create_superuser('superuser',
+                                                       'email@example.com',
+                                                       'superpass')
+        self.journal_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            TELEMETRY_BUFFER={
+                'ENABLED': True,
+                'FLUSH_INTERVAL_MS': 10,
+                'FLUSH_SIZE': 100,
+                'MAX_PENDING': 1000,
+                'JOURNAL_DIR': self.journal_dir,
+                'SYNC_TIMEOUT_SEC': 1,
+            })
+        self.settings_override.enable()
+
+    def tearDown(self):
+        telemetry_buffer.shutdown()
+        self.settings_override.disable()
+        shutil.rmtree(self.journal_dir)
+
+    def test_upload_and_store(self):
+        """Tests buffered upload is stored by sync."""
+        self.client.force_login(self.user)
+        for ix in range(10):
+            t = Telemetry()
+            t.latitude = 10 + ix
+            t.longitude = 20
+            t.altitude = 30
+            t.heading = 40
+            response = self.client.post(telemetry_url,
+                                        json_format.MessageToJson(t),
+                                        content_type='application/json')
+            self.assertEqual(200, response.status_code)
+
+        telemetry_buffer.sync()
+        logs = UasTelemetry.by_user(self.user)
+        self.assertEqual(10, len(logs))
+        self.assertEqual(list(range(10, 20)), [l.latitude for l in logs])
+
+    def test_full_buffer_stores(self):
+        """Tests upload is stored directly when the buffer is full."""
+        buf = telemetry_buffer.get_buffer()
+        buf.max_pending = 0
+        self.client.force_login(self.user)
+        t = Telemetry()
+        t.latitude = 10
+        t.longitude = 20
+        t.altitude = 30
+        t.heading = 40
+        response = self.client.post(telemetry_url,
+                                    json_format.MessageToJson(t),
+                                    content_type='application/json')
+        self.assertEqual(200, response.status_code)
+
+        self.assertEqual(1, UasTelemetry.by_user(self.user).count())
+        self.assertEqual(1, buf.stats()['rejected_samples'])
+
+    def test_metrics(self):
+        """Tests metrics are only available to superusers."""
+        self.client.force_login(self.user)
+        response = self.client.get(telemetry_buffer_url)
+        self.assertEqual(403, response.status_code)
+
+        self.client.force_login(self.superuser)
+        response = self.client.get(telemetry_buffer_url)
+        self.assertEqual(200, response.status_code)
+        data = json.loads(response.content)
+        self.assertTrue(data['enabled'])
+        self.assertIn('queue_depth', data)
+        self.assertIn('last_flush_latency_ms', data)
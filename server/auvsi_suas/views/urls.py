@@ -1,6 +1,8 @@
+from auvsi_suas.views.evaluation_jobs import EvaluationJobsId
+from auvsi_suas.views.evaluation_jobs import EvaluationJobsIdResult
+from auvsi_suas.views.evaluation_jobs import MissionsIdEvaluationJobs
 from auvsi_suas.views.login import Login
 from auvsi_suas.views.index import Index
-from auvsi_suas.views.missions import Evaluate
 from auvsi_suas.views.missions import ExportKml
 from auvsi_suas.views.missions import LiveKml
 from auvsi_suas.views.missions import LiveKmlUpdate
@@ -14,6 +16,8 @@ from auvsi_suas.views.odlcs import OdlcsIdImage
 from auvsi_suas.views.teams import Teams
 from auvsi_suas.views.teams import Team
 from auvsi_suas.views.telemetry import Telemetry
+from auvsi_suas.views.telemetry import TelemetryBatch
+from auvsi_suas.views.telemetry import TelemetryBufferMetrics
 from auvsi_suas.views.utils import BulkCreateTeams
 from auvsi_suas.views.utils import GpsConversion
 from django.urls import path
@@ -28,11 +32,13 @@ urlpatterns = [
     path('api/login', Login.as_view(), name='login'),
     path('api/missions', Missions.as_view(), name='missions'),
     path('api/missions/<int:pk>', MissionsId.as_view(), name='missions_id'),
-    path('api/missions/<int:pk>/evaluate.zip', Evaluate.as_view(), name='evaluate'),
+    path('api/missions/<int:pk>/evaluation_jobs', MissionsIdEvaluationJobs.as_view(), name='missions_id_evaluation_jobs'),
     path('api/missions/<int:pk>/mission.html', MissionDetails.as_view(), name='details'),
     path('api/missions/export.kml', ExportKml.as_view(), name='export_kml'),
     path('api/missions/live.kml', LiveKml.as_view(), name='live_kml'),
     path('api/missions/update.kml', LiveKmlUpdate.as_view(), name='update_kml'),
+    path('api/evaluation_jobs/<int:pk>', EvaluationJobsId.as_view(), name='evaluation_jobs_id'),
+    path('api/evaluation_jobs/<int:pk>/result.zip', EvaluationJobsIdResult.as_view(), name='evaluation_jobs_id_result'),
     path('api/odlcs', Odlcs.as_view(), name='odlcs'),
     path('api/odlcs/<int:pk>', OdlcsId.as_view(), name='odlcs_id'),
     path('api/odlcs/<int:pk>/image', OdlcsIdImage.as_view(), name='odlcs_id_image'),
@@ -41,6 +47,8 @@ urlpatterns = [
     path('api/teams', Teams.as_view(), name='teams'),
     path('api/teams/<str:username>', Team.as_view(), name='team'),
     path('api/telemetry', Telemetry.as_view(), name='telemetry'),
+    path('api/telemetry/batch', TelemetryBatch.as_view(), name='telemetry_batch'),
+    path('api/telemetry/buffer', TelemetryBufferMetrics.as_view(), name='telemetry_buffer'),
     path('api/utils/gps_conversion', GpsConversion.as_view(), name='gps_conversion'),
     path('api/utils/bulk_create_teams', BulkCreateTeams.as_view(), name='bulk_create_teams'),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT) + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,44 @@
+"""ASGI config for the interop server.
+
+Serves the WebSocket and event stream endpoints, which the WSGI server can't.
+HTTP is also served, so the ASGI server can be used alone for development.
+"""
+
+import django
+import os
+import sys
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "server.settings")
+
+# Add parent directory to Python path
+server_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path = [server_dir] + sys.path
+
+django.setup()
+
+from auvsi_suas.views.team_status_stream import TeamStatusStream
+from auvsi_suas.views.team_status_stream import TeamStatusStreamMetrics
+from auvsi_suas.views.telemetry_stream import TelemetryStreamConsumer
+from channels.auth import AuthMiddlewareStack
+from channels.http import AsgiHandler
+from channels.routing import ProtocolTypeRouter
+from channels.routing import URLRouter
+from django.urls import path
+from django.urls import re_path
+
+http_urlpatterns = [
+    path('events/teams', TeamStatusStream(), name='team_status_stream'),
+    path('events/metrics', TeamStatusStreamMetrics(), name='team_status_stream_metrics'),
+    re_path(r'', AsgiHandler()),
+]  # yapf: disable
+
+websocket_urlpatterns = [
+    path('ws/telemetry', TelemetryStreamConsumer.as_asgi(), name='telemetry_stream'),
+]  # yapf: disable
+
+application = ProtocolTypeRouter({
+    # The event streams are authenticated by the session cookie.
+    'http': AuthMiddlewareStack(URLRouter(http_urlpatterns)),
+    # Authenticated by the same session cookie as HTTP requests.
+    'websocket': AuthMiddlewareStack(URLRouter(websocket_urlpatterns)),
+})  # yapf: disable
@@ -54,6 +54,8 @@ MIDDLEWARE = (
 
 ROOT_URLCONF = 'server.urls'
 WSGI_APPLICATION = 'server.wsgi.application'
+# Serves the WebSocket endpoints.
+ASGI_APPLICATION = 'server.asgi.application'
 
 TEMPLATES = [
     {
@@ -98,6 +100,64 @@ CACHES = {
         'KEY_PREFIX': 'suas',
     }
 }
+# Latest telemetry and in-air status of each team, updated on write. Shared by
+# all processes with memcached if CACHE_HOST is set. Otherwise each process has
+# its own, which may miss writes by other processes for the timeout.
+if os.getenv('CACHE_HOST'):
+    CACHES['telemetry'] = {
+        'BACKEND':
+        'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION':
+        '%s:%s' % (os.getenv('CACHE_HOST'), os.getenv('CACHE_PORT', '11211')),
+        'TIMEOUT':
+        None,
+        'KEY_PREFIX':
+        'suas',
+    }
+else:
+    CACHES['telemetry'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'TIMEOUT': 1,
+        'KEY_PREFIX': 'suas',
+    }
+
+# Write-behind telemetry buffer. When enabled, telemetry uploads are
+# acknowledged once journaled, and are inserted in batches by each process.
+TELEMETRY_BUFFER = {
+    'ENABLED': False,
+    # Max time between flushes to the database.
+    'FLUSH_INTERVAL_MS': 100,
+    # Number of buffered telemetry which triggers a flush.
+    'FLUSH_SIZE': 500,
+    # Max telemetry not yet flushed, beyond which uploads are inserted
+    # directly rather than buffered.
+    'MAX_PENDING': 100000,
+    # Directory for the crash recovery journal, shared by all processes.
+    'JOURNAL_DIR': '/var/www/telemetry_journal',
+    # Max time to wait for other processes to flush before evaluation.
+    'SYNC_TIMEOUT_SEC': 10,
+}
+
+# Time range partitioning of the telemetry table (Postgres only). When enabled,
+# migrations convert the table into a partitioned table, and the
+# partition_telemetry command creates and detaches partitions.
+TELEMETRY_PARTITIONING = {
+    'ENABLED': False,
+    # Time range of each partition, aligned to UTC midnight.
+    'INTERVAL_DAYS': 1,
+    # Number of partitions partition_telemetry creates ahead of now.
+    'PRECREATE_DAYS': 7,
+}
+
+# Team evaluation. With PROCESSES above 1, teams are evaluated in parallel by
+# a pool of that many spawned processes, each with its own database connection.
+# Under uwsgi, py-sys-executable must name the Python interpreter to spawn.
+MISSION_EVALUATION = {
+    'PROCESSES': 0,
+    # Whether each server process runs a thread for evaluation jobs, started by
+    # server/wsgi.py and woken when jobs are submitted.
+    'JOB_WORKER': True,
+}
 
 # Logging
 LOGGING = {
@@ -13,6 +13,12 @@ sys.path = [server_dir] + sys.path
 
 application = get_wsgi_application()
 
+# Run evaluation jobs in each server process. Started here rather than when
+# Django is set up, so management commands don't run jobs. Under uwsgi,
+# lazy-apps loads this in each worker, so the thread isn't forked.
+from auvsi_suas.models import evaluation_job
+evaluation_job.start_worker()
+
 # Django puts off loading many relevant modules until the first request
 # arrives. If the disk is very slow (e.g., when using Vagrant, see #8),
 # this introduces significant latency in the first request. By making a dummy